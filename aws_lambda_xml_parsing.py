@@ -1,15 +1,24 @@
+import bisect
+import contextlib
+import gzip
+import hashlib
+import io
 import json
+import math
 import os
-import boto3
-import xmltodict
+import random
+import resource
+import threading
+import time
 import re
-import boto3
 import logging
-from datetime import datetime
-from collections import Counter
+import xml.parsers.expat
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from collections import Counter, OrderedDict
+from functools import lru_cache
 
-with open ('s3_secrets.json', 'r') as f:
-    s3_secrets = json.load(f)
+# boto3, xmltodict and the profiler are imported on first use to keep cold starts short
 
 # create logger
 logger = logging.getLogger()
@@ -41,9 +50,260 @@ payment_status_codes = {
     "9": "Charge-Off"
 }
 
-# create s3 and redshift objects
-s3 = boto3.client('s3')
-redshift = boto3.client('redshift-data')  # Ensure you have necessary permissions
+# payment status code -> compact integer, in payment_status_codes order; unknown symbols and padding come last
+PAY_STATUS_INDEX = {code: idx for idx, code in enumerate(payment_status_codes)}
+PAY_STATUS_UNKNOWN = len(PAY_STATUS_INDEX)
+PAY_STATUS_PAD = PAY_STATUS_UNKNOWN + 1
+
+# late payment rollup bucket of each delinquent payment status code
+LATE_PAYMENT_BUCKETS = {"1": "30", "2": "60", "3": "90+", "4": "90+", "5": "90+", "7": "90+", "8": "90+", "9": "90+"}
+LATE_BUCKET_NAMES = ["30", "60", "90+"]
+
+# parse mode: "stream" skips OriginalData while parsing, "legacy" uses regex + xmltodict
+XML_PARSE_MODE = os.getenv("XML_PARSE_MODE", "stream")
+
+# top-level sections kept by the streaming parser and subtrees it never builds
+STREAM_SECTIONS = ("Snapshot", "TrueLinkCreditReportType")
+SKIPPED_TAGS = ("OriginalData",)
+
+# input streaming: S3 bodies are read in INPUT_CHUNK_SIZE pieces, and a report larger than
+# MAX_REPORT_BYTES (compressed or decompressed) fails fast instead of exhausting memory
+INPUT_CHUNK_SIZE = int(os.getenv("INPUT_CHUNK_SIZE", str(1024 * 1024)))
+MAX_REPORT_BYTES = int(os.getenv("MAX_REPORT_BYTES", str(256 * 1024 * 1024)))
+
+# magic bytes of compressed uploads
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+# worker threads used to fetch and process the records of one event
+MAX_RECORD_WORKERS = int(os.getenv("MAX_RECORD_WORKERS", "4"))
+
+# snapshot fields copied into the output, in output order
+SNAPSHOT_OUTPUT_KEYS = [
+    "total_accounts", "total_closed_accounts", "delinquent_accounts", "derogatory_accounts",
+    "open_accounts", "total_balances", "total_monthly_payments", "number_of_inquiries",
+    "total_public_records", "balance_open_revolving_accounts", "total_open_revolving_accounts",
+    "balance_open_installment_accounts", "total_open_installment_accounts",
+    "balance_open_mortgage_accounts", "total_open_mortgage_accounts",
+    "balance_open_collection_accounts", "total_open_collection_accounts",
+    "balance_open_other_accounts", "total_open_other_accounts", "available_credit",
+    "utilization", "on_time_payment_percentage", "late_payment_percentage",
+    "date_of_oldest_trade", "age_of_credit", "closed_account_pct", "open_account_pct",
+    "deragatory_account_pct"
+]
+
+# tradeline counters copied into the output, in output order
+TRADELINE_OUTPUT_KEYS = [
+    "account_condition", "account_designator", "dispute_flag", "industry_code", "open_closed",
+    "pay_status", "verification_indicator", "credit_type", "payment_frequency", "term_type",
+    "worst_pay_status", "pay_status_history"
+]
+
+# output destination, format ("json" or "parquet") and compression ("none", "gzip" or "zstd")
+# (the bucket and prefix fall back to the "bucket" and "key" entries of s3_secrets.json)
+OUTPUT_BUCKET = os.getenv("OUTPUT_BUCKET")
+OUTPUT_PREFIX = os.getenv("OUTPUT_PREFIX")
+OUTPUT_FORMAT = os.getenv("OUTPUT_FORMAT", "json")
+OUTPUT_COMPRESSION = os.getenv("OUTPUT_COMPRESSION", "none")
+
+# TRADELINE_TABLE_ENABLED=1 also writes one Parquet row per tradeline next to each summary (needs pyarrow)
+TRADELINE_TABLE_ENABLED = os.getenv("TRADELINE_TABLE_ENABLED", "0") == "1"
+
+# per-stage metrics: METRICS_ENABLED=1 emits one CloudWatch Embedded Metric Format line per report
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "0") == "1"
+METRICS_NAMESPACE = os.getenv("METRICS_NAMESPACE", "TrueLinkXmlParser")
+
+# sampling profiler: profile 1 in PROFILE_SAMPLE_RATE reports, print stats for those slower than the threshold
+PROFILE_SAMPLE_RATE = int(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_SLOW_REPORT_MS = float(os.getenv("PROFILE_SLOW_REPORT_MS", "1000"))
+
+# only one profiler can be active per process
+_profiler_lock = threading.Lock()
+
+# version of the output_data layout; bump it whenever features change so cached results are recomputed
+FEATURE_SCHEMA_VERSION = "3"
+
+# dedup cache: warm in-process LRU size (0 disables it) and persistent store
+# ("" for none, "sqlite:<path>" locally, "dynamodb:<table>" shared across containers)
+DEDUP_CACHE_SIZE = int(os.getenv("DEDUP_CACHE_SIZE", "256"))
+DEDUP_STORE = os.getenv("DEDUP_STORE", "")
+
+# Redshift micro-batch loading through the Data API ("" table disables it); the target table has one
+# column per output_data key plus source_key, with the nested counters as SUPER columns
+REDSHIFT_LOAD_TABLE = os.getenv("REDSHIFT_LOAD_TABLE", "")
+REDSHIFT_LOAD_LOG_TABLE = os.getenv("REDSHIFT_LOAD_LOG_TABLE", "report_load_batches")
+REDSHIFT_DATABASE = os.getenv("REDSHIFT_DATABASE", "dev")
+REDSHIFT_WORKGROUP = os.getenv("REDSHIFT_WORKGROUP", "")
+REDSHIFT_CLUSTER_ID = os.getenv("REDSHIFT_CLUSTER_ID", "")
+REDSHIFT_DB_USER = os.getenv("REDSHIFT_DB_USER", "")
+REDSHIFT_SECRET_ARN = os.getenv("REDSHIFT_SECRET_ARN", "")
+REDSHIFT_IAM_ROLE = os.getenv("REDSHIFT_IAM_ROLE", "")
+
+# rows are staged in S3 under <output prefix>redshift-load/pending/ by the report handler and loaded by
+# load_handler on a schedule, in batches of up to these bounds and at most LOAD_FLUSH_MAX_BATCHES per run
+LOAD_BATCH_MAX_ROWS = int(os.getenv("LOAD_BATCH_MAX_ROWS", "1000"))
+LOAD_BATCH_MAX_BYTES = int(os.getenv("LOAD_BATCH_MAX_BYTES", str(64 * 1024 * 1024)))
+LOAD_FLUSH_MAX_BATCHES = int(os.getenv("LOAD_FLUSH_MAX_BATCHES", "5"))
+LOAD_STATEMENT_TIMEOUT_SECONDS = float(os.getenv("LOAD_STATEMENT_TIMEOUT_SECONDS", "300"))
+
+# write one partial rollup per processed batch under ROLLUP_PREFIX (default <output prefix>rollups/)
+ROLLUPS_ENABLED = os.getenv("ROLLUPS_ENABLED", "0") == "1"
+ROLLUP_PREFIX = os.getenv("ROLLUP_PREFIX")
+
+# report index: REPORT_INDEX_ENABLED=1 stages each summary as a pending row object under REPORT_INDEX_PREFIX
+# (default <output prefix>report-index/), which `report_index.py merge` compacts into the index
+REPORT_INDEX_ENABLED = os.getenv("REPORT_INDEX_ENABLED", "0") == "1"
+REPORT_INDEX_PREFIX = os.getenv("REPORT_INDEX_PREFIX")
+
+# boto3 clients, created on first use and shared by all threads
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def get_s3_secrets():
+    """Load s3_secrets.json once, on first use."""
+    with open('s3_secrets.json', 'r') as f:
+        return json.load(f)
+
+
+def get_client(service_name):
+    """
+    Return the shared boto3 client for a service, creating it on first use.
+
+    Args:
+        service_name (str): The boto3 service name, e.g. 's3' or 'redshift-data'.
+
+    Returns:
+        botocore.client.BaseClient: The cached client.
+    """
+    client = _clients.get(service_name)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(service_name)
+            if client is None:
+                import boto3
+                client = boto3.client(service_name)
+                _clients[service_name] = client
+    return client
+
+
+def get_s3_client():
+    """Return the shared S3 client."""
+    return get_client('s3')
+
+
+def get_redshift_client():
+    """Return the shared Redshift Data API client (ensure you have necessary permissions)."""
+    return get_client('redshift-data')
+
+
+class ReportMetrics:
+    """
+    Per-report stage timings and counters, emitted as one EMF JSON line.
+    """
+
+    def __init__(self, object_key):
+        self.object_key = object_key
+        self.values = {}
+        self.start_time = time.perf_counter()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """Time the enclosed block as <name>Ms."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.values[f"{name}Ms"] = round((time.perf_counter() - start) * 1000, 3)
+
+    def add(self, name, value):
+        """Record a counter such as BytesIn or Tradelines."""
+        self.values[name] = value
+
+    def emit(self):
+        """Print the collected metrics in CloudWatch Embedded Metric Format."""
+        self.values["TotalMs"] = round((time.perf_counter() - self.start_time) * 1000, 3)
+        # ru_maxrss is reported in KB on Linux
+        self.values["PeakRssMb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+        units = {}
+        for name in self.values:
+            if name.endswith("Ms"):
+                units[name] = "Milliseconds"
+            elif name.startswith("Bytes"):
+                units[name] = "Bytes"
+            elif name.endswith("Mb"):
+                units[name] = "Megabytes"
+            else:
+                units[name] = "Count"
+
+        print(json.dumps({
+            "_aws": {
+                "Timestamp": int(time.time() * 1000),
+                "CloudWatchMetrics": [{
+                    "Namespace": METRICS_NAMESPACE,
+                    "Dimensions": [["ParseMode"]],
+                    "Metrics": [{"Name": name, "Unit": unit} for name, unit in units.items()],
+                }],
+            },
+            "ParseMode": XML_PARSE_MODE,
+            "ObjectKey": self.object_key,
+            **self.values,
+        }, separators=(",", ":")))
+
+
+class _NullMetrics:
+    """Stand-in for ReportMetrics when METRICS_ENABLED is off; every call is a no-op."""
+
+    _stage = contextlib.nullcontext()
+
+    def stage(self, name):
+        return self._stage
+
+    def add(self, name, value):
+        pass
+
+    def emit(self):
+        pass
+
+
+NULL_METRICS = _NullMetrics()
+
+
+def start_sampled_profiler():
+    """
+    Start cProfile for this report if it is picked by PROFILE_SAMPLE_RATE.
+
+    Returns:
+        cProfile.Profile: The running profiler, or None if this report is not sampled.
+    """
+    if not PROFILE_SAMPLE_RATE or random.random() >= 1 / PROFILE_SAMPLE_RATE:
+        return None
+    if not _profiler_lock.acquire(blocking=False):
+        return None
+    import cProfile
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+
+def stop_sampled_profiler(profiler, object_key, elapsed_ms):
+    """
+    Stop a sampled profiler and print its top functions if the report was slow.
+
+    Args:
+        profiler (cProfile.Profile): The profiler returned by start_sampled_profiler.
+        object_key (str): Key of the profiled report.
+        elapsed_ms (float): Wall time of the report.
+    """
+    profiler.disable()
+    _profiler_lock.release()
+    if elapsed_ms >= PROFILE_SLOW_REPORT_MS:
+        import pstats
+        stream = io.StringIO()
+        pstats.Stats(profiler, stream=stream).sort_stats("cumulative").print_stats(25)
+        print(f"Slow report {object_key} took {elapsed_ms:.0f} ms:\n{stream.getvalue()}")
 
 
 def lambda_handler(event, context):
@@ -53,25 +313,95 @@ def lambda_handler(event, context):
     Args:
         event (dict): Event data passed by AWS Lambda.
         context (LambdaContext): Runtime information provided by Lambda.
-    """
-    # Log the incoming event for debugging
-    print("Lambda Event Received:", json.dumps(event, indent=4))
 
-    # Call run_event with the received event
+    Returns:
+        dict: Status plus a partial-batch-failure report, so only the failed
+              records are retried.
+
+    Raises:
+        Exception: If the event as a whole cannot be processed, or a record of a direct S3
+                   (asynchronous) invocation failed, so Lambda's retries and DLQ still apply.
+    """
+    # Log the record count and message IDs; the full event (report keys included) only at DEBUG
+    records = event.get("Records") or []
+    logger.info(f"Lambda event received with {len(records)} records, message IDs: "
+                f"{[record['messageId'] for record in records if 'messageId' in record]}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"Lambda event: {json.dumps(event)}")
+
+    # Process every record in the event; errors that affect the whole event propagate
     try:
-        run_event(event)
+        report = process_batch(event)
     except Exception as e:
-        print(f"Error in run_event: {e}")
-        return {
-            "statusCode": 500,
-            "body": f"Error in run_event: {e}"
-        }
+        print(f"Error in process_batch: {e}")
+        raise
+
+    failed = len(report["batchItemFailures"])
+    if failed and not is_sqs_batch(event):
+        # Only an SQS event source understands batchItemFailures; fail the invocation so S3's retry applies
+        raise RuntimeError(f"{failed} of {report['processed']} records failed: "
+                           f"{[item['itemIdentifier'] for item in report['batchItemFailures']]}")
     return {
-        "statusCode": 200,
-        "body": "Processing completed successfully."
+        "statusCode": 200 if not failed else 207,
+        "body": f"Processed {report['processed']} records, {failed} failed.",
+        "batchItemFailures": report["batchItemFailures"]
     }
 
 
+def is_sqs_batch(event):
+    """Return True if the event is an SQS batch, whose failures are reported per message."""
+    return any("messageId" in record for record in event.get("Records", []))
+
+
+def iter_s3_records(event):
+    """
+    Collect the records of an event with the identifier their failures are reported under.
+
+    SQS bodies are not parsed here but by unwrap_s3_records, inside the per-message error
+    handling, so one malformed message only fails itself.
+
+    Args:
+        event (dict): The event data passed from Lambda.
+
+    Returns:
+        list: (item_identifier, record) pairs. The identifier is the SQS messageId
+              for SQS records and the object key for direct S3 records.
+
+    Raises:
+        ValueError: If a record is neither an S3 record nor an SQS message.
+    """
+    items = []
+    for record in event["Records"]:
+        if "s3" in record:
+            items.append((record["s3"]["object"]["key"], record))
+        elif "messageId" in record:
+            items.append((record["messageId"], record))
+        else:
+            raise ValueError(f"Unsupported record type: {record.get('eventSource')}")
+    return items
+
+
+def unwrap_s3_records(record):
+    """
+    Return the S3 records carried by one event record.
+
+    Args:
+        record (dict): A direct S3 record, or an SQS message whose body is an S3 notification.
+
+    Returns:
+        list: S3 event records (test notifications carry none).
+
+    Raises:
+        ValueError: If an SQS body is missing or is not JSON.
+    """
+    if "s3" in record:
+        return [record]
+    if "body" not in record:
+        raise ValueError(f"SQS message {record.get('messageId')} has no body")
+    body = json.loads(record["body"])
+    return [r for r in body.get("Records", []) if "s3" in r]
+
+
 def extract_file_content_from_event(event):
     """
     Extracts the file content from the S3 PUT event.
@@ -79,38 +409,184 @@ def extract_file_content_from_event(event):
     Args:
         event (dict): The event data passed from Lambda.
     
+    Returns:
+        str: File content as a string.
+    """
+    return extract_file_content_from_record(event["Records"][0])
+
+
+def extract_file_content_from_record(record):
+    """
+    Extracts the file content of a single S3 event record.
+
+    Args:
+        record (dict): One S3 event record.
+
     Returns:
         str: File content as a string.
     """
     try:
-        # Extract bucket and key from the event
-        bucket_name = event["Records"][0]["s3"]["bucket"]["name"]
-        object_key = event["Records"][0]["s3"]["object"]["key"]
-        logger.info(f"Processing file from bucket: {bucket_name}, key: {object_key}")
-
-        # Get file content from S3
-        response = s3.get_object(Bucket=bucket_name, Key=object_key)
-        file_content = response["Body"].read().decode("utf-8")
+        # Stream and decompress the object, then decode it
+        with open_report_stream(record) as report_stream:
+            file_content = b"".join(report_stream).decode("utf-8")
         return file_content
     except Exception as e:
         print(f"Error extracting file content: {e}")
         raise
 
 
+class ReportTooLargeError(ValueError):
+    """Raised when a report exceeds MAX_REPORT_BYTES."""
+
+
+class _PeekableBody:
+    """File-like wrapper that lets the first bytes of a stream be inspected and read again."""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.buffer = b""
+        self.bytes_read = 0
+
+    def _read_raw(self, size):
+        data = self.raw.read() if size is None or size < 0 else self.raw.read(size)
+        self.bytes_read += len(data)
+        return data
+
+    def peek(self, size):
+        while len(self.buffer) < size:
+            data = self._read_raw(size - len(self.buffer))
+            if not data:
+                break
+            self.buffer += data
+        return self.buffer[:size]
+
+    def read(self, size=-1):
+        if not self.buffer:
+            return self._read_raw(size)
+        if size is None or size < 0:
+            data, self.buffer = self.buffer + self._read_raw(-1), b""
+        else:
+            data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+    def close(self):
+        if hasattr(self.raw, "close"):
+            self.raw.close()
+
+
+class ReportStream:
+    """
+    Iterate over the decompressed bytes of a report body in fixed-size chunks.
+
+    gzip and zstd bodies are recognized by their magic bytes and decompressed on the fly;
+    anything else is passed through. Each read returns at most chunk_size bytes, so neither
+    the whole object nor a decoded copy of it is held in memory, and a compression bomb is
+    stopped by the size guard before it is expanded.
+    """
+
+    def __init__(self, body, object_key="", chunk_size=INPUT_CHUNK_SIZE, max_bytes=MAX_REPORT_BYTES):
+        self.source = _PeekableBody(body)
+        self.object_key = object_key
+        self.chunk_size = chunk_size
+        self.max_bytes = max_bytes
+        self.bytes_out = 0
+
+        magic = self.source.peek(len(ZSTD_MAGIC))
+        if magic.startswith(GZIP_MAGIC):
+            self.encoding = "gzip"
+            self.stream = gzip.GzipFile(fileobj=self.source, mode="rb")
+        elif magic.startswith(ZSTD_MAGIC):
+            import zstandard
+            self.encoding = "zstd"
+            self.stream = zstandard.ZstdDecompressor().stream_reader(self.source, read_across_frames=True)
+        else:
+            self.encoding = "identity"
+            self.stream = self.source
+
+    @property
+    def bytes_in(self):
+        """Bytes read from the underlying body, before decompression."""
+        return self.source.bytes_read
+
+    def __iter__(self):
+        while True:
+            chunk = self.stream.read(self.chunk_size)
+            if not chunk:
+                return
+            self.bytes_out += len(chunk)
+            if self.bytes_out > self.max_bytes or self.bytes_in > self.max_bytes:
+                raise ReportTooLargeError(f"{self.object_key or 'Report'} exceeds MAX_REPORT_BYTES ({self.max_bytes} bytes)")
+            yield chunk
+
+    def close(self):
+        self.source.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def open_report_stream(record, chunk_size=INPUT_CHUNK_SIZE, max_bytes=MAX_REPORT_BYTES):
+    """
+    Open the S3 object of an event record as a ReportStream.
+
+    Args:
+        record (dict): One S3 event record.
+        chunk_size (int): Size of each read from the body.
+        max_bytes (int): Size guard, applied to the compressed and the decompressed bytes.
+
+    Returns:
+        ReportStream: The streaming body, not yet read.
+
+    Raises:
+        ReportTooLargeError: If the object's ContentLength already exceeds max_bytes.
+    """
+    bucket_name = record["s3"]["bucket"]["name"]
+    object_key = record["s3"]["object"]["key"]
+    logger.info(f"Processing file from bucket: {bucket_name}, key: {object_key}")
+
+    response = get_s3_client().get_object(Bucket=bucket_name, Key=object_key)
+    if response.get("ContentLength", 0) > max_bytes:
+        response["Body"].close()
+        raise ReportTooLargeError(f"{object_key} is {response['ContentLength']} bytes, "
+                                  f"over MAX_REPORT_BYTES ({max_bytes} bytes)")
+    return ReportStream(response["Body"], object_key, chunk_size, max_bytes)
+
+
+# CamelCase -> snake_case key cache, filled once per distinct key
+_snake_case_keys = {}
+
+
+def to_snake_case(key):
+    """
+    Convert a CamelCase key to snake_case, caching the result.
+
+    Args:
+        key (str): The key to convert.
+
+    Returns:
+        str: The snake_case key.
+    """
+    snake_case_key = _snake_case_keys.get(key)
+    if snake_case_key is None:
+        snake_case_key = ''.join(['_' + c.lower() if c.isupper() else c for c in key]).lstrip('_')
+        _snake_case_keys[key] = snake_case_key
+    return snake_case_key
+
+
 def generate_snake_case_variables(data_dict):
     """
-    Converts dictionary keys to snake_case and assigns them as global variables.
+    Converts dictionary keys to snake_case.
     
     Args:
         data_dict (dict): The dictionary containing data with keys to convert.
-    """
-    snake_case_vars = {}  # To store the converted snake_case variables for debugging
 
-    for key, value in data_dict.items():
-        # Convert CamelCase to snake_case
-        snake_case_key = ''.join(['_' + c.lower() if c.isupper() else c for c in key]).lstrip('_')
-        globals()[snake_case_key] = value  # Dynamically assign the variable
-        snake_case_vars[snake_case_key] = value  # Save for debugging or verification
+    Returns:
+        dict: The same values keyed by snake_case names.
+    """
+    return {to_snake_case(key): value for key, value in data_dict.items()}
 
 
 def clean_keys(dirty_data):
@@ -128,6 +604,8 @@ def clean_keys(dirty_data):
 
 
 def preprocess_and_parse_xml(xml_content):
+    import xmltodict
+
     try:
         # Remove problematic tags (e.g., OriginalData)
         xml_content = re.sub(r"<OriginalData>.*?</OriginalData>", "", xml_content, flags=re.DOTALL)
@@ -151,53 +629,136 @@ def preprocess_and_parse_xml(xml_content):
         return None
 
 
-# create and display the snapshot dicitonary
-def create_and_display_snapshot(parsed_data):
+class _TrueLinkStreamHandler:
+    """
+    Expat callbacks that build xmltodict-shaped dicts for the kept sections only.
+
+    Attribute names are stored without the '@' prefix, text next to attributes or
+    children goes under '#text', and repeated tags become lists, which is the shape
+    preprocess_and_parse_xml produces after clean_keys.
+    """
+
+    def __init__(self, keep_sections, skip_tags):
+        self.keep_sections = set(keep_sections)
+        self.skip_tags = set(skip_tags)
+        self.stack = []  # open elements as [name, item, text_parts, attribute_names]
+        self.skip_depth = 0
+        self.result = None
+
+    def start_element(self, name, attrs):
+        # Inside a skipped subtree, only track the nesting depth
+        if self.skip_depth:
+            self.skip_depth += 1
+            return
+
+        # Skip OriginalData anywhere and any top-level section we do not need
+        if name in self.skip_tags or (len(self.stack) == 1 and name not in self.keep_sections):
+            self.skip_depth = 1
+            return
+
+        if attrs:
+            self.stack.append([name, dict(attrs), [], set(attrs)])
+        else:
+            self.stack.append([name, None, [], None])
+
+    def end_element(self, name):
+        if self.skip_depth:
+            self.skip_depth -= 1
+            return
+
+        name, item, text_parts, _ = self.stack.pop()
+        text = "".join(text_parts).strip() if text_parts else ""
+        if item is None:
+            item = text or None
+        elif text:
+            item["#text"] = text
+
+        if not self.stack:
+            self.result = {name: item}
+            return
+
+        # Attach to the parent, turning repeated tags into lists
+        parent = self.stack[-1]
+        if parent[1] is None:
+            parent[1] = {}
+        siblings = parent[1]
+        if parent[3] and name in parent[3]:
+            # A child named like an attribute replaces it, as clean_keys does
+            parent[3].discard(name)
+            siblings[name] = item
+        elif name not in siblings:
+            siblings[name] = item
+        elif isinstance(siblings[name], list):
+            siblings[name].append(item)
+        else:
+            siblings[name] = [siblings[name], item]
+
+    def character_data(self, data):
+        if not self.skip_depth and self.stack:
+            self.stack[-1][2].append(data)
+
+
+def stream_parse_xml(chunks, keep_sections=STREAM_SECTIONS, skip_tags=SKIPPED_TAGS):
     """
-    Create a snapshot dictionary from parsed data and display it.
-    Dynamically generate variable names in snake_case for each key.
+    Incrementally parse a TrueLink report without materializing the whole document.
+
+    The OriginalData subtree and any top-level section outside keep_sections are
+    skipped while parsing, so they are never decoded into Python objects.
 
     Args:
-        parsed_data (dict): The parsed data containing a 'Snapshot' key.
+        chunks (str | bytes | iterable): The XML content, or an iterable of str/bytes chunks.
+        keep_sections (tuple): Top-level tags to keep under 'root'.
+        skip_tags (tuple): Tags whose subtrees are dropped wherever they appear.
 
     Returns:
-        dict: The snapshot dictionary with keys converted to integers where applicable.
+        dict: {'root': {...}} in the same shape as preprocess_and_parse_xml, or None on error.
     """
-    # Create snapshot dictionary
-    snapshot_dict = {}
-    for key, val in parsed_data['root']['Snapshot'].items():
-        if val.isdigit():
-            snapshot_dict[key] = int(val)
-        else:
-            snapshot_dict[key] = val
-
-    # Additional computations
-    if snapshot_dict.get('Utilization') == 0:
-        snapshot_dict['Utilization'] = '100%'
-
-    snapshot_dict['closed_account_pct'] = round(
-        snapshot_dict['totalClosedAccounts'] / snapshot_dict['TotalAccounts'], 2
-    )
-    snapshot_dict['open_account_pct'] = round(
-        snapshot_dict['OpenAccounts'] / snapshot_dict['TotalAccounts'], 2
-    )
-    snapshot_dict['deragatory_account_pct'] = round(
-        snapshot_dict['DerogatoryAccounts'] / snapshot_dict['OpenAccounts'], 2
-    )
-
-    # Dynamically generate variable names in snake_case
-    for key, value in snapshot_dict.items():
-        # Convert CamelCase to snake_case
-        snake_case_key = ''.join(['_' + c.lower() if c.isupper() else c for c in key]).lstrip('_')
-        globals()[snake_case_key] = value
+    if isinstance(chunks, (str, bytes)):
+        chunks = (chunks,)
+
+    handler = _TrueLinkStreamHandler(keep_sections, skip_tags)
+    parser = xml.parsers.expat.ParserCreate()
+    parser.buffer_text = True
+    parser.StartElementHandler = handler.start_element
+    parser.EndElementHandler = handler.end_element
+    parser.CharacterDataHandler = handler.character_data
+
+    try:
+        # Wrap content in a single root element, as the legacy parser does
+        parser.Parse(b"<root>", False)
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode("utf-8")
+            parser.Parse(chunk, False)
+        parser.Parse(b"</root>", True)
+        logger.info("Data Parsed Successfully!")
+
+        return handler.result
+
+    except ReportTooLargeError:
+        raise
+    except Exception as e:
+        print(f"An error occurred: {e}")
+        return None
+
 
-    # Display snapshot summary
-    print("Snapshot Summary:\n")
-    for key, value in snapshot_dict.items():
-        print(f"{key}: {value}")
-    print("\n")
+def parse_xml_content(xml_content):
+    """
+    Parse report XML with the parser selected by XML_PARSE_MODE.
+
+    Args:
+        xml_content (str | bytes | iterable): The XML content or chunks of it.
+
+    Returns:
+        dict: The parsed data under a 'root' key, or None on error.
+    """
+    if XML_PARSE_MODE == "legacy":
+        if not isinstance(xml_content, str):
+            xml_content = xml_content.decode("utf-8") if isinstance(xml_content, bytes) \
+                else b"".join(xml_content).decode("utf-8")
+        return preprocess_and_parse_xml(xml_content)
 
-    return snapshot_dict
+    return stream_parse_xml(xml_content)
 
 
 def split_objects_by_keys(parsed_data, keys_to_split):
@@ -266,277 +827,763 @@ def process_truelink_data(parsed_data):
     return big_dict
 
 
-def extract_user_info(big_dict):
-    """Extract user-related information like name, address, age, etc."""
-    # get inquiry date
-    inquiry_date = big_dict['Sources_Source'].get('InquiryDate','')
-
-    # extract borrower name
-    borrower_name = big_dict.get('Borrower_BorrowerName', '')
-
-    # username updated logic
-    if isinstance(borrower_name, dict):
-        # Handle dictionary case
-        name_data = borrower_name.get('Name', {})
-        first = name_data.get('first', '')
-        middle = name_data.get('middle', '')
-        last = name_data.get('last', '')
-    elif isinstance(borrower_name, list) and len(borrower_name) > 0:
-        # Handle list case, process the first entry
-        name_data = borrower_name[0].get('Name', {})
-        first = name_data.get('first', '')
-        middle = name_data.get('middle', '')
-        last = name_data.get('last', '')
-    else:
-        # Handle missing or invalid Borrower_BorrowerName
-        return None
+# tradeline counter plan: (counter key, lives under GrantedTrade, primary value key, fallback value key)
+TRADELINE_FIELD_PLAN = (
+    ("AccountCondition", False, "abbreviation", "description"),
+    ("AccountDesignator", False, "abbreviation", "description"),
+    ("DisputeFlag", False, "abbreviation", "description"),
+    ("IndustryCode", False, "abbreviation", "description"),
+    ("OpenClosed", False, "abbreviation", "description"),
+    ("PayStatus", False, "abbreviation", "description"),
+    ("VerificationIndicator", False, "abbreviation", "description"),
+    ("CreditType", True, "abbreviation", "description"),
+    ("PaymentFrequency", True, "abbreviation", "description"),
+    ("TermType", True, "abbreviation", "description"),
+    ("WorstPayStatus", True, "abbreviation", "description"),
+)
+
+
+# precompute the snake_case names of the tradeline counters
+for _field in [field for field, _, _, _ in TRADELINE_FIELD_PLAN] + ['PayStatusHistory', 'MissingPayStatusHistory']:
+    to_snake_case(_field)
+
+
+def aggregate_tradelines(big_dict):
+    """
+    Build every tradeline counter in a single pass over the TradeLinePartition.
+
+    Visits each tradeline once and looks up each field through TRADELINE_FIELD_PLAN.
+    A single TradeLinePartition element is treated as a list of one.
+
+    Args:
+        big_dict (dict): The dictionary containing TradeLinePartition and related data.
+
+    Returns:
+        dict: A dictionary with processed counters and account_type_counts.
+    """
+    tradeline_list = big_dict.get('TradeLinePartition') or []
+    if isinstance(tradeline_list, dict):
+        tradeline_list = [tradeline_list]
+
+    account_type_counts = {}
+    field_counts = {field: {} for field, _, _, _ in TRADELINE_FIELD_PLAN}
+    plan = [(field, in_granted_trade, primary, fallback, field_counts[field])
+            for field, in_granted_trade, primary, fallback in TRADELINE_FIELD_PLAN]
+    pay_status_history = Counter()
+    missing_pay_status_history = 0
+    history_strings = []
+    industry_abbreviations = []
+
+    for item in tradeline_list:
+        account_type = item.get('accountTypeDescription', '')
+        account_type_counts[account_type] = account_type_counts.get(account_type, 0) + 1
+
+        tradeline = item.get('Tradeline') or {}
+        granted_trade = tradeline.get('GrantedTrade') or {}
+
+        # Abbreviation/description counters
+        for field, in_granted_trade, primary, fallback, counts in plan:
+            specific_field = granted_trade.get(field) if in_granted_trade else tradeline.get(field)
+            if isinstance(specific_field, dict):
+                value = specific_field.get(primary) or specific_field.get(fallback)
+                if value:
+                    counts[value] = counts.get(value, 0) + 1
+
+        industry_code = tradeline.get('IndustryCode')
+        industry_abbreviations.append((industry_code.get('abbreviation') or '') if isinstance(industry_code, dict) else '')
+
+        # Pay status history, from both the status string and MonthlyPayStatus entries
+        history = granted_trade.get('PayStatusHistory', {})
+        history_string = ''
+        if isinstance(history, dict):
+            status_string = history.get('status', '')
+            if status_string:
+                pay_status_history.update(status_string)
+                history_string = status_string
+            monthly_status_list = history.get('MonthlyPayStatus', [])
+            if isinstance(monthly_status_list, list):
+                monthly_statuses = []
+                for monthly_status in monthly_status_list:
+                    status = monthly_status.get('status')
+                    if status:
+                        pay_status_history[status] += 1
+                        monthly_statuses.append(status)
+                if not history_string:
+                    history_string = ''.join(monthly_statuses)
+        else:
+            missing_pay_status_history += 1
+        history_strings.append(history_string)
+
+    converted_data = dict(field_counts)
+    converted_data['PayStatusHistory'] = dict(pay_status_history)
+    converted_data['MissingPayStatusHistory'] = missing_pay_status_history
+
+    return {
+        "account_type_counts": account_type_counts,
+        "converted_data": converted_data,
+        "history_strings": history_strings,
+        "industry_abbreviations": industry_abbreviations
+    }
+
+
+@lru_cache(maxsize=None)
+def _pay_status_lookup_tables():
+    """
+    Build the byte -> status index and status index -> late bucket lookup tables.
+
+    Returns:
+        tuple: (256-entry int8 array indexed by byte value, int8 array of late bucket per status index or -1)
+    """
+    import numpy as np
+
+    status_lookup = np.full(256, PAY_STATUS_UNKNOWN, dtype=np.int8)
+    for code, idx in PAY_STATUS_INDEX.items():
+        status_lookup[ord(code)] = idx
+    status_lookup[0] = PAY_STATUS_PAD  # NUL bytes pad the shorter histories
 
-    # create username variable
-    username = " ".join(part for part in [first, middle, last] if part) or None
+    late_bucket_lookup = np.full(PAY_STATUS_PAD + 1, -1, dtype=np.int8)
+    for code, bucket in LATE_PAYMENT_BUCKETS.items():
+        late_bucket_lookup[PAY_STATUS_INDEX[code]] = LATE_BUCKET_NAMES.index(bucket)
 
-    # Days at current address
+    return status_lookup, late_bucket_lookup
+
+
+def encode_pay_status_history(history_strings):
+    """
+    Encode pay status history strings into a fixed-width integer array.
+
+    Args:
+        history_strings (list): One status string per tradeline, most recent month first.
+
+    Returns:
+        numpy.ndarray: int8 array of shape (tradelines, months) holding PAY_STATUS_INDEX
+                       values, PAY_STATUS_UNKNOWN for unknown symbols and PAY_STATUS_PAD past
+                       the end of shorter histories.
+    """
+    import numpy as np
+
+    status_lookup, _ = _pay_status_lookup_tables()
+    if not history_strings:
+        return np.empty((0, 0), dtype=np.int8)
+
+    # numpy pads every string with NUL bytes to the longest one
     try:
-        days_current_address = (datetime.today() - datetime.strptime(
-            big_dict['Borrower_BorrowerAddress']['dateReported'], '%Y-%m-%d')).days
-    except:
-        days_current_address = None
+        raw = np.array(history_strings, dtype=np.bytes_)
+    except UnicodeEncodeError:
+        raw = np.array([h.encode("ascii", "replace") for h in history_strings], dtype=np.bytes_)
+
+    return status_lookup[raw.view(np.uint8).reshape(len(history_strings), raw.itemsize)]
+
+
+def compute_delinquency_features(history_strings, industry_abbreviations):
+    """
+    Compute delinquency features from the encoded pay status histories.
+
+    Args:
+        history_strings (list): One status string per tradeline, most recent month first.
+        industry_abbreviations (list): The IndustryCode abbreviation of each tradeline.
 
-    # Number of previous addresses
+    Returns:
+        dict: late_payment_counts, months_since_last_late, longest_late_streak and
+              late_payment_rollups (30/60/90+ late months per industry_codes category).
+    """
+    import numpy as np
+
+    _, late_bucket_lookup = _pay_status_lookup_tables()
+    buckets = late_bucket_lookup[encode_pay_status_history(history_strings)]
+    late = buckets >= 0
+
+    # Late months per bucket
+    bucket_counts = np.bincount(buckets[late], minlength=len(LATE_BUCKET_NAMES))
+    late_payment_counts = dict(zip(LATE_BUCKET_NAMES, bucket_counts.tolist()))
+
+    # Months since the most recent late payment on any tradeline
+    has_late = late.any(axis=1)
+    months_since_last_late = int(late.argmax(axis=1)[has_late].min()) if has_late.any() else None
+
+    # Longest run of consecutive late months: running count minus the count at the last on-time month
+    running = np.cumsum(late, axis=1, dtype=np.int32)
+    resets = np.maximum.accumulate(np.where(late, 0, running), axis=1)
+    longest_late_streak = int((running - resets).max()) if late.size else 0
+
+    # 30/60/90+ late months per industry category
+    late_payment_rollups = {}
+    if has_late.any():
+        codes, code_index = np.unique(np.array(industry_abbreviations, dtype=str), return_inverse=True)
+        rows, cols = np.nonzero(late)
+        per_code = np.bincount(code_index[rows] * len(LATE_BUCKET_NAMES) + buckets[rows, cols],
+                               minlength=len(codes) * len(LATE_BUCKET_NAMES)).reshape(len(codes), -1)
+        for code, counts in zip(codes.tolist(), per_code.tolist()):
+            if any(counts):
+                rollup = late_payment_rollups.setdefault(industry_codes.get(code, "Other"), dict.fromkeys(LATE_BUCKET_NAMES, 0))
+                for bucket, count in zip(LATE_BUCKET_NAMES, counts):
+                    rollup[bucket] += count
+
+    return {
+        "late_payment_counts": late_payment_counts,
+        "months_since_last_late": months_since_last_late,
+        "longest_late_streak": longest_late_streak,
+        "late_payment_rollups": late_payment_rollups,
+    }
+
+
+def _int_if_digits(value):
+    """Convert a digit-only string to int, leaving any other value as is."""
+    return int(value) if isinstance(value, str) and value.isdigit() else value
+
+
+def _utilization(value):
+    """Snapshot Utilization, with the bureau's 0 meaning fully utilized."""
+    value = _int_if_digits(value)
+    return '100%' if value == 0 else value
+
+
+def _ratio(values):
+    """Round numerator / denominator to 2 places, or None when it cannot be computed."""
+    numerator, denominator = (_int_if_digits(value) for value in values)
     try:
-        num_previous_addresses = len(big_dict.get('Borrower_PreviousAddress', []))
-    except:
-        num_previous_addresses = None
+        return round(numerator / denominator, 2)
+    except (TypeError, ZeroDivisionError):
+        return None
 
-    # User's age
+
+def _int_or_none(value):
+    """Convert a value to int, or None when it is not a number."""
     try:
-        users_age = round((datetime.today() - datetime.strptime(
-            big_dict['Borrower_Birth']['date'], '%Y-%m-%d')).days / 365, 2)
-    except:
-        users_age = None
-      
-    return inquiry_date, username, days_current_address, num_previous_addresses, users_age    
+        return int(value)
+    except (TypeError, ValueError):
+        return None
 
 
-def extract_employers(big_dict):
+def _full_name(name_data):
+    """Join the first, middle and last name parts of a Name element."""
+    if not isinstance(name_data, dict):
+        return None
+    return " ".join(name_data[part] for part in ('first', 'middle', 'last') if name_data.get(part)) or None
+
+
+def _days_since(date_string):
+    """Days between a YYYY-MM-DD date and today, or None when it does not parse."""
+    # Split and int() accept what strptime('%Y-%m-%d') does at a fraction of its cost
+    try:
+        year, month, day = date_string.split('-')
+        if not (len(year) == 4 and 1 <= len(month) <= 2 and 1 <= len(day) <= 2
+                and year.isdigit() and month.isdigit() and day.isdigit()):
+            return None
+        return (datetime.today() - datetime(int(year), int(month), int(day))).days
+    except (AttributeError, ValueError):
+        return None
+
+
+def _years_since(date_string):
+    """Years between a YYYY-MM-DD date and today, rounded to 2 places."""
+    days = _days_since(date_string)
+    return None if days is None else round(days / 365, 2)
+
+
+def _employers(employers):
+    """Number the employers as employer_1, employer_2, ... with their name and dateUpdated."""
+    return {
+        f"employer_{idx}": {'name': employer.get('name', 'Unknown'), 'dateUpdated': employer.get('dateUpdated', 'Unknown')}
+        for idx, employer in enumerate((employer for employer in employers if isinstance(employer, dict)), start=1)
+    }
+
+
+def _value_counts(values):
+    """Count the occurrences of each non-empty value."""
+    return dict(Counter(value for value in values if value and isinstance(value, str)))
+
+
+# declarative feature spec: (output name, path, transform, default), evaluated in this order
+# - paths are dotted keys; "Snapshot." paths read the Snapshot section, all others read big_dict
+# - a list met where one element is expected yields its first element
+# - "name[]" fans out over every element, turning a single element into a list of one
+# - a tuple of paths passes a tuple of values to the transform
+# - the default is used when a path is missing; a transform of None keeps the value as is
+FEATURE_SPEC = [
+    ("total_accounts", "Snapshot.TotalAccounts", _int_if_digits, None),
+    ("total_closed_accounts", "Snapshot.totalClosedAccounts", _int_if_digits, None),
+    ("delinquent_accounts", "Snapshot.DelinquentAccounts", _int_if_digits, None),
+    ("derogatory_accounts", "Snapshot.DerogatoryAccounts", _int_if_digits, None),
+    ("open_accounts", "Snapshot.OpenAccounts", _int_if_digits, None),
+    ("total_balances", "Snapshot.TotalBalances", _int_if_digits, None),
+    ("total_monthly_payments", "Snapshot.TotalMonthlyPayments", _int_if_digits, None),
+    ("number_of_inquiries", "Snapshot.NumberOfInquiries", _int_if_digits, None),
+    ("total_public_records", "Snapshot.TotalPublicRecords", _int_if_digits, None),
+    ("balance_open_revolving_accounts", "Snapshot.BalanceOpenRevolvingAccounts", _int_if_digits, None),
+    ("total_open_revolving_accounts", "Snapshot.TotalOpenRevolvingAccounts", _int_if_digits, None),
+    ("balance_open_installment_accounts", "Snapshot.BalanceOpenInstallmentAccounts", _int_if_digits, None),
+    ("total_open_installment_accounts", "Snapshot.TotalOpenInstallmentAccounts", _int_if_digits, None),
+    ("balance_open_mortgage_accounts", "Snapshot.BalanceOpenMortgageAccounts", _int_if_digits, None),
+    ("total_open_mortgage_accounts", "Snapshot.TotalOpenMortgageAccounts", _int_if_digits, None),
+    ("balance_open_collection_accounts", "Snapshot.BalanceOpenCollectionAccounts", _int_if_digits, None),
+    ("total_open_collection_accounts", "Snapshot.TotalOpenCollectionAccounts", _int_if_digits, None),
+    ("balance_open_other_accounts", "Snapshot.BalanceOpenOtherAccounts", _int_if_digits, None),
+    ("total_open_other_accounts", "Snapshot.TotalOpenOtherAccounts", _int_if_digits, None),
+    ("available_credit", "Snapshot.AvailableCredit", _int_if_digits, None),
+    ("utilization", "Snapshot.Utilization", _utilization, None),
+    ("on_time_payment_percentage", "Snapshot.OnTimePaymentPercentage", _int_if_digits, None),
+    ("late_payment_percentage", "Snapshot.LatePaymentPercentage", _int_if_digits, None),
+    ("date_of_oldest_trade", "Snapshot.DateOfOldestTrade", _int_if_digits, None),
+    ("age_of_credit", "Snapshot.AgeOfCredit", _int_if_digits, None),
+    ("closed_account_pct", ("Snapshot.totalClosedAccounts", "Snapshot.TotalAccounts"), _ratio, None),
+    ("open_account_pct", ("Snapshot.OpenAccounts", "Snapshot.TotalAccounts"), _ratio, None),
+    ("deragatory_account_pct", ("Snapshot.DerogatoryAccounts", "Snapshot.OpenAccounts"), _ratio, None),
+    ("inquiry_date", "Sources_Source.InquiryDate", None, ''),
+    ("username", "Borrower_BorrowerName.Name", _full_name, None),
+    ("days_current_address", "Borrower_BorrowerAddress.dateReported", _days_since, None),
+    ("num_previous_addresses", "Borrower_PreviousAddress[]", len, 0),
+    ("users_age", "Borrower_Birth.date", _years_since, None),
+    ("recent_employers", "Borrower_Employer[]", _employers, None),
+    ("risk_score", "Borrower_CreditScore.riskScore", _int_or_none, None),
+    ("factor_type_counts", "Borrower_CreditScore.CreditScoreFactor[].FactorType", _value_counts, None),
+    ("messages", "Message[].Code.symbol", _value_counts, None),
+]
+
+# sentinel for a path that is not present in the report
+_MISSING = object()
+
+
+def _compile_step(keys, fan_out, next_accessor, tail_keys=()):
     """
-    Extract employer data from the Borrower_Employer field.
-    
+    Build the accessor closure for a run of path steps.
+
     Args:
-        big_dict (dict): The main dictionary containing Borrower_Employer.
-    
+        keys (tuple): Dictionary keys read in turn.
+        fan_out (bool): Apply the rest of the path to every element of the last value.
+        next_accessor (callable): Accessor for the rest of the path, None for the last run.
+        tail_keys (tuple): Plain keys ending the path after a fan-out, read inline for every
+                           element instead of through a closure call per element.
+
     Returns:
-        dict: A dictionary of employers with their names and dateUpdated values.
-    """
-    recent_employers = {}
-
-    # Check if Borrower_Employer exists in the dictionary
-    if 'Borrower_Employer' in big_dict and big_dict['Borrower_Employer']:
-        # Handle list of employers
-        if isinstance(big_dict['Borrower_Employer'], list):
-            for idx, employer in enumerate(big_dict['Borrower_Employer'], start=1):
-                name = employer.get('name', 'Unknown')  # Default to 'Unknown' if name is missing
-                date_updated = employer.get('dateUpdated', 'Unknown')  # Default to 'Unknown' if dateUpdated is missing
-                recent_employers[f"employer_{idx}"] = {'name': name, 'dateUpdated': date_updated}
-        # Handle a single employer object
-        elif isinstance(big_dict['Borrower_Employer'], dict):
-            name = big_dict['Borrower_Employer'].get('name', 'Unknown')
-            date_updated = big_dict['Borrower_Employer'].get('dateUpdated', 'Unknown')
-            recent_employers['employer_1'] = {'name': name, 'dateUpdated': date_updated}
+        callable: node -> value, or _MISSING when a key is absent.
+    """
+    def step(node):
+        for key in keys:
+            # A repeated element where one was expected: read the first entry
+            if isinstance(node, list):
+                node = node[0] if node else None
+            if not isinstance(node, dict):
+                return [] if fan_out else _MISSING
+            node = node.get(key, _MISSING)
+            if node is _MISSING:
+                return [] if fan_out else _MISSING
+
+        if fan_out:
+            # Normalize a single element to a list of one
+            items = [] if node is None else node if isinstance(node, list) else [node]
+            if next_accessor is not None:
+                return [result for result in map(next_accessor, items) if result is not _MISSING]
+            if not tail_keys:
+                return items
+
+            results = []
+            for item in items:
+                for key in tail_keys:
+                    if isinstance(item, list):
+                        item = item[0] if item else None
+                    item = item.get(key, _MISSING) if isinstance(item, dict) else _MISSING
+                    if item is _MISSING:
+                        break
+                else:
+                    results.append(item)
+            return results
+
+        return node if next_accessor is None else next_accessor(node)
+    return step
+
+
+def _compile_path(path):
+    """
+    Compile a dotted spec path into (source index, accessor).
+
+    Source 0 is the Snapshot section and source 1 is big_dict. Consecutive plain keys
+    share one closure, so only fan-out steps add a call per element, and a single key
+    is read with one dict lookup.
+    """
+    parts = path.split(".")
+    source = 0 if parts[0] == "Snapshot" else 1
+    if source == 0:
+        parts = parts[1:]
+
+    if len(parts) == 1 and not parts[0].endswith("[]"):
+        key = parts[0]
+        general = _compile_step((key,), False, None)
+
+        def get_key(node):
+            return node.get(key, _MISSING) if type(node) is dict else general(node)
+        return source, get_key
+
+    # Split the path into runs of keys, each ending at a fan-out step or the end of the path
+    runs, keys = [], []
+    for part in parts:
+        if part.endswith("[]"):
+            runs.append((tuple(keys + [part[:-2]]), True))
+            keys = []
         else:
-            print("Borrower_Employer is neither a list nor a dictionary.")
-    else:
-        recent_employers = {}
-    
-    return recent_employers
+            keys.append(part)
+    if keys:
+        runs.append((tuple(keys), False))
 
+    # Plain keys after the last fan-out are read inline by the fan-out step
+    tail_keys = ()
+    if len(runs) > 1 and not runs[-1][1]:
+        tail_keys = runs.pop()[0]
 
-def extract_risk_score_and_factors(big_dict):
-    """Extract risk score and factor type counts."""
-    risk_score = int(big_dict['Borrower_CreditScore']['riskScore'])
-    factor_type_counts = {}
-    for factor in big_dict['Borrower_CreditScore'].get('CreditScoreFactor', []):
-        factor_type = factor.get('FactorType', '')
-        if factor_type:
-            factor_type_counts[factor_type] = factor_type_counts.get(factor_type, 0) + 1
+    accessor = None
+    for keys, fan_out in reversed(runs):
+        accessor = _compile_step(keys, fan_out, accessor, tail_keys if accessor is None else ())
+    return source, accessor
 
-    return risk_score, factor_type_counts
 
-def extract_tradeline_stats(big_dict):
-    """Extract tradeline statistics."""
-    tradeline_list = big_dict.get('TradeLinePartition', [])
-    account_type_counts = dict(Counter(item['accountTypeDescription'] for item in tradeline_list))
+def compile_feature_spec(spec):
+    """
+    Compile a feature spec into one evaluator, done once at import.
 
-    # Initialize counters
-    counters = {key: Counter() for key in [
-        'AccountCondition', 'AccountDesignator', 'DisputeFlag', 'IndustryCode',
-        'OpenClosed', 'PayStatus', 'VerificationIndicator', 'CreditType',
-        'PaymentFrequency', 'TermType', 'WorstPayStatus', 'PayStatusHistory']}
-    counters['MissingPayStatusHistory'] = 0
+    Every distinct path is compiled once, however many rules read it (the ratio rules reuse
+    the Snapshot counts), and is resolved once per report before the transforms run.
 
-    # Process tradelines
-    for item in tradeline_list:
-        tradeline = item.get('Tradeline', {})
-        for key in counters:
-            if key == 'PayStatusHistory':
-                pay_status_history = tradeline.get('GrantedTrade', {}).get('PayStatusHistory', {})
-                if isinstance(pay_status_history, dict):
-                    status_string = pay_status_history.get('status', '')
-                    if status_string:
-                        counters[key].update(status_string)
-            elif key in ['WorstPayStatus', 'CreditType', 'PaymentFrequency', 'TermType']:
-                specific_field = tradeline.get('GrantedTrade', {}).get(key, {})
-                value = specific_field.get('abbreviation') or specific_field.get('description')
-                if value:
-                    counters[key].update([value])
+    Args:
+        spec (list): (output name, path or tuple of paths, transform, default) entries.
+
+    Returns:
+        callable: (snapshot, big_dict) sources -> {output name: value}, in spec order.
+    """
+    path_indexes = {}
+    accessors = []
+    rules = []
+    for name, path, transform, default in spec:
+        for sub_path in path if isinstance(path, tuple) else (path,):
+            if sub_path not in path_indexes:
+                path_indexes[sub_path] = len(accessors)
+                accessors.append(_compile_path(sub_path))
+        if isinstance(path, tuple):
+            rules.append((name, tuple(path_indexes[sub_path] for sub_path in path), True, transform, default))
+        else:
+            rules.append((name, path_indexes[path], False, transform, default))
+
+    def evaluate(sources):
+        values = [accessor(sources[source]) for source, accessor in accessors]
+        output = {}
+        for name, index, combined, transform, default in rules:
+            if combined:
+                value = tuple(values[i] for i in index)
+                missing = _MISSING in value
             else:
-                value = tradeline.get(key, {}).get('abbreviation') or tradeline.get(key, {}).get('description')
-                if value:
-                    counters[key].update([value])
+                value = values[index]
+                missing = value is _MISSING
+            output[name] = default if missing else transform(value) if transform else value
+        return output
+    return evaluate
 
-    converted_data = {key: dict(val) if isinstance(val, Counter) else val for key, val in counters.items()}
 
-    # Dictionary to store snake_case variable names and their values
-    dynamic_variables = {}
+COMPILED_FEATURE_SPEC = compile_feature_spec(FEATURE_SPEC)
 
-    # Map keys from `converted_data` to variables with underscores
-    for key in counters.keys():
-        # Convert CamelCase to snake_case with underscores
-        snake_case_key = ''.join(['_' + c.lower() if c.isupper() else c for c in key]).lstrip('_')
-        # Dynamically create variables with the snake_case names
-        globals()[snake_case_key] = converted_data[key]
 
-    # Map keys from `converted_data` to snake_case variable names
-    for key in counters.keys():
-        # Convert CamelCase to snake_case
-        snake_case_key = ''.join(['_' + c.lower() if c.isupper() else c for c in key]).lstrip('_')
-        # Add to the dictionary
-        dynamic_variables[snake_case_key] = converted_data[key]
+def evaluate_features(parsed_data, big_dict, compiled_spec=COMPILED_FEATURE_SPEC):
+    """
+    Evaluate the compiled feature spec over one report, resolving each path once.
+
+    On well-formed reports the output matches the hand-written extractors the spec replaced.
+    Three cases now differ on purpose: a single PreviousAddress element counts as one address
+    (not as its number of keys), a single Message element is counted (it used to be skipped),
+    and a ratio with a zero or missing denominator is None (it used to raise ZeroDivisionError).
+
+    Args:
+        parsed_data (dict): The parsed data under a 'root' key.
+        big_dict (dict): The flattened TrueLinkCreditReportType from process_truelink_data.
+        compiled_spec (callable): Output of compile_feature_spec.
+
+    Returns:
+        dict: Feature name -> value, in spec order.
+    """
+    return compiled_spec((parsed_data['root'].get('Snapshot') or {}, big_dict))
+
+
+def _serialize_json_output(output_data, compression):
+    """Serialize output_data as compact JSON, optionally gzip or zstd compressed."""
+    body = json.dumps(output_data, separators=(",", ":")).encode("utf-8")
+    if compression == "gzip":
+        return gzip.compress(body, compresslevel=6), ".json.gz", "application/json"
+    if compression == "zstd":
+        import zstandard
+        return zstandard.ZstdCompressor(level=3).compress(body), ".json.zst", "application/json"
+    if compression == "none":
+        return body, ".json", "application/json"
+    raise ValueError(f"Unsupported output compression: {compression}")
+
+
+# parquet column types of the report summary; the remaining snapshot fields are stored as float64
+PARQUET_STRING_COLUMNS = ["date_of_oldest_trade", "age_of_credit", "inquiry_date", "username"]
+PARQUET_INT_COLUMNS = ["days_current_address", "num_previous_addresses", "risk_score",
+                       "months_since_last_late", "longest_late_streak"]
+PARQUET_MAP_COLUMNS = ["factor_type_counts", "account_type_counts"] + TRADELINE_OUTPUT_KEYS + \
+                      ["late_payment_counts", "messages"]
+
+
+def _as_float(value):
+    """Coerce snapshot values such as 12, '12.5' or '100%' to float, None otherwise."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(str(value).rstrip("%"))
+    except ValueError:
+        return None
 
-    # Iterate and print results
-    for variable_name, value in dynamic_variables.items():
-        formatted_name = variable_name.replace('_', '').capitalize()
-        # print(f"{formatted_name}: {value}")     
 
-    return account_type_counts, dynamic_variables
+def _serialize_parquet_output(output_data, compression):
+    """Serialize output_data as a one-row Parquet file with the counters as map columns."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    fields, row = [], {}
+    for key in output_data:
+        value = output_data[key]
+        if key in PARQUET_STRING_COLUMNS:
+            fields.append(pa.field(key, pa.string()))
+            row[key] = None if value is None else str(value)
+        elif key in PARQUET_INT_COLUMNS:
+            fields.append(pa.field(key, pa.int64()))
+            row[key] = value
+        elif key in PARQUET_MAP_COLUMNS:
+            fields.append(pa.field(key, pa.map_(pa.string(), pa.int64())))
+            row[key] = list(value.items()) if isinstance(value, dict) else None
+        elif key == "late_payment_rollups":
+            fields.append(pa.field(key, pa.map_(pa.string(), pa.map_(pa.string(), pa.int64()))))
+            row[key] = [(category, list(counts.items())) for category, counts in value.items()]
+        elif key == "recent_employers":
+            employer_type = pa.struct([("name", pa.string()), ("dateUpdated", pa.string())])
+            fields.append(pa.field(key, pa.map_(pa.string(), employer_type)))
+            row[key] = list(value.items())
+        else:
+            fields.append(pa.field(key, pa.float64()))
+            row[key] = _as_float(value)
+
+    table = pa.Table.from_pylist([row], schema=pa.schema(fields))
+    buffer = io.BytesIO()
+    pq.write_table(table, buffer, compression=None if compression == "none" else compression)
+    return buffer.getvalue(), ".parquet", "application/vnd.apache.parquet"
+
+
+def _date_or_none(date_string):
+    """Parse a YYYY-MM-DD string to a date, or None when it does not parse."""
+    try:
+        # fromisoformat is several times faster than strptime on a per-tradeline column
+        return date.fromisoformat(date_string[:10])
+    except (TypeError, ValueError):
+        return None
 
-def parse_messages(big_dict):
+
+def _string_or_none(value):
+    """Keep non-empty strings, None otherwise."""
+    return value if isinstance(value, str) and value else None
+
+
+# tradeline table columns, one row per TradeLinePartition: (column, path, transform, default, Arrow type)
+# (paths are relative to the TradeLinePartition entry and follow the FEATURE_SPEC path rules)
+TRADELINE_TABLE_SPEC = [
+    ("account_type", "accountTypeDescription", _string_or_none, None, "string"),
+    ("creditor_name", "Tradeline.creditorName", _string_or_none, None, "string"),
+    ("bureau", "Tradeline.bureau", _string_or_none, None, "string"),
+    ("industry_code", "Tradeline.IndustryCode.abbreviation", _string_or_none, None, "string"),
+    ("open_closed", "Tradeline.OpenClosed.abbreviation", _string_or_none, None, "string"),
+    ("account_condition", "Tradeline.AccountCondition.abbreviation", _string_or_none, None, "string"),
+    ("account_designator", "Tradeline.AccountDesignator.abbreviation", _string_or_none, None, "string"),
+    ("pay_status", "Tradeline.PayStatus.abbreviation", _string_or_none, None, "string"),
+    ("worst_pay_status", "Tradeline.GrantedTrade.WorstPayStatus.abbreviation", _string_or_none, None, "string"),
+    ("credit_type", "Tradeline.GrantedTrade.CreditType.abbreviation", _string_or_none, None, "string"),
+    ("term_type", "Tradeline.GrantedTrade.TermType.abbreviation", _string_or_none, None, "string"),
+    ("current_balance", "Tradeline.currentBalance", _as_float, None, "float64"),
+    ("high_balance", "Tradeline.highBalance", _as_float, None, "float64"),
+    ("credit_limit", "Tradeline.GrantedTrade.CreditLimit", _as_float, None, "float64"),
+    ("monthly_payment", "Tradeline.GrantedTrade.monthlyPayment", _as_float, None, "float64"),
+    ("amount_past_due", "Tradeline.GrantedTrade.amountPastDue", _as_float, None, "float64"),
+    ("late_30_count", "Tradeline.GrantedTrade.late30Count", _int_or_none, None, "int64"),
+    ("late_60_count", "Tradeline.GrantedTrade.late60Count", _int_or_none, None, "int64"),
+    ("late_90_count", "Tradeline.GrantedTrade.late90Count", _int_or_none, None, "int64"),
+    ("date_opened", "Tradeline.dateOpened", _date_or_none, None, "date32"),
+    ("date_reported", "Tradeline.dateReported", _date_or_none, None, "date32"),
+    ("date_closed", "Tradeline.dateClosed", _date_or_none, None, "date32"),
+]
+
+COMPILED_TRADELINE_TABLE_SPEC = compile_feature_spec([column[:4] for column in TRADELINE_TABLE_SPEC])
+
+
+@lru_cache(maxsize=None)
+def tradeline_table_schema():
+    """Arrow schema of the tradeline table: the spec columns plus the pay status history."""
+    import pyarrow as pa
+
+    fields = [pa.field(name, getattr(pa, arrow_type)()) for name, _, _, _, arrow_type in TRADELINE_TABLE_SPEC]
+    fields.append(pa.field("pay_status_history", pa.string()))
+    return pa.schema(fields)
+
+
+def build_tradeline_table(big_dict, history_strings=None):
     """
-    Parse 'Message' tags from the dictionary and count symbol occurrences.
+    Flatten the TradeLinePartition into a typed Arrow record batch, one row per tradeline.
 
     Args:
-        big_dict (dict): The dictionary containing 'Message' tags.
+        big_dict (dict): The flattened TrueLinkCreditReportType from process_truelink_data.
+        history_strings (list): Pay status history per tradeline from aggregate_tradelines;
+                                recomputed when not given.
 
     Returns:
-        Counter: A Counter object with counts of each symbol in the 'Code' tags.
+        pyarrow.RecordBatch: Columns as in tradeline_table_schema().
     """
-    message_symbols = Counter()
+    import pyarrow as pa
 
-    # Ensure 'Message' key exists and is a list
-    messages = big_dict.get('Message', [])
+    tradeline_list = big_dict.get('TradeLinePartition') or []
+    if isinstance(tradeline_list, dict):
+        tradeline_list = [tradeline_list]
+    if history_strings is None:
+        history_strings = aggregate_tradelines(big_dict)["history_strings"]
 
-    # Iterate through each message
-    for message in messages:
-        if isinstance(message, dict):  # Ensure each message is a dictionary
-            # Extract the 'symbol' from the 'Code' tag
-            code = message.get('Code')
-            if isinstance(code, dict):  # Ensure 'Code' is a dictionary
-                symbol = code.get('symbol')
-                if symbol:  # Only count if the symbol exists
-                    message_symbols.update([symbol])
+    # Evaluate the compiled column spec once per tradeline
+    rows = [COMPILED_TRADELINE_TABLE_SPEC((None, item)) for item in tradeline_list]
+    columns = {name: [row[name] for row in rows] for name, *_ in TRADELINE_TABLE_SPEC}
+    columns["pay_status_history"] = [history or None for history in history_strings]
 
-    return dict(message_symbols)
+    schema = tradeline_table_schema()
+    return pa.RecordBatch.from_arrays([pa.array(columns[field.name], type=field.type) for field in schema],
+                                      schema=schema)
 
 
-def process_and_generate_variables(snapshot_dict):
+def serialize_tradeline_table(tradeline_table, source_key, compression=OUTPUT_COMPRESSION):
     """
-    Process snapshot to generate snake_case variables and handle errors.
-    
+    Serialize a tradeline record batch as Parquet, tagged with its source object key.
+
     Args:
-        snapshot_dict (dict): Snapshot data dictionary.
-        big_dict (dict): Main dictionary containing parsed data.
+        tradeline_table (pyarrow.RecordBatch): Output of build_tradeline_table.
+        source_key (str): Key of the source XML object, added as a column for joins with the summary.
+        compression (str): "none", "gzip" or "zstd".
+
+    Returns:
+        bytes: The Parquet file.
     """
-    generate_snake_case_variables(snapshot_dict)
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    table = pa.Table.from_batches([tradeline_table])
+    table = table.append_column("source_key", pa.array([source_key] * table.num_rows, type=pa.string()))
+    buffer = io.BytesIO()
+    pq.write_table(table, buffer, compression=None if compression == "none" else compression)
+    return buffer.getvalue()
 
 
-def process_tradeline_partition(big_dict):
+# output format -> serializer returning (body bytes, file extension, content type)
+OUTPUT_SERIALIZERS = {
+    "json": _serialize_json_output,
+    "parquet": _serialize_parquet_output,
+}
+
+
+def serialize_output(output_data, output_format=OUTPUT_FORMAT, compression=OUTPUT_COMPRESSION):
     """
-    Process the TradeLinePartition in the big_dict and generate statistics.
-    
+    Serialize a report summary in memory.
+
     Args:
-        big_dict (dict): The dictionary containing TradeLinePartition and related data.
-    
+        output_data (dict): The report features.
+        output_format (str): "json" or "parquet".
+        compression (str): "none", "gzip" or "zstd".
+
     Returns:
-        dict: A dictionary with processed counters and account_type_counts.
+        tuple: (body bytes, file extension, content type)
     """
-    tradeline_list = big_dict['TradeLinePartition']    
-    account_type_counts = dict(Counter(item['accountTypeDescription'] for item in tradeline_list))
-
-    # Initialize counters and account type counts
-    counters = {
-        'AccountCondition': Counter(),
-        'AccountDesignator': Counter(),
-        'DisputeFlag': Counter(),
-        'IndustryCode': Counter(),
-        'OpenClosed': Counter(),
-        'PayStatus': Counter(),
-        'VerificationIndicator': Counter(),
-        'CreditType': Counter(),
-        'PaymentFrequency': Counter(),
-        'TermType': Counter(),
-        'WorstPayStatus': Counter(),
-        'PayStatusHistory': Counter(),
-        'MissingPayStatusHistory': 0
-    }
+    if output_format not in OUTPUT_SERIALIZERS:
+        raise ValueError(f"Unsupported output format: {output_format}")
+    return OUTPUT_SERIALIZERS[output_format](output_data, compression)
 
-    # Process TradeLinePartition
-    tradeline_list = big_dict.get('TradeLinePartition', [])
-    account_type_counts = dict(Counter(item.get('accountTypeDescription', '') for item in tradeline_list))
 
-    for item in tradeline_list:
-        tradeline = item.get('Tradeline', {})  # Access the nested 'Tradeline' key
-        for key in counters:
-            if key == 'PayStatusHistory':
-                # Safely access PayStatusHistory
-                pay_status_history = tradeline.get('GrantedTrade', {}).get('PayStatusHistory', {})
-                if isinstance(pay_status_history, dict):
-                    # Process 'status' string if available
-                    status_string = pay_status_history.get('status', '')
-                    if status_string:
-                        counters['PayStatusHistory'].update(status_string)
-
-                    # Process 'MonthlyPayStatus' if available
-                    monthly_status_list = pay_status_history.get('MonthlyPayStatus', [])
-                    if isinstance(monthly_status_list, list):
-                        for monthly_status in monthly_status_list:
-                            status = monthly_status.get('status')
-                            if status:  # Only update if status is valid
-                                counters['PayStatusHistory'].update([status])
-                else:
-                    # Log missing or invalid PayStatusHistory
-                    counters['MissingPayStatusHistory'] += 1
-
-            elif key in ['WorstPayStatus', 'CreditType', 'PaymentFrequency', 'TermType']:
-                # Safely access the relevant key under GrantedTrade
-                specific_field = tradeline.get('GrantedTrade', {}).get(key, {})
-                if isinstance(specific_field, dict):
-                    # Check for abbreviation or description
-                    value = specific_field.get('abbreviation') or specific_field.get('description')
-                    if value:
-                        counters[key].update([value])
+def resolve_output_location(bucket_name=None, prefix=None):
+    """
+    Resolve the output bucket and key prefix.
 
-            else:
-                # Safely access abbreviation or description
-                value = tradeline.get(key, {}).get('abbreviation') or tradeline.get(key, {}).get('description')
-                if value:  # Ensure value is not None
-                    counters[key].update([value])
+    s3_secrets.json is only read when neither the arguments nor the environment set them.
 
-    # Convert counters to dictionaries for easier processing
-    converted_data = {key: dict(val) if isinstance(val, Counter) else val for key, val in counters.items()}
+    Args:
+        bucket_name (str): Output bucket, defaults to OUTPUT_BUCKET.
+        prefix (str): Output key prefix, defaults to OUTPUT_PREFIX.
 
-    return {
-        "account_type_counts": account_type_counts,
-        "converted_data": converted_data
-    }
+    Returns:
+        tuple: (bucket_name, prefix)
+    """
+    if bucket_name is None:
+        bucket_name = OUTPUT_BUCKET or get_s3_secrets().get("bucket")
+    if prefix is None:
+        prefix = OUTPUT_PREFIX if OUTPUT_PREFIX is not None else get_s3_secrets().get("key", "")
+    return bucket_name, prefix
+
+
+def report_output_key(source_key, prefix, extension):
+    """Build the output key of a report from its source filename, without the .xml and compression suffixes."""
+    filename = os.path.basename(source_key)
+    for suffix in (".gz", ".zst"):
+        if filename.endswith(".xml" + suffix):
+            filename = filename[:-len(suffix)]
+    filename = filename.replace(".xml", "")
+    return f"{prefix}{filename}{extension}"
+
+
+def write_report_output(output_data, source_key, bucket_name=None, prefix=None,
+                        output_format=OUTPUT_FORMAT, compression=OUTPUT_COMPRESSION, metrics=NULL_METRICS):
+    """
+    Serialize a report summary and upload it with a single put_object, without touching /tmp.
+
+    Args:
+        output_data (dict): The report features.
+        source_key (str): Key of the source XML object; its filename names the output.
+        bucket_name (str): Output bucket, defaults to OUTPUT_BUCKET.
+        prefix (str): Output key prefix, defaults to OUTPUT_PREFIX.
+        output_format (str): "json" or "parquet".
+        compression (str): "none", "gzip" or "zstd".
+        metrics (ReportMetrics): Collects stage timings; a no-op by default.
+
+    Returns:
+        str: The S3 key the output was written to.
+    """
+    with metrics.stage("Serialize"):
+        body, extension, content_type = serialize_output(output_data, output_format, compression)
+    metrics.add("BytesOut", len(body))
+
+    bucket_name, prefix = resolve_output_location(bucket_name, prefix)
+
+    s3_key = report_output_key(source_key, prefix, extension)
+
+    with metrics.stage("Upload"):
+        get_s3_client().put_object(Bucket=bucket_name, Key=s3_key, Body=body, ContentType=content_type)
+    print(f"Uploaded {len(body)} bytes to s3://{bucket_name}/{s3_key}")
+    return s3_key
+
+
+def write_tradeline_table(tradeline_table, source_key, bucket_name=None, prefix=None,
+                          compression=OUTPUT_COMPRESSION, metrics=NULL_METRICS):
+    """
+    Upload the tradeline table of a report as Parquet, next to its summary.
+
+    Args:
+        tradeline_table (pyarrow.RecordBatch): Output of build_tradeline_table.
+        source_key (str): Key of the source XML object; its filename names the output.
+        bucket_name (str): Output bucket, defaults to OUTPUT_BUCKET.
+        prefix (str): Output key prefix, defaults to OUTPUT_PREFIX.
+        compression (str): "none", "gzip" or "zstd".
+        metrics (ReportMetrics): Collects stage timings; a no-op by default.
+
+    Returns:
+        str: The S3 key the table was written to.
+    """
+    with metrics.stage("SerializeTradelines"):
+        body = serialize_tradeline_table(tradeline_table, source_key, compression)
+    metrics.add("TradelineBytesOut", len(body))
+
+    bucket_name, prefix = resolve_output_location(bucket_name, prefix)
+    s3_key = report_output_key(source_key, prefix, ".tradelines.parquet")
+
+    with metrics.stage("UploadTradelines"):
+        get_s3_client().put_object(Bucket=bucket_name, Key=s3_key, Body=body,
+                                   ContentType="application/vnd.apache.parquet")
+    print(f"Uploaded {tradeline_table.num_rows} tradelines ({len(body)} bytes) to s3://{bucket_name}/{s3_key}")
+    return s3_key
 
 
 def upload_to_s3(file_path, bucket_name, s3_key):
@@ -552,15 +1599,58 @@ def upload_to_s3(file_path, bucket_name, s3_key):
         None
     """
     try:
-        global s3
-        s3.upload_file(file_path, bucket_name, s3_key)
+        get_s3_client().upload_file(file_path, bucket_name, s3_key)
         print(f"Uploaded {file_path} to s3://{bucket_name}/{s3_key}")
     except Exception as e:
         print(f"Failed to upload {file_path} to S3. Error: {e}")
 
+def process_batch(event, max_workers=MAX_RECORD_WORKERS):
+    """
+    Process every record of an event on a bounded thread pool.
+
+    Records are independent, so S3 GETs and parsing of different reports overlap. A failing record is
+    reported in batchItemFailures instead of failing the whole batch.
+
+    Args:
+        event (dict): The event object passed by AWS Lambda.
+        max_workers (int): Maximum number of records processed at once.
+
+    Returns:
+        dict: {'batchItemFailures': [{'itemIdentifier': ...}], 'processed': int}
+    """
+    # Validate event structure
+    if not event or "Records" not in event or len(event["Records"]) == 0:
+        raise ValueError("Invalid event structure or missing Records.")
+
+    items = iter_s3_records(event)
+
+    def process_item(record):
+        return {s3_record["s3"]["object"]["key"]: run_record(s3_record) for s3_record in unwrap_s3_records(record)}
+
+    failures = []
+    outputs = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(items)))) as executor:
+        futures = [(item_id, executor.submit(process_item, record)) for item_id, record in items]
+        for item_id, future in futures:
+            try:
+                outputs.update(future.result())
+            except Exception as e:
+                print(f"Error processing {item_id}: {e}")
+                failures.append({"itemIdentifier": item_id})
+
+    # Partial portfolio rollup of the reports in this batch; the outputs are already written
+    if ROLLUPS_ENABLED:
+        try:
+            write_batch_rollup(outputs)
+        except Exception as e:
+            print(f"Error writing the batch rollup: {e}")
+
+    return {"batchItemFailures": failures, "processed": len(items)}
+
+
 def run_event(event):
     """
-    Process a real PUT event triggered by S3.
+    Process a real PUT event triggered by S3, one record at a time.
     
     Args:
         event (dict): The event object passed by AWS Lambda.
@@ -569,124 +1659,1040 @@ def run_event(event):
     if not event or "Records" not in event or len(event["Records"]) == 0:
         raise ValueError("Invalid event structure or missing Records.")
 
-    # Extract file content using the Lambda event
-    file_content = extract_file_content_from_event(event)
-
-    # Process and parse XML content
-    if isinstance(file_content, str):
-        parsed_data = preprocess_and_parse_xml(file_content)
-
-        if parsed_data:
-            # Process TrueLinkCreditReportType
-            big_dict = process_truelink_data(parsed_data)
-
-            process_tradeline_partition(big_dict)
-
-            account_type_counts, dynamic_variables = extract_tradeline_stats(big_dict)
-
-            # Verify and split data for further processing
-            keys_to_split = ["root_TrueLinkCreditReportType", "root_Snapshot"]
-            split_result = split_objects_by_keys(parsed_data, keys_to_split)
-
-            # Create snapshot dictionary for further processing
-            snapshot_dict = create_and_display_snapshot(parsed_data)
-
-            # Generate snake_case variables from both dictionaries
-            process_and_generate_variables(snapshot_dict)
-
-            # Extract user-level information
-            inquiry_date, username, days_current_address, num_previous_addresses\
-                , users_age = extract_user_info(big_dict)
-            recent_employers = extract_employers(big_dict)
-
-            # Extract risk score and factor counts
-            risk_score, factor_type_counts = extract_risk_score_and_factors(big_dict)
-
-            # Process TradeLinePartition
-            tradeline_stats = process_tradeline_partition(big_dict)
-
-            # Parse messages
-            messages = parse_messages(big_dict)
-            # print(f"messages: {messages}")
-
-            output_data = {
-                "total_accounts": total_accounts,
-                "total_closed_accounts": total_closed_accounts,
-                "delinquent_accounts": delinquent_accounts,
-                "derogatory_accounts": derogatory_accounts,
-                "open_accounts": open_accounts,
-                "total_balances": total_balances,
-                "total_monthly_payments": total_monthly_payments,
-                "number_of_inquiries": number_of_inquiries,
-                "total_public_records": total_public_records,
-                "balance_open_revolving_accounts": balance_open_revolving_accounts,
-                "total_open_revolving_accounts": total_open_revolving_accounts,
-                "balance_open_installment_accounts": balance_open_installment_accounts,
-                "total_open_installment_accounts": total_open_installment_accounts,
-                "balance_open_mortgage_accounts": balance_open_mortgage_accounts,
-                "total_open_mortgage_accounts": total_open_mortgage_accounts,
-                "balance_open_collection_accounts": balance_open_collection_accounts,
-                "total_open_collection_accounts": total_open_collection_accounts,
-                "balance_open_other_accounts": balance_open_other_accounts,
-                "total_open_other_accounts": total_open_other_accounts,
-                "available_credit": available_credit,
-                "utilization": utilization,
-                "on_time_payment_percentage": on_time_payment_percentage,
-                "late_payment_percentage": late_payment_percentage,
-                "date_of_oldest_trade": date_of_oldest_trade,
-                "age_of_credit": age_of_credit,
-                "closed_account_pct": closed_account_pct,
-                "open_account_pct": open_account_pct,
-                "deragatory_account_pct": deragatory_account_pct,
-                "inquiry_date":inquiry_date,
-                "username": username,
-                "days_current_address": days_current_address,
-                "num_previous_addresses": num_previous_addresses,
-                "users_age": users_age,
-                "recent_employers": recent_employers,
-                "risk_score": risk_score,
-                "factor_type_counts": factor_type_counts,
-                "account_type_counts": account_type_counts,
-                "account_condition": account_condition,
-                "account_designator": account_designator,
-                "dispute_flag": dispute_flag,
-                "industry_code": industry_code,
-                "open_closed": open_closed,
-                "pay_status": pay_status,
-                "verification_indicator": verification_indicator,
-                "credit_type": credit_type,
-                "payment_frequency": payment_frequency,
-                "term_type": term_type,
-                "worst_pay_status": worst_pay_status,
-                "pay_status_history": pay_status_history,
-                "messages": messages
+    for _, record in iter_s3_records(event):
+        for s3_record in unwrap_s3_records(record):
+            run_record(s3_record)
+
+    # A one-off run has no scheduled load after it: load every staged row
+    flush_report_loads(max_batches=None)
+
+
+class LruCache:
+    """Thread-safe, size-bounded least-recently-used cache."""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            value = self.entries.get(key)
+            if value is not None:
+                self.entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+
+class SqliteDedupStore:
+    """Persistent dedup store in a local SQLite file, used for tests and local runs."""
+
+    def __init__(self, path):
+        import sqlite3
+
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS report_dedup ("
+            "cache_key TEXT PRIMARY KEY, entry TEXT NOT NULL, created_at TEXT NOT NULL)"
+        )
+        self.conn.commit()
+
+    def get(self, key):
+        with self.lock:
+            row = self.conn.execute("SELECT entry FROM report_dedup WHERE cache_key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, key, entry):
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO report_dedup (cache_key, entry, created_at) VALUES (?, ?, ?)",
+                (key, json.dumps(entry, separators=(",", ":")), datetime.utcnow().isoformat()),
+            )
+            self.conn.commit()
+
+
+class DynamoDbDedupStore:
+    """Persistent dedup store in a DynamoDB table keyed by a 'cache_key' string attribute."""
+
+    def __init__(self, table_name):
+        self.table_name = table_name
+
+    def get(self, key):
+        item = get_client('dynamodb').get_item(
+            TableName=self.table_name, Key={"cache_key": {"S": key}}, ProjectionExpression="entry"
+        ).get("Item")
+        return json.loads(item["entry"]["S"]) if item else None
+
+    def put(self, key, entry):
+        get_client('dynamodb').put_item(TableName=self.table_name, Item={
+            "cache_key": {"S": key},
+            "entry": {"S": json.dumps(entry, separators=(",", ":"))},
+            "created_at": {"S": datetime.utcnow().isoformat()},
+        })
+
+
+# dedup store scheme -> store class
+DEDUP_STORES = {
+    "sqlite": SqliteDedupStore,
+    "dynamodb": DynamoDbDedupStore,
+}
+
+_dedup_cache = LruCache(DEDUP_CACHE_SIZE) if DEDUP_CACHE_SIZE > 0 else None
+
+
+@lru_cache(maxsize=None)
+def get_dedup_store():
+    """
+    Return the persistent dedup store configured by DEDUP_STORE, created on first use.
+
+    Returns:
+        SqliteDedupStore | DynamoDbDedupStore: The store, or None if DEDUP_STORE is empty.
+    """
+    if not DEDUP_STORE:
+        return None
+    scheme, _, location = DEDUP_STORE.partition(":")
+    if scheme not in DEDUP_STORES:
+        raise ValueError(f"Unsupported dedup store: {DEDUP_STORE}")
+    return DEDUP_STORES[scheme](location)
+
+
+def dedup_enabled():
+    """Return True if either the in-process cache or a persistent store is configured."""
+    return _dedup_cache is not None or bool(DEDUP_STORE)
+
+
+def dedup_key(content_id):
+    """Build the dedup cache key of a report from its ETag or sha256 and the feature schema version."""
+    return f"v{FEATURE_SCHEMA_VERSION}:{content_id}"
+
+
+def lookup_dedup(key):
+    """
+    Look up a processed report, first in the warm LRU and then in the persistent store.
+
+    Args:
+        key (str): Key built by dedup_key.
+
+    Returns:
+        dict: {'source_keys': [...], 'output_data': ...} or None on a miss.
+    """
+    entry = _dedup_cache.get(key) if _dedup_cache is not None else None
+    if entry is None:
+        store = get_dedup_store()
+        entry = store.get(key) if store is not None else None
+        if entry is not None and _dedup_cache is not None:
+            _dedup_cache.put(key, entry)
+    return entry
+
+
+def remember_dedup(key, source_keys, output_data):
+    """
+    Record a processed report in the warm LRU and the persistent store.
+
+    Args:
+        key (str): Key built by dedup_key.
+        source_keys (list): Keys of the source XML objects the output was written for.
+        output_data (dict): The report features that were written.
+    """
+    entry = {"source_keys": source_keys, "output_data": output_data}
+    if _dedup_cache is not None:
+        _dedup_cache.put(key, entry)
+    store = get_dedup_store()
+    if store is not None:
+        store.put(key, entry)
+
+
+def extract_report_features(parsed_data, metrics=NULL_METRICS):
+    """
+    Extract every output feature of one parsed report.
+
+    Args:
+        parsed_data (dict): The parsed data under a 'root' key.
+        metrics (ReportMetrics): Collects stage timings; a no-op by default.
+
+    Returns:
+        dict: The output_data dictionary written for the report.
+    """
+    output_data, _ = extract_report(parsed_data, metrics, with_tradeline_table=False)
+    return output_data
+
+
+def extract_report(parsed_data, metrics=NULL_METRICS, with_tradeline_table=TRADELINE_TABLE_ENABLED):
+    """
+    Extract the output features and, optionally, the tradeline table of one parsed report.
+
+    Everything is computed from the tradeline aggregates and the compiled FEATURE_SPEC,
+    with no module-level state, so several reports can be processed concurrently.
+
+    Args:
+        parsed_data (dict): The parsed data under a 'root' key.
+        metrics (ReportMetrics): Collects stage timings; a no-op by default.
+        with_tradeline_table (bool): Also build the Arrow tradeline table.
+
+    Returns:
+        tuple: (output_data dict, pyarrow.RecordBatch of tradelines or None)
+    """
+    # Process TrueLinkCreditReportType
+    with metrics.stage("Flatten"):
+        big_dict = process_truelink_data(parsed_data)
+
+    # Aggregate all tradeline counters in one pass
+    with metrics.stage("Tradelines"):
+        tradeline_stats = aggregate_tradelines(big_dict)
+        tradeline_vars = generate_snake_case_variables(tradeline_stats["converted_data"])
+    metrics.add("Tradelines", sum(tradeline_stats["account_type_counts"].values()))
+
+    # Vectorized delinquency features from the pay status histories
+    with metrics.stage("Delinquency"):
+        delinquency = compute_delinquency_features(tradeline_stats["history_strings"],
+                                                   tradeline_stats["industry_abbreviations"])
+
+    # Snapshot, borrower, score and message features from the compiled spec
+    with metrics.stage("Spec"):
+        output_data = evaluate_features(parsed_data, big_dict)
+    messages = output_data.pop("messages")
+
+    output_data["account_type_counts"] = tradeline_stats["account_type_counts"]
+    output_data.update({key: tradeline_vars[key] for key in TRADELINE_OUTPUT_KEYS})
+    output_data.update(delinquency)
+    output_data["messages"] = messages
+
+    # One typed row per tradeline, reusing the history strings of the aggregation pass
+    tradeline_table = None
+    if with_tradeline_table:
+        with metrics.stage("TradelineTable"):
+            tradeline_table = build_tradeline_table(big_dict, tradeline_stats["history_strings"])
+
+    return output_data, tradeline_table
+
+
+def _hash_chunks(chunks, content_hash):
+    """Yield the chunks unchanged while feeding them into content_hash."""
+    for chunk in chunks:
+        content_hash.update(chunk)
+        yield chunk
+
+
+def run_record(record):
+    """
+    Parse one report, extract its features and upload the summary (and tradeline table, if enabled).
+
+    Re-delivered reports with the same ETag and feature schema version are answered from
+    the dedup cache without fetching or parsing them again. Without an ETag, the content is
+    hashed as it streams into the parser, and a cache hit skips feature extraction and uploads.
+
+    Args:
+        record (dict): One S3 event record.
+
+    Returns:
+        dict: The output_data of the report.
+
+    Raises:
+        ValueError: If the file content could not be parsed.
+        ReportTooLargeError: If the report exceeds MAX_REPORT_BYTES.
+    """
+    object_key = record["s3"]["object"]["key"]
+    metrics = ReportMetrics(object_key) if METRICS_ENABLED else NULL_METRICS
+    profiler = start_sampled_profiler() if PROFILE_SAMPLE_RATE else None
+    start_time = time.perf_counter()
+
+    try:
+        # The event ETag identifies the content before we download it
+        cache_key = None
+        if dedup_enabled():
+            etag = record["s3"]["object"].get("eTag")
+            cache_key = dedup_key(f"etag:{etag}") if etag else None
+            output_data = replay_dedup_hit(cache_key, object_key, metrics) if cache_key else None
+            if output_data is not None:
+                return output_data
+
+        # Open the object; its body is read in chunks while parsing
+        with metrics.stage("S3Get"):
+            report_stream = open_report_stream(record)
+
+        with report_stream:
+            # Without an ETag, hash the decompressed chunks on their way into the parser, so the
+            # body is never held in memory as a whole
+            chunks = report_stream
+            content_hash = None
+            if dedup_enabled() and cache_key is None:
+                content_hash = hashlib.sha256()
+                chunks = _hash_chunks(report_stream, content_hash)
+
+            # Stream the (decompressed) chunks straight into the parser
+            with metrics.stage("Parse"):
+                parsed_data = parse_xml_content(chunks)
+            if content_hash is not None:
+                # Hash anything the parser left unread, so the key covers the whole body
+                for _ in chunks:
+                    pass
+        metrics.add("BytesIn", report_stream.bytes_in)
+        metrics.add("BytesXml", report_stream.bytes_out)
+        if not parsed_data:
+            raise ValueError("Failed to parse the XML content.")
+
+        # Content seen before skips feature extraction and the uploads
+        if content_hash is not None:
+            cache_key = dedup_key(f"sha256:{content_hash.hexdigest()}")
+            output_data = replay_dedup_hit(cache_key, object_key, metrics)
+            if output_data is not None:
+                return output_data
+
+        # Build the per-report feature dictionary and tradeline table
+        with metrics.stage("Features"):
+            output_data, tradeline_table = extract_report(parsed_data, metrics, TRADELINE_TABLE_ENABLED)
+
+        # The features go to S3; dumping them to the log is only worth its cost when debugging
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Output data for {object_key}: {json.dumps(output_data)}")
+
+        # Serialize in memory and upload to S3
+        write_report_output(output_data, object_key, metrics=metrics)
+        if tradeline_table is not None:
+            write_tradeline_table(tradeline_table, object_key, metrics=metrics)
+        stage_report_load(object_key, output_data)
+        index_report(object_key, output_data)
+
+        if cache_key is not None:
+            remember_dedup(cache_key, [object_key], output_data)
+    finally:
+        if profiler is not None:
+            stop_sampled_profiler(profiler, object_key, (time.perf_counter() - start_time) * 1000)
+        metrics.emit()
+
+    return output_data
+
+
+def replay_dedup_hit(cache_key, object_key, metrics=NULL_METRICS):
+    """
+    Answer a report from the dedup cache if it was already processed.
+
+    The output is only rewritten when the same content arrives under a new object key.
+
+    Args:
+        cache_key (str): Key built by dedup_key.
+        object_key (str): Key of the source XML object.
+        metrics (ReportMetrics): Collects stage timings; a no-op by default.
+
+    Returns:
+        dict: The cached output_data, or None on a miss.
+    """
+    entry = lookup_dedup(cache_key)
+    metrics.add("DedupHit", int(entry is not None))
+    if entry is None:
+        return None
+
+    print(f"Dedup hit for {object_key} ({cache_key}), skipping parse")
+    if object_key not in entry["source_keys"]:
+        write_report_output(entry["output_data"], object_key, metrics=metrics)
+        stage_report_load(object_key, entry["output_data"])
+        index_report(object_key, entry["output_data"])
+        remember_dedup(cache_key, entry["source_keys"] + [object_key], entry["output_data"])
+    return entry["output_data"]
+
+class RedshiftBatchLoader:
+    """
+    Stage report rows durably in S3 and load them into Redshift in micro-batches through the Data API.
+
+    Each report's row is written as its own gzipped JSON Lines object under <prefix>redshift-load/pending/
+    before run_record returns, so a row survives a recycled or shut-down container. The report handler
+    only stages rows; load_handler, run on a schedule, flushes them: it lists the pending prefix,
+    runs one manifest COPY per batch of at most max_rows rows and max_bytes bytes into a staging table,
+    merges it in one Data API transaction and deletes the objects only after that transaction commits.
+    A flush loads at most max_batches batches, so one invocation's work stays bounded, and the rest wait
+    for the next scheduled run.
+
+    The batch ID is a hash of the batch's pending keys and ETags. The merge replaces the table rows of
+    the batch's source keys, so a re-delivered report replaces its loaded row, and skips batch IDs
+    already recorded in the load log, so a retried flush never applies a batch twice.
+    """
+
+    def __init__(self, table, bucket_name, prefix, max_rows=LOAD_BATCH_MAX_ROWS, max_bytes=LOAD_BATCH_MAX_BYTES,
+                 log_table=REDSHIFT_LOAD_LOG_TABLE, client=None):
+        self.table = table
+        self.log_table = log_table
+        self.bucket_name = bucket_name
+        self.prefix = prefix
+        self.pending_prefix = f"{prefix}redshift-load/pending/"
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.client = client
+
+    def pending_key(self, source_key):
+        """Return the staging object key of a report; a re-delivered report overwrites its earlier row."""
+        return f"{self.pending_prefix}{hashlib.sha256(source_key.encode('utf-8')).hexdigest()[:32]}.json.gz"
+
+    def add(self, source_key, output_data):
+        """Stage the row of one report in S3; raises if the row could not be staged, failing its record."""
+        line = json.dumps({"source_key": source_key, **output_data}, separators=(",", ":")) + "\n"
+        get_s3_client().put_object(Bucket=self.bucket_name, Key=self.pending_key(source_key),
+                                   Body=gzip.compress(line.encode("utf-8")), ContentType="application/json",
+                                   ContentEncoding="gzip")
+
+    def has_pending(self):
+        """Return True if any staged row is waiting under the pending prefix."""
+        response = get_s3_client().list_objects_v2(Bucket=self.bucket_name, Prefix=self.pending_prefix, MaxKeys=1)
+        return bool(response.get("Contents"))
+
+    def pending_batches(self, max_batches=None):
+        """
+        List the staged rows and group them into batches of at most max_rows rows and max_bytes bytes.
+
+        Args:
+            max_batches (int): Stop listing once this many batches are full, None for all.
+
+        Returns:
+            list: Batches of {'Key': str, 'Size': int, 'ETag': str} S3 objects, in key order.
+        """
+        batches, batch, batch_bytes = [], [], 0
+        paginator = get_s3_client().get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=self.pending_prefix):
+            for item in page.get("Contents", []):
+                if batch and (len(batch) >= self.max_rows or batch_bytes + item["Size"] > self.max_bytes):
+                    batches.append(batch)
+                    batch, batch_bytes = [], 0
+                    if max_batches is not None and len(batches) >= max_batches:
+                        return batches
+                batch.append({"Key": item["Key"], "Size": item["Size"], "ETag": item.get("ETag", "")})
+                batch_bytes += item["Size"]
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def flush(self, max_batches=LOAD_FLUSH_MAX_BATCHES, deadline=None):
+        """
+        Load up to max_batches batches of staged rows.
+
+        A batch that fails keeps its objects under the pending prefix and is retried by the next flush.
+
+        Args:
+            max_batches (int): Batches loaded at most, None for every staged row.
+            deadline (float): time.monotonic() after which no new batch is started.
+
+        Returns:
+            list: The IDs of the batches loaded.
+        """
+        loaded = []
+        for batch in self.pending_batches(max_batches):
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+            loaded.append(self.load_batch(batch))
+        return loaded
+
+    def load_batch(self, batch):
+        """
+        Load one batch of staged rows with a single manifest COPY, then delete their objects.
+
+        Args:
+            batch (list): {'Key': str, 'Size': int, 'ETag': str} pending objects.
+
+        Returns:
+            str: The batch ID.
+        """
+        # The ETags make a re-staged row a new batch, while a retry of the same objects keeps its ID
+        digest = hashlib.sha256("\n".join(f"{item['Key']} {item['ETag']}" for item in batch)
+                                .encode("utf-8")).hexdigest()[:32]
+        batch_id = f"v{FEATURE_SCHEMA_VERSION}-{digest}"
+        manifest_key = f"{self.prefix}redshift-load/manifests/{batch_id}.manifest"
+
+        # Entries are not mandatory: a concurrent flush may already have loaded and deleted a row
+        s3 = get_s3_client()
+        manifest = {"entries": [{"url": f"s3://{self.bucket_name}/{item['Key']}", "mandatory": False,
+                                 "meta": {"content_length": item["Size"]}} for item in batch]}
+        s3.put_object(Bucket=self.bucket_name, Key=manifest_key, Body=json.dumps(manifest).encode("utf-8"),
+                      ContentType="application/json")
+
+        start_time = time.perf_counter()
+        self.execute_batch(self.load_statements(batch_id, f"s3://{self.bucket_name}/{manifest_key}", len(batch)),
+                           statement_name=f"report-load-{batch_id}")
+        print(f"Loaded batch {batch_id} ({len(batch)} rows) into {self.table} "
+              f"in {time.perf_counter() - start_time:.2f}s")
+
+        # Only a committed batch releases its rows; a failed delete just reloads them, which the merge skips
+        for offset in range(0, len(batch), 1000):
+            s3.delete_objects(Bucket=self.bucket_name, Delete={
+                "Objects": [{"Key": item["Key"]} for item in batch[offset:offset + 1000]], "Quiet": True})
+        return batch_id
+
+    def load_statements(self, batch_id, manifest_url, row_count):
+        """Build the COPY and merge statements of one batch, run as a single transaction."""
+        stage_table = f"{self.table.split('.')[-1]}_stage"
+        already_loaded = f"SELECT 1 FROM {self.log_table} WHERE batch_id = '{batch_id}'"
+        return [
+            f"CREATE TEMP TABLE {stage_table} (LIKE {self.table});",
+            f"COPY {stage_table} FROM '{manifest_url}' IAM_ROLE '{REDSHIFT_IAM_ROLE or 'default'}' "
+            f"FORMAT AS JSON 'auto ignorecase' GZIP MANIFEST TIMEFORMAT 'auto';",
+            # a re-delivered or reprocessed report replaces its loaded row
+            f"DELETE FROM {self.table} USING {stage_table} WHERE {self.table}.source_key = {stage_table}.source_key "
+            f"AND NOT EXISTS ({already_loaded});",
+            f"INSERT INTO {self.table} SELECT s.* FROM {stage_table} s WHERE NOT EXISTS ({already_loaded});",
+            f"INSERT INTO {self.log_table} (batch_id, row_count, loaded_at) "
+            f"SELECT '{batch_id}', {row_count}, GETDATE() WHERE NOT EXISTS ({already_loaded});",
+            f"DROP TABLE {stage_table};",
+        ]
+
+    def execute_batch(self, sqls, statement_name=None):
+        """
+        Run statements in one Data API transaction and wait for them to finish.
+
+        Args:
+            sqls (list): SQL statements.
+            statement_name (str): Name shown in the Data API statement history.
+
+        Returns:
+            dict: The final describe_statement response.
+
+        Raises:
+            RuntimeError: If the statement fails, is aborted or does not finish in time.
+        """
+        client = self.client or get_redshift_client()
+        params = {"Database": REDSHIFT_DATABASE, "Sqls": sqls}
+        if REDSHIFT_WORKGROUP:
+            params["WorkgroupName"] = REDSHIFT_WORKGROUP
+        else:
+            params["ClusterIdentifier"] = REDSHIFT_CLUSTER_ID
+        if REDSHIFT_SECRET_ARN:
+            params["SecretArn"] = REDSHIFT_SECRET_ARN
+        elif REDSHIFT_DB_USER:
+            params["DbUser"] = REDSHIFT_DB_USER
+        if statement_name:
+            params["StatementName"] = statement_name
+
+        statement_id = client.batch_execute_statement(**params)["Id"]
+
+        # The Data API is asynchronous: poll with a capped backoff until the statement settles
+        deadline = time.monotonic() + LOAD_STATEMENT_TIMEOUT_SECONDS
+        delay = 0.25
+        while True:
+            description = client.describe_statement(Id=statement_id)
+            status = description["Status"]
+            if status == "FINISHED":
+                return description
+            if status in ("FAILED", "ABORTED"):
+                raise RuntimeError(f"Redshift statement {statement_id} {status}: {description.get('Error')}")
+            if time.monotonic() >= deadline:
+                raise RuntimeError(f"Redshift statement {statement_id} did not finish within "
+                                   f"{LOAD_STATEMENT_TIMEOUT_SECONDS}s")
+            time.sleep(delay)
+            delay = min(delay * 2, 5.0)
+
+
+@lru_cache(maxsize=None)
+def get_report_loader():
+    """
+    Return the Redshift batch loader configured by REDSHIFT_LOAD_TABLE, created on first use.
+
+    Returns:
+        RedshiftBatchLoader: The loader, or None if REDSHIFT_LOAD_TABLE is empty.
+    """
+    if not REDSHIFT_LOAD_TABLE:
+        return None
+    bucket_name, prefix = resolve_output_location()
+    return RedshiftBatchLoader(REDSHIFT_LOAD_TABLE, bucket_name, prefix)
+
+
+def stage_report_load(source_key, output_data):
+    """Stage a report row in S3 for the next Redshift load batch, if loading is enabled."""
+    loader = get_report_loader()
+    if loader is not None:
+        loader.add(source_key, output_data)
+
+
+def flush_report_loads(max_batches=LOAD_FLUSH_MAX_BATCHES, deadline=None):
+    """
+    Load up to max_batches batches of staged rows into Redshift.
+
+    Load errors are logged and the rows stay staged in S3 for the next flush.
+
+    Args:
+        max_batches (int): Batches loaded at most, None for every staged row.
+        deadline (float): time.monotonic() after which no new batch is started.
+
+    Returns:
+        list: The IDs of the batches loaded.
+    """
+    loader = get_report_loader()
+    if loader is None:
+        return []
+    try:
+        return loader.flush(max_batches, deadline)
+    except Exception as e:
+        print(f"Error loading batch into Redshift, will retry on the next flush: {e}")
+        logger.exception("Redshift batch load failed")
+        return []
+
+
+def load_handler(event, context):
+    """
+    Scheduled (EventBridge) entry point that loads the staged report rows into Redshift.
+
+    The report handler only stages rows, so SQS batches never wait on the Data API. Each run loads
+    at most LOAD_FLUSH_MAX_BATCHES batches and starts no batch it could not finish before the
+    function timeout; rows left over are loaded by the next run.
+
+    Args:
+        event (dict): The scheduled event (unused).
+        context (LambdaContext): Runtime information provided by Lambda, None when run locally.
+
+    Returns:
+        dict: Status, the IDs of the batches loaded and whether rows are still staged.
+    """
+    loader = get_report_loader()
+    if loader is None:
+        return {"statusCode": 200, "body": "Redshift loading is disabled.", "batches": [], "pending": False}
+
+    deadline = None
+    if context is not None:
+        # Leave room for a batch to finish polling within the function timeout
+        remaining = context.get_remaining_time_in_millis() / 1000 - LOAD_STATEMENT_TIMEOUT_SECONDS - 5
+        deadline = time.monotonic() + max(remaining, 0)
+
+    # A failed batch fails the run, so it shows in the function's error metrics; its rows stay staged
+    loaded = loader.flush(LOAD_FLUSH_MAX_BATCHES, deadline)
+    pending = loader.has_pending()
+    return {"statusCode": 200, "body": f"Loaded {len(loaded)} batches.", "batches": loaded, "pending": pending}
+
+
+class QuantileSketch:
+    """
+    Mergeable quantile sketch with a relative-error guarantee, in the style of DDSketch.
+
+    Values are counted in logarithmic buckets, so any quantile is returned within
+    relative_accuracy of the exact value, and two sketches merge by adding their bucket counts.
+    """
+
+    def __init__(self, relative_accuracy=0.01, max_buckets=2048):
+        self.relative_accuracy = relative_accuracy
+        self.max_buckets = max_buckets
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.positive = Counter()
+        self.negative = Counter()
+        self.zero_count = 0
+        self.count = 0
+
+    def _index(self, value):
+        return math.ceil(math.log(value) / self.log_gamma)
+
+    def _collapse(self, store):
+        # Fold the lowest buckets together once the store grows past max_buckets
+        while len(store) > self.max_buckets:
+            lowest, second = sorted(store)[:2]
+            store[second] += store.pop(lowest)
+
+    def add(self, value, count=1):
+        """Add a value to the sketch."""
+        if value > 0:
+            self.positive[self._index(value)] += count
+            if len(self.positive) > self.max_buckets:
+                self._collapse(self.positive)
+        elif value < 0:
+            self.negative[self._index(-value)] += count
+            if len(self.negative) > self.max_buckets:
+                self._collapse(self.negative)
+        else:
+            self.zero_count += count
+        self.count += count
+
+    def merge(self, other):
+        """Fold another sketch with the same relative accuracy into this one."""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge quantile sketches with different relative accuracies")
+        self.positive.update(other.positive)
+        self.negative.update(other.negative)
+        self._collapse(self.positive)
+        self._collapse(self.negative)
+        self.zero_count += other.zero_count
+        self.count += other.count
+
+    def quantile(self, q):
+        """
+        Return the approximate q-quantile.
+
+        Args:
+            q (float): Quantile between 0 and 1.
+
+        Returns:
+            float: The estimate, or None for an empty sketch.
+        """
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for index in sorted(self.negative, reverse=True):
+            seen += self.negative[index]
+            if seen > rank:
+                return -2 * self.gamma ** index / (self.gamma + 1)
+        seen += self.zero_count
+        if seen > rank:
+            return 0.0
+        for index in sorted(self.positive):
+            seen += self.positive[index]
+            if seen > rank:
+                return 2 * self.gamma ** index / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.positive) / (self.gamma + 1)
+
+    def to_dict(self):
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "zero_count": self.zero_count,
+            "positive": {str(index): count for index, count in self.positive.items()},
+            "negative": {str(index): count for index, count in self.negative.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data["relative_accuracy"])
+        sketch.zero_count = data["zero_count"]
+        sketch.positive = Counter({int(index): count for index, count in data["positive"].items()})
+        sketch.negative = Counter({int(index): count for index, count in data["negative"].items()})
+        sketch.count = sketch.zero_count + sum(sketch.positive.values()) + sum(sketch.negative.values())
+        return sketch
+
+
+# portfolio rollups: counter features summed across reports
+ROLLUP_COUNTER_FIELDS = ["account_type_counts", "factor_type_counts"] + TRADELINE_OUTPUT_KEYS + \
+    ["late_payment_counts", "messages"]
+
+# numeric features folded into histograms (bucket edges) and quantile sketches
+_MONEY_EDGES = [0, 1000, 5000, 10000, 25000, 50000, 100000, 250000, 500000, 1000000]
+_PCT_EDGES = [0, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0]
+ROLLUP_NUMERIC_FIELDS = {
+    "risk_score": list(range(300, 851, 50)),
+    "utilization": list(range(0, 101, 10)),
+    "total_balances": _MONEY_EDGES,
+    "available_credit": _MONEY_EDGES,
+    "total_monthly_payments": [0, 100, 250, 500, 1000, 2500, 5000, 10000],
+    "balance_open_revolving_accounts": _MONEY_EDGES,
+    "balance_open_installment_accounts": _MONEY_EDGES,
+    "balance_open_mortgage_accounts": _MONEY_EDGES,
+    "total_accounts": [0, 1, 3, 5, 10, 20, 50, 100],
+    "open_account_pct": _PCT_EDGES,
+    "closed_account_pct": _PCT_EDGES,
+    "deragatory_account_pct": _PCT_EDGES,
+    "users_age": [18, 25, 35, 45, 55, 65, 75, 85],
+    "months_since_last_late": [0, 1, 3, 6, 12, 24, 48, 84],
+    "longest_late_streak": [0, 1, 2, 3, 6, 12, 24],
+}
+
+class PortfolioRollup:
+    """
+    Mergeable portfolio-level aggregate of many report outputs.
+
+    Counter features are summed, and each numeric feature keeps count, sum, min, max,
+    a fixed-edge histogram and a QuantileSketch. Partial rollups from different batches,
+    workers or days merge into the same state a single pass over all reports would build,
+    in a few KB of JSON.
+    """
+
+    def __init__(self, numeric_fields=None):
+        self.numeric_fields = dict(ROLLUP_NUMERIC_FIELDS if numeric_fields is None else numeric_fields)
+        self.report_count = 0
+        self.counters = {name: Counter() for name in ROLLUP_COUNTER_FIELDS}
+        self.late_payment_rollups = Counter()
+        self.numeric = {name: self._empty_numeric(edges) for name, edges in self.numeric_fields.items()}
+
+    @staticmethod
+    def _empty_numeric(edges):
+        return {"count": 0, "sum": 0.0, "min": None, "max": None,
+                "histogram": [0] * (len(edges) + 1), "sketch": QuantileSketch()}
+
+    def add(self, output_data):
+        """Fold one report's output_data into the rollup."""
+        self.report_count += 1
+        for name, counter in self.counters.items():
+            counter.update(output_data.get(name) or {})
+
+        # Nested per-industry late months, flattened to "category|bucket" keys
+        for category, buckets in (output_data.get("late_payment_rollups") or {}).items():
+            for bucket, count in buckets.items():
+                self.late_payment_rollups[f"{category}|{bucket}"] += count
+
+        for name, edges in self.numeric_fields.items():
+            value = _as_float(output_data.get(name))
+            if value is None:
+                continue
+            stats = self.numeric[name]
+            stats["count"] += 1
+            stats["sum"] += value
+            stats["min"] = value if stats["min"] is None else min(stats["min"], value)
+            stats["max"] = value if stats["max"] is None else max(stats["max"], value)
+            stats["histogram"][bisect.bisect_right(edges, value)] += 1
+            stats["sketch"].add(value)
+
+    def merge(self, other):
+        """Fold another rollup into this one; both must use the same histogram edges."""
+        if other.numeric_fields != self.numeric_fields:
+            raise ValueError("Cannot merge rollups with different numeric fields or histogram edges")
+        self.report_count += other.report_count
+        for name, counter in other.counters.items():
+            self.counters.setdefault(name, Counter()).update(counter)
+        self.late_payment_rollups.update(other.late_payment_rollups)
+
+        for name, other_stats in other.numeric.items():
+            stats = self.numeric[name]
+            stats["count"] += other_stats["count"]
+            stats["sum"] += other_stats["sum"]
+            for key, pick in (("min", min), ("max", max)):
+                values = [value for value in (stats[key], other_stats[key]) if value is not None]
+                stats[key] = pick(values) if values else None
+            stats["histogram"] = [a + b for a, b in zip(stats["histogram"], other_stats["histogram"])]
+            stats["sketch"].merge(other_stats["sketch"])
+        return self
+
+    def quantile(self, name, q):
+        """Return the approximate q-quantile of a numeric feature."""
+        return self.numeric[name]["sketch"].quantile(q)
+
+    def summary(self, quantiles=(0.5, 0.9, 0.99)):
+        """
+        Summarize the rollup for dashboards and logs.
+
+        Returns:
+            dict: Report count, then count, mean, min, max and quantiles per numeric feature.
+        """
+        numeric = {}
+        for name, stats in self.numeric.items():
+            if not stats["count"]:
+                continue
+            numeric[name] = {
+                "count": stats["count"],
+                "mean": round(stats["sum"] / stats["count"], 4),
+                "min": stats["min"],
+                "max": stats["max"],
+                # Sketch estimates are clamped to the exact range
+                **{f"p{round(q * 100)}": round(min(max(stats["sketch"].quantile(q), stats["min"]), stats["max"]), 4)
+                   for q in quantiles},
+            }
+        return {"report_count": self.report_count, "numeric": numeric}
+
+    def to_dict(self):
+        return {
+            "feature_schema_version": FEATURE_SCHEMA_VERSION,
+            "report_count": self.report_count,
+            "counters": {name: dict(counter) for name, counter in self.counters.items()},
+            "late_payment_rollups": dict(self.late_payment_rollups),
+            "numeric": {
+                name: {"edges": self.numeric_fields[name], **{key: value for key, value in stats.items() if key != "sketch"},
+                       "sketch": stats["sketch"].to_dict()}
+                for name, stats in self.numeric.items()
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        rollup = cls({name: stats["edges"] for name, stats in data["numeric"].items()})
+        rollup.report_count = data["report_count"]
+        rollup.counters = {name: Counter(counter) for name, counter in data["counters"].items()}
+        rollup.late_payment_rollups = Counter(data.get("late_payment_rollups", {}))
+        for name, stats in data["numeric"].items():
+            rollup.numeric[name] = {
+                "count": stats["count"], "sum": stats["sum"], "min": stats["min"], "max": stats["max"],
+                "histogram": list(stats["histogram"]), "sketch": QuantileSketch.from_dict(stats["sketch"]),
             }
+        return rollup
+
+
+def write_batch_rollup(outputs, bucket_name=None, prefix=None):
+    """
+    Fold the outputs of one batch into a partial rollup and upload it.
+
+    The key is derived from the batch's source keys, so a retried batch overwrites its
+    earlier partial instead of adding a second one.
+
+    Args:
+        outputs (dict): Source key -> output_data for the reports processed in the batch.
+        bucket_name (str): Output bucket, defaults to OUTPUT_BUCKET.
+        prefix (str): Rollup key prefix, defaults to ROLLUP_PREFIX or <output prefix>rollups/.
+
+    Returns:
+        str: The S3 key of the partial rollup, or None if the batch had no outputs.
+    """
+    if not outputs:
+        return None
 
-            # Log or process the final output
-            print("Output Data:", json.dumps(output_data, indent=4))
+    rollup = PortfolioRollup()
+    for output_data in outputs.values():
+        rollup.add(output_data)
+
+    bucket_name, output_prefix = resolve_output_location(bucket_name)
+    if prefix is None:
+        prefix = ROLLUP_PREFIX if ROLLUP_PREFIX is not None else f"{output_prefix}rollups/"
+    batch_id = hashlib.sha256("\n".join(sorted(outputs)).encode("utf-8")).hexdigest()[:32]
+    s3_key = f"{prefix}date={datetime.utcnow().strftime('%Y-%m-%d')}/{batch_id}.json"
+
+    body = json.dumps(rollup.to_dict(), separators=(",", ":")).encode("utf-8")
+    get_s3_client().put_object(Bucket=bucket_name, Key=s3_key, Body=body, ContentType="application/json")
+    print(f"Uploaded rollup of {rollup.report_count} reports ({len(body)} bytes) to s3://{bucket_name}/{s3_key}")
+    return s3_key
+
+
+# report index: one row per processed report, indexed for borrower and inquiry date lookups
+REPORT_INDEX_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS reports ("
+    "source_key TEXT PRIMARY KEY, username TEXT COLLATE NOCASE, inquiry_date TEXT, risk_score INTEGER, "
+    "processed_at TEXT NOT NULL, summary TEXT NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS reports_username ON reports (username, inquiry_date)",
+    "CREATE INDEX IF NOT EXISTS reports_inquiry_date ON reports (inquiry_date)",
+    "CREATE INDEX IF NOT EXISTS reports_risk_score ON reports (risk_score)",
+    "CREATE TABLE IF NOT EXISTS merged_shards (shard TEXT PRIMARY KEY, merged_at TEXT NOT NULL)",
+]
+
+# keep the most recently processed row when the same source key is indexed twice
+_REPORT_INDEX_UPSERT = (
+    "INSERT INTO reports (source_key, username, inquiry_date, risk_score, processed_at, summary) "
+    "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (source_key) DO UPDATE SET "
+    "username = excluded.username, inquiry_date = excluded.inquiry_date, risk_score = excluded.risk_score, "
+    "processed_at = excluded.processed_at, summary = excluded.summary "
+    "WHERE excluded.processed_at >= reports.processed_at"
+)
+
+
+class ReportIndex:
+    """
+    Embedded SQLite index of report summaries keyed by source key, username, inquiry_date and risk_score.
 
-            # Extract original filename (without .xml)
-            original_key = event["Records"][0]["s3"]["object"]["key"]
-            filename = os.path.basename(original_key).replace(".xml", "")
-            file_path = f"/tmp/{filename}.json"
+    Shards written by the backfill are append-only files with this schema; merge_shard folds one
+    into a compacted index and records it, so merging is incremental. Rows staged by the Lambda are
+    folded in with add.
+    """
 
+    def __init__(self, path):
+        import sqlite3
+
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        for statement in REPORT_INDEX_SCHEMA:
+            self.conn.execute(statement)
+        self.conn.commit()
+        self.pending = 0
+
+    def add(self, source_key, output_data, processed_at=None):
+        """Insert or refresh the row of one report; call commit() to make it durable."""
+        row = (source_key, output_data.get("username"), output_data.get("inquiry_date") or None,
+               output_data.get("risk_score"), processed_at or datetime.utcnow().isoformat(),
+               json.dumps(output_data, separators=(",", ":")))
+        with self.lock:
+            self.conn.execute(_REPORT_INDEX_UPSERT, row)
+            self.pending += 1
+
+    def commit(self):
+        with self.lock:
+            self.conn.commit()
+            self.pending = 0
+
+    def close(self):
+        self.commit()
+        self.conn.close()
+
+    def merge_shard(self, shard_path, shard_name=None):
+        """
+        Fold the rows of a shard file into this index, once per shard name.
+
+        Args:
+            shard_path (str): Local path of the shard.
+            shard_name (str): Stable name recorded in merged_shards, defaults to the file name.
+
+        Returns:
+            int: Rows read from the shard, or 0 if it was merged before.
+        """
+        shard_name = shard_name or os.path.basename(shard_path)
+        with self.lock:
+            if self.conn.execute("SELECT 1 FROM merged_shards WHERE shard = ?", (shard_name,)).fetchone():
+                return 0
+            self.conn.execute("ATTACH DATABASE ? AS shard", (shard_path,))
             try:
-                with open(file_path, "w") as json_file:
-                    json.dump(output_data, json_file, indent=4)
-                print(f"JSON file created at {file_path}")
-            except Exception as e:
-                print(f"Error creating JSON file: {e}")
-                return
+                rows = self.conn.execute(
+                    "SELECT source_key, username, inquiry_date, risk_score, processed_at, summary FROM shard.reports"
+                ).fetchall()
+                self.conn.executemany(_REPORT_INDEX_UPSERT, [tuple(row) for row in rows])
+                self.conn.execute("INSERT INTO merged_shards (shard, merged_at) VALUES (?, ?)",
+                                  (shard_name, datetime.utcnow().isoformat()))
+                self.conn.commit()
+            finally:
+                self.conn.execute("DETACH DATABASE shard")
+        return len(rows)
+
+    def _query(self, sql, params):
+        with self.lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        return [{**json.loads(row["summary"]), "source_key": row["source_key"], "processed_at": row["processed_at"]}
+                for row in rows]
+
+    def latest_for_borrower(self, username, limit=10):
+        """Return the most recent reports of a borrower (case-insensitive), newest inquiry first."""
+        return self._query("SELECT source_key, processed_at, summary FROM reports WHERE username = ? "
+                           "ORDER BY inquiry_date DESC LIMIT ?", (username, limit))
+
+    def by_inquiry_date(self, start, end, limit=1000):
+        """Return the reports with start <= inquiry_date <= end (YYYY-MM-DD strings)."""
+        return self._query("SELECT source_key, processed_at, summary FROM reports "
+                           "WHERE inquiry_date BETWEEN ? AND ? ORDER BY inquiry_date LIMIT ?", (start, end, limit))
+
+    def by_risk_score(self, low, high, limit=1000):
+        """Return the reports with low <= risk_score <= high."""
+        return self._query("SELECT source_key, processed_at, summary FROM reports "
+                           "WHERE risk_score BETWEEN ? AND ? ORDER BY risk_score LIMIT ?", (low, high, limit))
+
+
+class ReportIndexRowWriter:
+    """
+    Stage every report summary in S3 as its own pending row object before the record is acknowledged.
 
-            # Upload to S3
-            bucket_name = "%s" % bucket
-            s3_key = ("{}{}.json".format(key, filename))
-            upload_to_s3(file_path, bucket_name, s3_key)   
+    Rows are written under <prefix>pending/ as one JSON object per source key, so a recycled or
+    timed-out container cannot lose them and a re-delivered report overwrites its earlier row.
+    `report_index.py merge` folds the pending rows into the compacted index and deletes them once
+    the index holding them is saved.
+    """
+
+    def __init__(self, bucket_name, prefix):
+        self.bucket_name = bucket_name
+        self.prefix = prefix
+        self.pending_prefix = f"{prefix}pending/"
+
+    def pending_key(self, source_key):
+        """Return the pending row key of a report."""
+        return f"{self.pending_prefix}{hashlib.sha256(source_key.encode('utf-8')).hexdigest()[:32]}.json"
+
+    def add(self, source_key, output_data, processed_at=None):
+        """Write the row of one report; raises if the row could not be staged, failing its record."""
+        row = {"source_key": source_key, "processed_at": processed_at or datetime.utcnow().isoformat(),
+               "summary": output_data}
+        get_s3_client().put_object(Bucket=self.bucket_name, Key=self.pending_key(source_key),
+                                   Body=json.dumps(row, separators=(",", ":")).encode("utf-8"),
+                                   ContentType="application/json")
+
+
+@lru_cache(maxsize=None)
+def get_report_index_writer():
+    """
+    Return the report index row writer, created on first use.
+
+    Returns:
+        ReportIndexRowWriter: The writer, or None if REPORT_INDEX_ENABLED is off.
+    """
+    if not REPORT_INDEX_ENABLED:
+        return None
+    bucket_name, prefix = resolve_output_location()
+    return ReportIndexRowWriter(bucket_name, REPORT_INDEX_PREFIX if REPORT_INDEX_PREFIX is not None
+                                else f"{prefix}report-index/")
+
+
+def index_report(source_key, output_data):
+    """Stage a report summary for the report index, if indexing is enabled."""
+    writer = get_report_index_writer()
+    if writer is not None:
+        writer.add(source_key, output_data)
 
-        else:
-            print("Failed to parse the XML content.")
-    else:
-        print("Failed to retrieve file content.")
 
 # debugging test
 # run_event()
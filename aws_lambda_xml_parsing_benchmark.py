@@ -0,0 +1,748 @@
+import argparse
+import contextlib
+import gzip
+import hashlib
+import io
+import json
+import os
+import random
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+import tracemalloc
+from xml.sax.saxutils import escape, quoteattr
+
+import aws_lambda_xml_parsing as parser
+
+"""
+Offline micro-benchmarks for aws_lambda_xml_parsing.py. Reports are synthetic,
+so no customer data is needed to measure the hot paths.
+"""
+
+# sample values used to build synthetic tradelines
+ACCOUNT_TYPES = ["Revolving", "Installment", "Mortgage", "Open", "Collection"]
+FIELD_VALUES = {
+    "AccountCondition": ["O", "C", "P"],
+    "AccountDesignator": ["I", "J", "A"],
+    "DisputeFlag": ["F", "D"],
+    "IndustryCode": list(parser.industry_codes),
+    "OpenClosed": ["O", "C"],
+    "PayStatus": ["C", "1", "2"],
+    "VerificationIndicator": ["V", "U"],
+    "CreditType": ["R", "I", "M"],
+    "PaymentFrequency": ["M", "W"],
+    "TermType": ["P", "V"],
+    "WorstPayStatus": ["C", "1", "2", "3"],
+}
+PAY_STATUS_SYMBOLS = "CCCCCCCCU0123"
+
+# sample values used to build synthetic TrueLink documents
+FIRST_NAMES = ["Jane", "John", "Maria", "Wei", "Amir", "Olga"]
+LAST_NAMES = ["Doe", "Smith", "Garcia", "Chen", "Khan", "Ivanova"]
+FACTOR_TYPES = ["Negative", "Positive"]
+MESSAGE_SYMBOLS = ["FR", "SB", "DS", "CV", "MX"]
+SNAPSHOT_NUMERIC_FIELDS = [
+    "DelinquentAccounts", "DerogatoryAccounts", "TotalBalances", "TotalMonthlyPayments",
+    "NumberOfInquiries", "TotalPublicRecords", "BalanceOpenRevolvingAccounts", "TotalOpenRevolvingAccounts",
+    "BalanceOpenInstallmentAccounts", "TotalOpenInstallmentAccounts", "BalanceOpenMortgageAccounts",
+    "TotalOpenMortgageAccounts", "BalanceOpenCollectionAccounts", "TotalOpenCollectionAccounts",
+    "BalanceOpenOtherAccounts", "TotalOpenOtherAccounts", "AvailableCredit", "Utilization",
+    "OnTimePaymentPercentage", "LatePaymentPercentage", "AgeOfCredit",
+]
+
+
+def make_tradelines(count, seed=0):
+    """
+    Build a list of synthetic TradeLinePartition entries.
+
+    Args:
+        count (int): Number of tradelines to generate.
+        seed (int): Seed for the random generator, so runs are reproducible.
+
+    Returns:
+        list: Tradeline partition dicts in the parsed report shape.
+    """
+    rng = random.Random(seed)
+    tradelines = []
+    for _ in range(count):
+        granted_trade = {}
+        tradeline = {"GrantedTrade": granted_trade}
+        for field, in_granted_trade, _, _ in parser.TRADELINE_FIELD_PLAN:
+            target = granted_trade if in_granted_trade else tradeline
+            # Mix abbreviation-only and description-only fields to hit the fallback
+            if rng.random() < 0.8:
+                target[field] = {"abbreviation": rng.choice(FIELD_VALUES[field])}
+            else:
+                target[field] = {"description": rng.choice(FIELD_VALUES[field]) + " desc"}
+
+        months = rng.randint(12, 84)
+        roll = rng.random()
+        if roll < 0.6:
+            granted_trade["PayStatusHistory"] = {
+                "status": "".join(rng.choice(PAY_STATUS_SYMBOLS) for _ in range(months))
+            }
+        elif roll < 0.9:
+            granted_trade["PayStatusHistory"] = {
+                "MonthlyPayStatus": [{"status": rng.choice(PAY_STATUS_SYMBOLS)} for _ in range(months)]
+            }
+        else:
+            granted_trade["PayStatusHistory"] = None
+
+        tradelines.append({
+            "accountTypeDescription": rng.choice(ACCOUNT_TYPES),
+            "Tradeline": tradeline,
+        })
+    return tradelines
+
+
+def benchmark_tradeline_aggregation(sizes=(50, 500, 5000), repeat=5):
+    """
+    Time aggregate_tradelines per report. Its output is covered by the unit tests.
+
+    Args:
+        sizes (tuple): Tradeline counts to benchmark.
+        repeat (int): Timing repetitions; the best run is reported.
+
+    Returns:
+        list: One result dict per size with the single-pass timing.
+    """
+    results = []
+    for size in sizes:
+        big_dict = {"TradeLinePartition": make_tradelines(size)}
+
+        number = max(1, 5000 // size)
+        single = min(timeit.repeat(lambda: parser.aggregate_tradelines(big_dict), number=number, repeat=repeat)) / number
+
+        results.append({"tradelines": size, "single_pass_ms": round(single * 1000, 3)})
+        print(f"{size:>6} tradelines: single pass {single * 1000:9.3f} ms")
+    return results
+
+
+def benchmark_feature_spec(employers=(1, 3, 10), messages=30, repeat=5):
+    """
+    Time the compiled feature spec per report. Its output is covered by the unit tests.
+
+    Args:
+        employers (tuple): Employer counts to benchmark.
+        messages (int): Messages in each synthetic report.
+        repeat (int): Timing repetitions; the best run is reported.
+
+    Returns:
+        list: One result dict per employer count with the compiled spec timing.
+    """
+    results = []
+    for employer_count in employers:
+        xml_bytes = generate_truelink_xml(10, employers=employer_count, messages=messages,
+                                          original_data_kb=1).encode("utf-8")
+        parsed_data = parser.stream_parse_xml(xml_bytes)
+        big_dict = parser.process_truelink_data(parsed_data)
+
+        number = 2000
+        compiled = min(timeit.repeat(lambda: parser.evaluate_features(parsed_data, big_dict),
+                                     number=number, repeat=repeat)) / number
+
+        results.append({"employers": employer_count, "compiled_us": round(compiled * 1e6, 2)})
+        print(f"{employer_count:>3} employers: compiled spec {compiled * 1e6:8.2f} us")
+    return results
+
+
+def make_output_data(tradeline_count, seed=0):
+    """
+    Build a synthetic output_data dictionary with realistic counter sizes.
+
+    Args:
+        tradeline_count (int): Number of tradelines behind the counters.
+        seed (int): Seed for the random generator.
+
+    Returns:
+        dict: A report summary in the output_data shape.
+    """
+    rng = random.Random(seed)
+    tradeline_stats = parser.aggregate_tradelines({"TradeLinePartition": make_tradelines(tradeline_count, seed)})
+    tradeline_vars = parser.generate_snake_case_variables(tradeline_stats["converted_data"])
+
+    output_data = {key: rng.randint(0, 50000) for key in parser.SNAPSHOT_OUTPUT_KEYS}
+    output_data.update({
+        "date_of_oldest_trade": "2004-06-01",
+        "closed_account_pct": 0.25,
+        "open_account_pct": 0.75,
+        "deragatory_account_pct": 0.1,
+        "inquiry_date": "2024-01-02",
+        "username": "Jane Q Doe",
+        "days_current_address": 1500,
+        "num_previous_addresses": 3,
+        "users_age": 41.5,
+        "recent_employers": {"employer_1": {"name": "Acme", "dateUpdated": "2021-01-01"}},
+        "risk_score": 712,
+        "factor_type_counts": {"Negative": 2, "Positive": 2},
+        "account_type_counts": tradeline_stats["account_type_counts"],
+    })
+    output_data.update({key: tradeline_vars[key] for key in parser.TRADELINE_OUTPUT_KEYS})
+    output_data["messages"] = {"A1": 2, "B2": 1}
+    return output_data
+
+
+def legacy_json_write(output_data, file_path):
+    """The /tmp JSON write plus file re-read upload_file used to do per report."""
+    with open(file_path, "w") as json_file:
+        json.dump(output_data, json_file, indent=4)
+    with open(file_path, "rb") as f:
+        return f.read()
+
+
+def benchmark_output_sinks(tradeline_count=500, repeat=5, formats=(("json", "none"), ("json", "gzip"),
+                                                                   ("json", "zstd"), ("parquet", "zstd"))):
+    """
+    Compare serialized size and write latency of the output sinks against the legacy /tmp write.
+
+    Args:
+        tradeline_count (int): Tradelines behind the synthetic report summary.
+        repeat (int): Timing repetitions; the best run is reported.
+        formats (tuple): (output_format, compression) pairs to measure.
+
+    Returns:
+        list: One result dict per sink with bytes and milliseconds per report.
+    """
+    output_data = make_output_data(tradeline_count)
+    number = 200
+    results = []
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_path = os.path.join(tmp_dir, "report.json")
+        legacy_bytes = len(legacy_json_write(output_data, file_path))
+        legacy = min(timeit.repeat(lambda: legacy_json_write(output_data, file_path),
+                                   number=number, repeat=repeat)) / number
+        results.append({"sink": "legacy /tmp json", "bytes": legacy_bytes, "ms": round(legacy * 1000, 4)})
+
+    for output_format, compression in formats:
+        try:
+            body, _, _ = parser.serialize_output(output_data, output_format, compression)
+        except ImportError as e:
+            print(f"Skipping {output_format}/{compression}: {e}")
+            continue
+        elapsed = min(timeit.repeat(lambda: parser.serialize_output(output_data, output_format, compression),
+                                    number=number, repeat=repeat)) / number
+        results.append({"sink": f"{output_format}/{compression}", "bytes": len(body), "ms": round(elapsed * 1000, 4)})
+
+    for result in results:
+        print(f"{result['sink']:>18}: {result['bytes']:>8} bytes | {result['ms']:8.4f} ms per report")
+    return results
+
+
+def _attrs(**attrs):
+    """Render keyword arguments as XML attributes."""
+    return " ".join(f"{key}={quoteattr(str(value))}" for key, value in attrs.items())
+
+
+def _random_date(rng, start_year=1995, end_year=2024):
+    """Return a random ISO date string."""
+    return f"{rng.randint(start_year, end_year)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+
+
+def generate_truelink_xml(tradelines=50, inquiries=5, employers=3, messages=10, original_data_kb=256, seed=0):
+    """
+    Generate a deterministic synthetic TrueLink credit report.
+
+    The document has the Snapshot and TrueLinkCreditReportType sections the Lambda
+    reads, plus an OriginalData blob of the requested size that the parser drops.
+
+    Args:
+        tradelines (int): Number of TradeLinePartition entries.
+        inquiries (int): Number of InquiryPartition entries.
+        employers (int): Number of Borrower Employer entries.
+        messages (int): Number of Message entries.
+        original_data_kb (int): Approximate size of the OriginalData section in KB.
+        seed (int): Seed for the random generator.
+
+    Returns:
+        str: The XML document, as delivered to the bucket (no single root element).
+    """
+    rng = random.Random(seed)
+    parts = []
+
+    # Snapshot summary
+    total_accounts = max(tradelines, 1)
+    open_accounts = max(1, int(total_accounts * rng.uniform(0.4, 0.9)))
+    snapshot = {"TotalAccounts": total_accounts, "totalClosedAccounts": total_accounts - open_accounts,
+                "OpenAccounts": open_accounts, "DateOfOldestTrade": _random_date(rng, 1990, 2005)}
+    for field in SNAPSHOT_NUMERIC_FIELDS:
+        if "Balance" in field or "Payments" in field or field == "AvailableCredit":
+            snapshot[field] = rng.randint(0, 50000)
+        elif "Percentage" in field or field == "Utilization":
+            snapshot[field] = rng.randint(0, 100)
+        elif field == "AgeOfCredit":
+            snapshot[field] = rng.randint(12, 480)
+        else:
+            snapshot[field] = rng.randint(0, total_accounts)
+    snapshot["DerogatoryAccounts"] = rng.randint(0, open_accounts)
+    parts.append(f"<Snapshot {_attrs(**snapshot)}/>")
+
+    parts.append("<TrueLinkCreditReportType>")
+    parts.append(f"<SB168Frozen {_attrs(equifax='false', experian='false', transUnion='false')}/>")
+    parts.append(f"<Sources><Source {_attrs(InquiryDate=_random_date(rng, 2023, 2024))}/></Sources>")
+
+    # Borrower details
+    parts.append("<Borrower>")
+    parts.append(f"<BorrowerName><Name {_attrs(first=rng.choice(FIRST_NAMES), middle='Q', last=rng.choice(LAST_NAMES))}/></BorrowerName>")
+    parts.append(f"<BorrowerAddress {_attrs(dateReported=_random_date(rng, 2010, 2023))}/>")
+    for _ in range(rng.randint(1, 4)):
+        parts.append(f"<PreviousAddress {_attrs(dateReported=_random_date(rng))}/>")
+    parts.append(f"<Birth {_attrs(date=_random_date(rng, 1950, 2000))}/>")
+    for idx in range(employers):
+        parts.append(f"<Employer {_attrs(name=f'Employer {idx}', dateUpdated=_random_date(rng, 2015, 2024))}/>")
+    parts.append(f"<CreditScore {_attrs(riskScore=rng.randint(300, 850))}>")
+    for _ in range(4):
+        parts.append(f"<CreditScoreFactor {_attrs(FactorType=rng.choice(FACTOR_TYPES))}>"
+                     f"<Factor {_attrs(description='Synthetic factor')}/></CreditScoreFactor>")
+    parts.append("</CreditScore></Borrower>")
+
+    # Tradelines, with every counter field and a pay status history
+    for item in make_tradelines(tradelines, seed):
+        tradeline = item["Tradeline"]
+        granted_trade = tradeline["GrantedTrade"]
+        fields = "".join(f"<{field} {_attrs(**value)}/>" for field, value in tradeline.items() if field != "GrantedTrade")
+        granted_fields = "".join(f"<{field} {_attrs(**value)}/>" for field, value in granted_trade.items()
+                                 if field != "PayStatusHistory")
+        history = granted_trade["PayStatusHistory"]
+        if history is None:
+            history_xml = "<PayStatusHistory/>"
+        elif "status" in history:
+            history_xml = f"<PayStatusHistory {_attrs(status=history['status'])}/>"
+        else:
+            monthly = "".join(f"<MonthlyPayStatus {_attrs(**entry)}/>" for entry in history["MonthlyPayStatus"])
+            history_xml = f"<PayStatusHistory>{monthly}</PayStatusHistory>"
+        parts.append(
+            f"<TradeLinePartition {_attrs(accountTypeDescription=item['accountTypeDescription'])}>"
+            f"<Tradeline {_attrs(currentBalance=rng.randint(0, 20000), dateOpened=_random_date(rng))}>{fields}"
+            f"<GrantedTrade {_attrs(monthlyPayment=rng.randint(0, 900))}>{granted_fields}{history_xml}</GrantedTrade>"
+            f"</Tradeline></TradeLinePartition>"
+        )
+
+    for idx in range(inquiries):
+        parts.append(f"<InquiryPartition><Inquiry {_attrs(subscriberName=f'Lender {idx}', inquiryDate=_random_date(rng, 2022, 2024))}/>"
+                     f"</InquiryPartition>")
+
+    for _ in range(messages):
+        parts.append(f"<Message><Code {_attrs(symbol=rng.choice(MESSAGE_SYMBOLS))}/>"
+                     f"<Text>{escape('Synthetic bureau message & notes')}</Text></Message>")
+
+    # Raw bureau payload the Lambda discards
+    line = escape("RAW|BUREAU|PAYLOAD|<segment>|0123456789|ABCDEFGHIJKLMNOPQRSTUVWXYZ\n")
+    parts.append("<OriginalData><Data>")
+    parts.append(line * max(1, original_data_kb * 1024 // len(line)))
+    parts.append("</Data></OriginalData>")
+
+    parts.append("</TrueLinkCreditReportType>")
+    return "\n".join(parts)
+
+
+class FakeS3Client:
+    """In-memory stand-in for the boto3 S3 client used by the Lambda."""
+
+    def __init__(self, objects=None):
+        self.objects = dict(objects or {})
+
+    def get_object(self, Bucket, Key):
+        return {"Body": io.BytesIO(self.objects[(Bucket, Key)]), "ContentLength": len(self.objects[(Bucket, Key)])}
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self.objects[(Bucket, Key)] = Body
+        return {}
+
+    def list_objects_v2(self, Bucket, Prefix="", MaxKeys=1000, **kwargs):
+        keys = sorted(key for bucket, key in self.objects if bucket == Bucket and key.startswith(Prefix))[:MaxKeys]
+        return {"Contents": [{"Key": key, "Size": len(self.objects[(Bucket, key)]),
+                              "ETag": hashlib.md5(self.objects[(Bucket, key)]).hexdigest()} for key in keys]}
+
+    def get_paginator(self, operation_name):
+        client = self
+
+        class Paginator:
+            def paginate(self, **kwargs):
+                yield client.list_objects_v2(MaxKeys=10 ** 9, **kwargs)
+
+        return Paginator()
+
+    def delete_objects(self, Bucket, Delete):
+        for item in Delete["Objects"]:
+            self.objects.pop((Bucket, item["Key"]), None)
+        return {}
+
+
+@contextlib.contextmanager
+def stubbed_s3(objects=None):
+    """Temporarily replace the Lambda's S3 client with a FakeS3Client and default the output bucket."""
+    original = parser._clients.get("s3")
+    original_bucket, original_prefix = parser.OUTPUT_BUCKET, parser.OUTPUT_PREFIX
+    fake = FakeS3Client(objects)
+    parser._clients["s3"] = fake
+    parser.OUTPUT_BUCKET = original_bucket or "bench-output"
+    parser.OUTPUT_PREFIX = original_prefix or ""
+    try:
+        yield fake
+    finally:
+        parser.OUTPUT_BUCKET, parser.OUTPUT_PREFIX = original_bucket, original_prefix
+        if original is None:
+            parser._clients.pop("s3", None)
+        else:
+            parser._clients["s3"] = original
+
+
+class FakeRedshiftDataClient:
+    """
+    In-memory stand-in for the boto3 redshift-data client used by RedshiftBatchLoader.
+
+    batch_execute_statement reads the manifest and staged row objects from a FakeS3Client and applies
+    the loader's merge rules: a batch ID already in the load log is not applied again, a row replaces
+    the row of its source_key, and a missing optional entry is skipped. Set fail_next to make the
+    next statement fail.
+    """
+
+    def __init__(self, s3_client):
+        self.s3_client = s3_client
+        self.statements = {}
+        self.load_log = {}
+        self.table = {}
+        self.fail_next = False
+
+    def _read(self, url):
+        bucket, _, key = url[len("s3://"):].partition("/")
+        return self.s3_client.objects[(bucket, key)]
+
+    def batch_execute_statement(self, Sqls, StatementName=None, **kwargs):
+        statement_id = f"stmt-{len(self.statements) + 1}"
+        if self.fail_next:
+            self.fail_next = False
+            self.statements[statement_id] = {"Status": "FAILED", "Error": "Simulated load failure"}
+            return {"Id": statement_id}
+
+        batch_id = StatementName.replace("report-load-", "", 1)
+        manifest_url = re.search(r"FROM '(s3://[^']+)'", next(sql for sql in Sqls if sql.startswith("COPY"))).group(1)
+        inserted = 0
+        if batch_id not in self.load_log:
+            for entry in json.loads(self._read(manifest_url))["entries"]:
+                bucket, _, key = entry["url"][len("s3://"):].partition("/")
+                if not entry["mandatory"] and (bucket, key) not in self.s3_client.objects:
+                    continue
+                for line in gzip.decompress(self._read(entry["url"])).decode("utf-8").splitlines():
+                    row = json.loads(line)
+                    self.table[row["source_key"]] = row
+                    inserted += 1
+            self.load_log[batch_id] = inserted
+
+        self.statements[statement_id] = {"Status": "FINISHED", "Sqls": Sqls, "InsertedRows": inserted}
+        return {"Id": statement_id}
+
+    def describe_statement(self, Id):
+        return {"Id": Id, **self.statements[Id]}
+
+
+def benchmark_redshift_load(reports=200, records_per_event=10, batch_rows=30, tradelines=20):
+    """
+    Run events through lambda_handler, which only stages rows, then load them with load_handler,
+    against local stand-ins.
+
+    Checks that the handler issues no COPY, that one load run is capped at LOAD_FLUSH_MAX_BATCHES
+    batches of one COPY each, that a failed flush keeps its rows staged in S3, that a re-sent batch is
+    retried under the same batch ID, and that a reprocessed report replaces its loaded row.
+
+    Args:
+        reports (int): Number of synthetic reports.
+        records_per_event (int): S3 records per Lambda event.
+        batch_rows (int): Row bound of a load batch.
+        tradelines (int): Tradelines per synthetic report.
+
+    Returns:
+        dict: Reports, COPY statements, load runs, rows loaded and elapsed milliseconds.
+    """
+    objects = {("bench-bucket", f"reports/report-{idx:05d}.xml"):
+               generate_truelink_xml(tradelines, original_data_kb=4, seed=idx).encode("utf-8") for idx in range(reports)}
+    keys = [key for _, key in objects]
+
+    original_loader = parser.get_report_loader
+    with stubbed_s3(objects) as s3_client, open(os.devnull, "w") as devnull, \
+            contextlib.redirect_stdout(devnull), contextlib.redirect_stderr(devnull):
+        data_client = FakeRedshiftDataClient(s3_client)
+        loader = parser.RedshiftBatchLoader("credit_report_features", parser.OUTPUT_BUCKET, parser.OUTPUT_PREFIX,
+                                            max_rows=batch_rows, client=data_client)
+        parser.get_report_loader = lambda: loader
+        try:
+            start = time.perf_counter()
+            for offset in range(0, reports, records_per_event):
+                event = {"Records": [{"s3": {"bucket": {"name": "bench-bucket"}, "object": {"key": key}}}
+                                     for key in keys[offset:offset + records_per_event]]}
+                parser.lambda_handler(event, None)
+            if data_client.statements:
+                raise AssertionError("The report handler ran a Redshift load")
+
+            # Scheduled load runs, each capped at LOAD_FLUSH_MAX_BATCHES batches
+            load_runs = 0
+            while True:
+                response = parser.load_handler({}, None)
+                load_runs += 1
+                if len(response["batches"]) > parser.LOAD_FLUSH_MAX_BATCHES:
+                    raise AssertionError("A load run exceeded LOAD_FLUSH_MAX_BATCHES")
+                if not response["pending"]:
+                    break
+            elapsed = time.perf_counter() - start
+            copies = len(data_client.statements)
+
+            # A failed flush keeps its rows staged, and the retry reuses the batch ID
+            retry_rows = {key: {"risk_score": 700} for key in ["retry/a.xml", "retry/b.xml"]}
+            for key, row in retry_rows.items():
+                loader.add(key, row)
+            data_client.fail_next = True
+            if parser.flush_report_loads() or not loader.has_pending():
+                raise AssertionError("A failed Redshift load did not keep its rows for the retry")
+            retried = parser.flush_report_loads()
+
+            # Re-sending the same rows maps to the same batch ID, which the load log skips
+            for key, row in retry_rows.items():
+                loader.add(key, row)
+            resent = parser.flush_report_loads()
+
+            # A reprocessed report with a changed row replaces its loaded row
+            loader.add("retry/a.xml", {"risk_score": 720})
+            parser.flush_report_loads()
+            if data_client.table["retry/a.xml"]["risk_score"] != 720:
+                raise AssertionError("A reprocessed report did not replace its loaded row")
+        finally:
+            parser.get_report_loader = original_loader
+
+    if resent != retried or data_client.load_log[resent[0]] != 2:
+        raise AssertionError("A re-sent batch was not recognised by its batch ID")
+    if len(data_client.table) != reports + len(retry_rows):
+        raise AssertionError(f"Expected {reports + len(retry_rows)} loaded rows, found {len(data_client.table)}")
+
+    result = {"reports": reports, "copy_statements": copies, "load_runs": load_runs,
+              "rows_loaded": len(data_client.table), "ms": round(elapsed * 1000, 1)}
+    print(f"Redshift load: {reports} reports in {elapsed * 1000:.1f} ms, {copies} COPY statements in "
+          f"{load_runs} load runs (batch_rows={batch_rows}), {len(data_client.table)} rows, no duplicates")
+    return result
+
+
+def measure(func, repeat=5):
+    """
+    Measure wall time, peak traced memory and retained allocations of func().
+
+    Args:
+        func (callable): The stage to measure.
+        repeat (int): Timing repetitions; the best run is reported.
+
+    Returns:
+        dict: ms (best wall time), peak_kb (tracemalloc peak) and blocks (allocations still alive after the call).
+    """
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        result = func()
+        after = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, "filename"))
+    del result
+    return {"ms": round(min(timings) * 1000, 3), "peak_kb": round(peak / 1024, 1), "blocks": blocks}
+
+
+def benchmark_stages(tradelines=500, inquiries=20, employers=3, messages=30, original_data_kb=1024, repeat=5):
+    """
+    Run each Lambda stage and the whole record path on a synthetic report, offline.
+
+    Args:
+        tradelines (int): Tradelines in the synthetic report.
+        inquiries (int): Inquiries in the synthetic report.
+        employers (int): Employers in the synthetic report.
+        messages (int): Messages in the synthetic report.
+        original_data_kb (int): Size of the OriginalData section in KB.
+        repeat (int): Timing repetitions per stage.
+
+    Returns:
+        dict: Stage name -> measurement dict from measure().
+    """
+    xml_content = generate_truelink_xml(tradelines, inquiries, employers, messages, original_data_kb)
+    xml_bytes = xml_content.encode("utf-8")
+    parsed_data = parser.stream_parse_xml(xml_bytes)
+    big_dict = parser.process_truelink_data(parsed_data)
+    tradeline_stats = parser.aggregate_tradelines(big_dict)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        output_data = parser.extract_report_features(parsed_data)
+
+    record = {"s3": {"bucket": {"name": "bench-bucket"}, "object": {"key": "reports/bench.xml"}}}
+
+    def run_record():
+        with stubbed_s3({("bench-bucket", "reports/bench.xml"): xml_bytes}):
+            parser.run_record(record)
+
+    # The same report uploaded gzip-compressed, decompressed while streaming into the parser
+    gzip_bytes = gzip.compress(xml_bytes)
+    gzip_record = {"s3": {"bucket": {"name": "bench-bucket"}, "object": {"key": "reports/bench.xml.gz"}}}
+
+    def run_record_gzip():
+        with stubbed_s3({("bench-bucket", "reports/bench.xml.gz"): gzip_bytes}):
+            parser.run_record(gzip_record)
+
+    stages = {
+        "preprocess_and_parse_xml": lambda: parser.preprocess_and_parse_xml(xml_content),
+        "stream_parse_xml": lambda: parser.stream_parse_xml(xml_bytes),
+        "process_truelink_data": lambda: parser.process_truelink_data(parsed_data),
+        "aggregate_tradelines": lambda: parser.aggregate_tradelines(big_dict),
+        "compute_delinquency_features": lambda: parser.compute_delinquency_features(
+            tradeline_stats["history_strings"], tradeline_stats["industry_abbreviations"]),
+        "evaluate_features": lambda: parser.evaluate_features(parsed_data, big_dict),
+        "build_tradeline_table": lambda: parser.build_tradeline_table(big_dict, tradeline_stats["history_strings"]),
+        "extract_report_features": lambda: parser.extract_report_features(parsed_data),
+        "serialize_output": lambda: parser.serialize_output(output_data),
+        "run_record": run_record,
+        "run_record_gzip": run_record_gzip,
+    }
+
+    print(f"Synthetic report: {len(xml_bytes) / 1024:.0f} KB, {tradelines} tradelines")
+    results = {}
+
+    # Measure the full record path, not dedup replays of the first repetition
+    dedup_cache = parser._dedup_cache
+    parser._dedup_cache = None
+    try:
+        for name, func in stages.items():
+            results[name] = measure(func, repeat)
+            print(f"{name:>32}: {results[name]['ms']:9.3f} ms | peak {results[name]['peak_kb']:9.1f} KB | "
+                  f"{results[name]['blocks']:>7} blocks")
+    finally:
+        parser._dedup_cache = dedup_cache
+    return results
+
+
+# run in a fresh interpreter: time the module import, then the first S3 client creation
+IMPORT_PROBE = (
+    "import time; start = time.perf_counter(); import aws_lambda_xml_parsing as m; "
+    "imported = time.perf_counter(); m.get_s3_client(); "
+    "print(imported - start, time.perf_counter() - imported)"
+)
+
+
+def benchmark_import(repeat=5, top=10):
+    """
+    Measure cold-start cost: module import time and first-use client init time.
+
+    Each run uses a fresh interpreter, like a Lambda cold start. One extra run with
+    -X importtime lists the slowest imports.
+
+    Args:
+        repeat (int): Fresh interpreters to start; the median is reported.
+        top (int): Number of slowest imports to list.
+
+    Returns:
+        dict: Stage name -> {'ms': median milliseconds} for import_module and init_s3_client.
+    """
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.path.dirname(os.path.abspath(parser.__file__))
+    env.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+    import_times, init_times = [], []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, "-c", IMPORT_PROBE], env=env, check=True,
+                                capture_output=True, text=True).stdout.split()
+        import_times.append(float(output[-2]) * 1000)
+        init_times.append(float(output[-1]) * 1000)
+
+    # -X importtime writes "import time: self [us] | cumulative | imported package" lines to stderr
+    importtime = subprocess.run([sys.executable, "-X", "importtime", "-c", "import aws_lambda_xml_parsing"],
+                                env=env, check=True, capture_output=True, text=True).stderr
+    imports = []
+    for line in importtime.splitlines()[1:]:
+        fields = line.split("|")
+        # keep top-level imports and the ones made directly by the module (nested ones are indented deeper)
+        if len(fields) == 3 and len(fields[2]) - len(fields[2].lstrip()) <= 3:
+            imports.append((int(fields[1]), fields[2].strip()))
+
+    results = {
+        "import_module": {"ms": round(statistics.median(import_times), 3)},
+        "init_s3_client": {"ms": round(statistics.median(init_times), 3)},
+    }
+    print(f"Import: {results['import_module']['ms']:.1f} ms | first S3 client: {results['init_s3_client']['ms']:.1f} ms")
+    for cumulative_us, name in sorted(imports, reverse=True)[:top]:
+        print(f"{name:>32}: {cumulative_us / 1000:8.1f} ms cumulative")
+    return results
+
+
+def compare_to_baseline(results, baseline_path, tolerance=0.2, min_delta_ms=1.0):
+    """
+    Compare stage timings with a saved baseline and list the regressions.
+
+    Args:
+        results (dict): Output of benchmark_stages.
+        baseline_path (str): JSON file written with --save-baseline.
+        tolerance (float): Allowed slowdown before a stage counts as a regression.
+        min_delta_ms (float): Slowdowns smaller than this are treated as timer noise.
+
+    Returns:
+        list: Names of the stages slower than the baseline by more than tolerance.
+    """
+    with open(baseline_path, "r") as f:
+        baseline = json.load(f)
+
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        ratio = result["ms"] / baseline[name]["ms"] if baseline[name]["ms"] else 1.0
+        slower_ms = result["ms"] - baseline[name]["ms"]
+        flag = "REGRESSION" if ratio > 1 + tolerance and slower_ms > min_delta_ms else ""
+        print(f"{name:>32}: {ratio:6.2f}x baseline time {flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Benchmark the XML Lambda parser offline.")
+    arg_parser.add_argument("--sizes", type=int, nargs="+", default=[50, 500, 5000],
+                            help="Tradeline counts to benchmark.")
+    arg_parser.add_argument("--repeat", type=int, default=5, help="Timing repetitions per size.")
+    arg_parser.add_argument("--suite", choices=["tradelines", "features", "sinks", "load", "stages", "import"],
+                            nargs="+", default=["tradelines", "features", "sinks", "load", "stages", "import"], help="Benchmarks to run.")
+    arg_parser.add_argument("--tradelines", type=int, default=500, help="Tradelines in the stages report.")
+    arg_parser.add_argument("--inquiries", type=int, default=20, help="Inquiries in the stages report.")
+    arg_parser.add_argument("--employers", type=int, default=3, help="Employers in the stages report.")
+    arg_parser.add_argument("--messages", type=int, default=30, help="Messages in the stages report.")
+    arg_parser.add_argument("--original-data-kb", type=int, default=1024, help="OriginalData size in the stages report.")
+    arg_parser.add_argument("--save-baseline", default=None, help="Write the stage results to this JSON file.")
+    arg_parser.add_argument("--compare", default=None, help="Compare the stage results with this baseline JSON file.")
+    args = arg_parser.parse_args()
+
+    if "tradelines" in args.suite:
+        benchmark_tradeline_aggregation(tuple(args.sizes), args.repeat)
+    if "features" in args.suite:
+        benchmark_feature_spec(repeat=args.repeat)
+    if "sinks" in args.suite:
+        benchmark_output_sinks(repeat=args.repeat)
+    if "load" in args.suite:
+        benchmark_redshift_load()
+    results = {}
+    if "stages" in args.suite:
+        results.update(benchmark_stages(args.tradelines, args.inquiries, args.employers, args.messages,
+                                        args.original_data_kb, args.repeat))
+    if "import" in args.suite:
+        results.update(benchmark_import(args.repeat))
+    if results:
+        if args.save_baseline:
+            with open(args.save_baseline, "w") as f:
+                json.dump(results, f, indent=4)
+            print(f"Baseline saved to {args.save_baseline}")
+        if args.compare and compare_to_baseline(results, args.compare):
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,343 @@
+import argparse
+import contextlib
+import csv
+import gzip
+import io
+import os
+import random
+import shutil
+import tempfile
+import time
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+import incremental_cron_etl_example as etl
+
+"""
+Benchmarks for the staging formats and export paths of incremental_cron_etl_example.py. Rows
+are synthetic, so bytes written and rows per second can be compared offline; --copy also
+uploads the parts and times the Redshift COPY of each format against a real cluster.
+"""
+
+# cursor.description stand-in: name, Postgres type oid, numeric precision and scale
+Column = namedtuple("Column", ["name", "type_code", "precision", "scale"])
+SYNTHETIC_DESCRIPTION = [
+    Column("id", 20, None, None),
+    Column("account_id", 23, None, None),
+    Column("email", 1043, None, None),
+    Column("status", 1043, None, None),
+    Column("amount", 1700, 12, 2),
+    Column("score", 701, None, None),
+    Column("is_active", 16, None, None),
+    Column("birth_date", 1082, None, None),
+    Column("created_at", 1114, None, None),
+    Column("updated_at", 1114, None, None),
+]
+
+# Redshift table the --copy benchmark loads into, with the synthetic columns
+SYNTHETIC_TABLE_DDL = """
+CREATE TABLE {table_name}_temp (
+    id BIGINT, account_id INTEGER, email VARCHAR(256), status VARCHAR(32), amount NUMERIC(12, 2),
+    score DOUBLE PRECISION, is_active BOOLEAN, birth_date DATE, created_at TIMESTAMP, updated_at TIMESTAMP
+);
+"""
+
+STATUSES = ["active", "pending", "closed", "past_due"]
+
+
+def make_rows(count, seed=0):
+    """
+    Build synthetic source rows matching SYNTHETIC_DESCRIPTION, with some NULLs.
+
+    Args:
+        count (int): Number of rows.
+        seed (int): Random seed.
+
+    Returns:
+        list: Row tuples as psycopg2 would return them.
+    """
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    rows = []
+    for i in range(1, count + 1):
+        created_at = start + timedelta(seconds=rng.randrange(0, 365 * 86400), microseconds=rng.randrange(10 ** 6))
+        rows.append((
+            i,
+            rng.randrange(1, 10 ** 6) if rng.random() < 0.9 else None,
+            f"user{rng.randrange(10 ** 7)}@example.com",
+            rng.choice(STATUSES),
+            Decimal(rng.randrange(0, 10 ** 7)) / 100,
+            rng.random() * 850 if rng.random() < 0.95 else None,
+            rng.random() < 0.8,
+            date(1950, 1, 1) + timedelta(days=rng.randrange(20000)),
+            created_at,
+            created_at + timedelta(days=rng.randrange(30)),
+        ))
+    return rows
+
+
+def count_rows(file_path, staging_format):
+    """Read a staging file back and return its row count, to check nothing was dropped."""
+    if staging_format == "parquet":
+        import pyarrow.parquet as pq
+        return pq.ParquetFile(file_path).metadata.num_rows
+    if staging_format == "csv_gzip":
+        with gzip.open(file_path, "rb") as f:
+            return sum(1 for _ in f)
+    if staging_format == "csv_zstd":
+        import zstandard
+        with open(file_path, "rb") as f:
+            return zstandard.ZstdDecompressor().stream_reader(f).read().count(b"\n")
+    with open(file_path, "rb") as f:
+        return sum(1 for _ in f)
+
+
+def benchmark_staging_formats(rows, repeat=3, formats=tuple(etl.STAGING_EXTENSIONS)):
+    """
+    Time transform() per staging format and measure the bytes it writes.
+
+    Args:
+        rows (list): Synthetic rows from make_rows.
+        repeat (int): Timing repetitions; the best run is reported.
+        formats (tuple): Staging formats to compare.
+
+    Returns:
+        list: One result dict per format with bytes, write time and rows per second.
+    """
+    results = []
+    for staging_format in formats:
+        timings = []
+        for _ in range(repeat):
+            start_time = time.perf_counter()
+            file_path = etl.transform(rows, SYNTHETIC_DESCRIPTION, "benchmark", "bench", staging_format=staging_format)
+            timings.append(time.perf_counter() - start_time)
+            size = os.path.getsize(file_path)
+            written_rows = count_rows(file_path, staging_format)
+            os.remove(file_path)
+
+        if written_rows != len(rows):
+            raise AssertionError(f"{staging_format} wrote {written_rows} of {len(rows)} rows")
+        seconds = min(timings)
+        results.append({
+            "format": staging_format,
+            "bytes": size,
+            "bytes_per_row": round(size / len(rows), 1),
+            "write_ms": round(seconds * 1000, 1),
+            "rows_per_second": round(len(rows) / seconds),
+        })
+
+    json_bytes = next((result["bytes"] for result in results if result["format"] == "json"), None)
+    for result in results:
+        ratio = f" | {json_bytes / result['bytes']:5.1f}x smaller than json" if json_bytes else ""
+        print(f"{result['format']:>9}: {result['bytes'] / 1024 / 1024:8.2f} MB | {result['bytes_per_row']:7.1f} B/row | "
+              f"write {result['write_ms']:8.1f} ms | {result['rows_per_second']:>9} rows/s{ratio}")
+    return results
+
+
+class NullS3Client:
+    """S3 client stand-in that accepts uploads and only counts the bytes, so export paths can be timed offline."""
+
+    def __init__(self):
+        self.bytes_uploaded = 0
+
+    def upload_file(self, file_path, bucket_name, s3_key):
+        self.bytes_uploaded += os.path.getsize(file_path)
+
+    def put_object(self, Bucket, Key, Body):
+        self.bytes_uploaded += len(Body)
+
+    def create_multipart_upload(self, Bucket, Key):
+        return {"UploadId": "benchmark"}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        self.bytes_uploaded += len(Body)
+        return {"ETag": f"etag-{PartNumber}"}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        pass
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        pass
+
+
+def render_copy_lines(rows):
+    """
+    Render rows the way COPY ... TO STDOUT WITH (FORMAT csv, NULL '\\N') sends them, one line per row.
+
+    Args:
+        rows (list): Synthetic rows from make_rows.
+
+    Returns:
+        list: Encoded CSV lines, as psycopg2 hands them to the writer during copy_expert.
+    """
+    def render(value):
+        if value is None:
+            return etl.CSV_NULL
+        if isinstance(value, bool):
+            return "t" if value else "f"
+        if isinstance(value, datetime):
+            return value.isoformat(sep=" ")
+        return str(value)
+
+    lines = []
+    for row in rows:
+        buffer = io.StringIO()
+        csv.writer(buffer, lineterminator="\n").writerow([render(value) for value in row])
+        lines.append(buffer.getvalue().encode("utf-8"))
+    return lines
+
+
+def benchmark_export_paths(rows, repeat=3, staging_format="csv_zstd"):
+    """
+    Compare the cursor export path (transform and upload per chunk) with the COPY TO STDOUT path
+    (Postgres CSV lines counted and streamed through S3MultipartWriter) for the same rows and format.
+
+    The COPY lines are rendered before timing since Postgres produces them server side, and the
+    cursor path starts from fetched tuples, so both timings leave out the database itself.
+    Uploads go to NullS3Client.
+
+    Args:
+        rows (list): Synthetic rows from make_rows.
+        repeat (int): Timing repetitions; the best run is reported.
+        staging_format (str): "csv", "csv_gzip" or "csv_zstd".
+
+    Returns:
+        list: One result dict per path with bytes uploaded and rows per second.
+    """
+    s3 = NullS3Client()
+    etl.s3_client = s3
+    copy_lines = render_copy_lines(rows)
+    compression = {"csv_gzip": "gzip", "csv_zstd": "zstd"}.get(staging_format)
+
+    def cursor_path():
+        for part_number, offset in enumerate(range(0, len(rows), etl.CHUNK_SIZE)):
+            etl.export_chunk(rows[offset:offset + etl.CHUNK_SIZE], SYNTHETIC_DESCRIPTION, "benchmark", "bench",
+                             part_number, staging_format=staging_format)
+
+    def copy_path():
+        with etl.S3MultipartWriter(etl.S3_BUCKET, "benchmark/copy", compression, s3_client=s3) as writer:
+            counter = etl.CsvRecordCounter(writer)
+            for line in copy_lines:
+                counter.write(line)
+        if counter.records != len(rows):
+            raise AssertionError(f"CsvRecordCounter counted {counter.records} of {len(rows)} rows")
+
+    results = []
+    for path, export in (("cursor", cursor_path), ("copy", copy_path)):
+        timings = []
+        for _ in range(repeat):
+            s3.bytes_uploaded = 0
+            start_time = time.perf_counter()
+            export()
+            timings.append(time.perf_counter() - start_time)
+        seconds = min(timings)
+        results.append({
+            "path": path,
+            "bytes": s3.bytes_uploaded,
+            "export_ms": round(seconds * 1000, 1),
+            "rows_per_second": round(len(rows) / seconds),
+        })
+
+    for result in results:
+        speedup = result["rows_per_second"] / results[0]["rows_per_second"]
+        print(f"{result['path']:>9}: {result['bytes'] / 1024 / 1024:8.2f} MB | export {result['export_ms']:8.1f} ms | "
+              f"{result['rows_per_second']:>9} rows/s | {speedup:5.1f}x the cursor path")
+    return results
+
+
+@contextlib.contextmanager
+def throwaway_checkpoint_store():
+    """Swap in an empty, local-only checkpoint store for the duration of the block."""
+    shared_store = etl.checkpoint_store
+    checkpoint_dir = tempfile.mkdtemp(prefix="etl-benchmark-")
+    etl.checkpoint_store = etl.CheckpointStore(os.path.join(checkpoint_dir, "checkpoints.db"), s3_key=None)
+    try:
+        yield etl.checkpoint_store
+    finally:
+        etl.checkpoint_store.conn.close()
+        etl.checkpoint_store = shared_store
+        shutil.rmtree(checkpoint_dir, ignore_errors=True)
+
+
+def benchmark_copy(rows, table_name, formats=tuple(etl.STAGING_EXTENSIONS), chunk_size=None):
+    """
+    Upload the synthetic rows in every staging format and time the Redshift COPY of each.
+
+    Needs AWS credentials, ETL_S3_BUCKET, and the table from SYNTHETIC_TABLE_DDL. The json
+    format also needs the table's jsonpaths file in the bucket.
+
+    Args:
+        rows (list): Synthetic rows from make_rows.
+        table_name (str): Redshift table whose _temp table is loaded and truncated after each format.
+        formats (tuple): Staging formats to compare.
+        chunk_size (int): Rows per part, defaults to etl.CHUNK_SIZE.
+
+    Returns:
+        list: One result dict per format with parts, bytes and COPY time.
+    """
+    chunk_size = chunk_size or etl.CHUNK_SIZE
+    results = []
+    for staging_format in formats:
+        target_date = f"benchmark-{staging_format}"
+        entries = [
+            etl.export_chunk(rows[offset:offset + chunk_size], SYNTHETIC_DESCRIPTION, table_name, target_date,
+                             part_number, staging_format=staging_format)
+            for part_number, offset in enumerate(range(0, len(rows), chunk_size))
+        ]
+        etl.write_manifest(target_date, table_name, entries)
+
+        # Load against a throwaway checkpoint: a run left loaded or merged would make the load return early
+        with throwaway_checkpoint_store():
+            start_time = time.perf_counter()
+            etl.load_target_table_from_s3(target_date, table_name, staging_format)
+            seconds = time.perf_counter() - start_time
+
+        # empty the temp table so every format loads into the same state
+        with etl.redshift_connection() as redshift_conn:
+            redshift_conn.cursor().execute(f"TRUNCATE TABLE {table_name}_temp;")
+            redshift_conn.commit()
+
+        result = {
+            "format": staging_format,
+            "parts": len(entries),
+            "bytes": sum(entry["meta"]["content_length"] for entry in entries),
+            "copy_seconds": round(seconds, 2),
+            "rows_per_second": round(len(rows) / seconds),
+        }
+        results.append(result)
+        print(f"{staging_format:>9}: {result['parts']} parts | {result['bytes'] / 1024 / 1024:8.2f} MB | "
+              f"COPY {result['copy_seconds']:7.2f} s | {result['rows_per_second']:>9} rows/s")
+    return results
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Benchmark the cron ETL staging formats and export paths.")
+    arg_parser.add_argument("--rows", type=int, default=200000, help="Synthetic rows per format.")
+    arg_parser.add_argument("--repeat", type=int, default=3, help="Timing repetitions per format.")
+    arg_parser.add_argument("--formats", nargs="+", choices=list(etl.STAGING_EXTENSIONS),
+                            default=list(etl.STAGING_EXTENSIONS), help="Staging formats to compare.")
+    arg_parser.add_argument("--suite", choices=["formats", "export", "all"], default="all",
+                            help="Compare staging formats, the cursor and COPY export paths, or both.")
+    arg_parser.add_argument("--copy", default=None, metavar="TABLE",
+                            help="Also time the Redshift COPY into TABLE_temp (see SYNTHETIC_TABLE_DDL).")
+    args = arg_parser.parse_args()
+
+    rows = make_rows(args.rows)
+    if args.suite in ("formats", "all"):
+        print(f"Staging {len(rows)} synthetic rows")
+        benchmark_staging_formats(rows, args.repeat, args.formats)
+    if args.suite in ("export", "all"):
+        print(f"Exporting {len(rows)} synthetic rows as {etl.COPY_EXPORT_FORMAT}")
+        benchmark_export_paths(rows, args.repeat, etl.COPY_EXPORT_FORMAT)
+
+    if args.copy:
+        print(f"COPY into {args.copy}_temp")
+        try:
+            benchmark_copy(rows, args.copy, args.formats)
+        finally:
+            etl.close_pools()
+
+
+if __name__ == "__main__":
+    main()
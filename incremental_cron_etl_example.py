@@ -4,7 +4,14 @@ import boto3
 from datetime import date, datetime
 import time
 import os,sys,inspect
+import contextlib
+import json
 import logging
+import sqlite3
+import tempfile
+import threading
+import zlib
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
 
 """
 This sample script covers the incremental ETL from a product AWS Postgres instance (Aurora) and
@@ -19,13 +26,13 @@ log_filename = os.path.join(log_folder, f"jasons_etl_script_{datetime.now().strf
 logging.basicConfig(
     filename=log_filename,
     level=logging.INFO,
-    format='%(asctime)s [%(levelname)s] %(message)s',
+    format='%(asctime)s [%(levelname)s] [%(threadName)s] %(message)s',
     )
 
 # Add a console handler to print to the terminal
 console_handler = logging.StreamHandler()
 console_handler.setLevel(logging.INFO)
-formatter = logging.Formatter('%(asctime)s [%(levelname)s] %(message)s')
+formatter = logging.Formatter('%(asctime)s [%(levelname)s] [%(threadName)s] %(message)s')
 console_handler.setFormatter(formatter)
 logging.getLogger().addHandler(console_handler)
 
@@ -50,151 +57,1207 @@ POSTGRES_CONN_PARAMS = {
 # define schema constant
 SCHEMA = 'public'
 
+# tables processed by each run and how each is synced. mode "append" loads rows with a new id; mode "cdc" also
+# reloads rows updated since the last run and drops rows soft-deleted through deleted_at, using an (updated_at, id)
+# watermark that wants an index on (updated_at, id) in Postgres. CDC never captures a row whose updated_at is NULL,
+# so the source must set it on insert as well as on update. "copy_export": True sends an append table that
+# needs no Python-side transform through the COPY TO STDOUT fast path instead of the cursor and DataFrame path
+TABLE_CONFIG = {
+    "incremental_table1": {"mode": "append"},
+    "incremental_table2": {"mode": "cdc", "updated_at": "updated_at", "deleted_at": "deleted_at"},
+}
+TABLE_CONFIG_DEFAULTS = {"mode": "append", "updated_at": "updated_at", "deleted_at": None, "copy_export": False}
+TABLES = list(TABLE_CONFIG)
+
+# CDC runs read up to this many seconds behind the source clock, so transactions committing late are read next run
+CDC_LAG_SECONDS = int(os.getenv("ETL_CDC_LAG_SECONDS", "300"))
+CDC_START = "1970-01-01 00:00:00"
+
+# tables run concurrently, and the cap on simultaneous Redshift COPY/merge sessions across them
+MAX_TABLE_WORKERS = int(os.getenv("ETL_MAX_TABLE_WORKERS", "4"))
+MAX_REDSHIFT_SESSIONS = int(os.getenv("ETL_MAX_REDSHIFT_SESSIONS", "2"))
+redshift_sessions = threading.BoundedSemaphore(MAX_REDSHIFT_SESSIONS)
+
+# S3 staging location, rows per exported chunk, and the chunks transformed/uploaded while the next one is fetched
+S3_BUCKET = os.getenv("ETL_S3_BUCKET", "jasons-fictitious-bucket")
+CHUNK_SIZE = int(os.getenv("ETL_CHUNK_SIZE", "500000"))
+MAX_CHUNK_WORKERS = int(os.getenv("ETL_MAX_CHUNK_WORKERS", "2"))
+
+# id gaps of at least PARTITION_MIN_ROWS are split into EXTRACT_PARTITIONS id ranges read over separate connections
+EXTRACT_PARTITIONS = int(os.getenv("ETL_EXTRACT_PARTITIONS", "4"))
+PARTITION_MIN_ROWS = int(os.getenv("ETL_PARTITION_MIN_ROWS", "2000000"))
+
+# staging file format: "json" (jsonpaths COPY, the fallback), "csv_gzip", "csv_zstd" or "parquet" (needs pyarrow)
+STAGING_FORMAT = os.getenv("ETL_STAGING_FORMAT", "json")
+STAGING_EXTENSIONS = {"json": "json", "csv": "csv", "csv_gzip": "csv.gz", "csv_zstd": "csv.zst", "parquet": "parquet"}
+
+# COPY TO STDOUT fast path: its CSV format ("csv", "csv_gzip" or "csv_zstd"), the raw bytes compressed per block,
+# and the S3 multipart part size (S3 needs at least 5 MiB per part) and parts uploaded concurrently
+COPY_EXPORT_FORMAT = os.getenv("ETL_COPY_EXPORT_FORMAT", "csv_zstd")
+COPY_EXPORT_BLOCK_SIZE = 1024 * 1024
+MULTIPART_PART_SIZE = max(int(os.getenv("ETL_MULTIPART_PART_MB", "8")), 5) * 1024 * 1024
+MULTIPART_UPLOAD_WORKERS = int(os.getenv("ETL_MULTIPART_UPLOAD_WORKERS", "2"))
+
+# Postgres type oid -> staging column type, anything not listed is staged as a string
+POSTGRES_COLUMN_TYPES = {
+    16: "bool",
+    20: "int64",
+    21: "int16",
+    23: "int32",
+    700: "float32",
+    701: "float64",
+    1700: "decimal",
+    1082: "date",
+    1114: "timestamp",
+    1184: "timestamptz",
+}
+
+# marker written for NULL in CSV parts, so empty strings stay empty strings
+CSV_NULL = "\\N"
+
+# pooled sessions: Postgres covers every extraction partition of every concurrent table, Redshift the
+# COPY/merge slots plus the watermark checks; idle connections are pinged before reuse
+POSTGRES_POOL_SIZE = int(os.getenv("ETL_POSTGRES_POOL_SIZE", str(MAX_TABLE_WORKERS * EXTRACT_PARTITIONS)))
+REDSHIFT_POOL_SIZE = int(os.getenv("ETL_REDSHIFT_POOL_SIZE", str(MAX_REDSHIFT_SESSIONS + 2)))
+POOL_HEALTH_CHECK_SECONDS = float(os.getenv("ETL_POOL_HEALTH_CHECK_SECONDS", "60"))
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of psycopg2 connections, opened on demand up to max_connections. Borrowers
+    block while every connection is out, idle connections are pinged before they are handed out
+    again, and connections come back through a context manager: rolled back and kept after an
+    error, or closed if the error broke them.
+    """
+
+    def __init__(self, name, conn_params, max_connections):
+        self.name = name
+        self.conn_params = conn_params
+        self.slots = threading.BoundedSemaphore(max_connections)
+        self.idle = []
+        self.lock = threading.Lock()
+
+    def _checkout(self):
+        with self.lock:
+            conn, last_used = self.idle.pop() if self.idle else (None, None)
+        if conn is None:
+            logging.info(f"Opening a new {self.name} connection")
+            return psycopg2.connect(**self.conn_params)
+
+        if conn.closed or time.time() - last_used >= POOL_HEALTH_CHECK_SECONDS:
+            try:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT 1;")
+                conn.rollback()
+            except psycopg2.Error as e:
+                logging.info(f"Replacing stale {self.name} connection: {e}")
+                conn.close()
+                conn = psycopg2.connect(**self.conn_params)
+        return conn
+
+    @contextlib.contextmanager
+    def connection(self):
+        self.slots.acquire()
+        conn = None
+        broken = False
+        try:
+            conn = self._checkout()
+            yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            broken = True
+            raise
+        finally:
+            if conn is not None:
+                if not broken and not conn.closed:
+                    try:
+                        # never hand the next borrower a half-finished transaction
+                        conn.rollback()
+                    except psycopg2.Error:
+                        broken = True
+                if broken or conn.closed:
+                    conn.close()
+                else:
+                    with self.lock:
+                        self.idle.append((conn, time.time()))
+            self.slots.release()
+
+    def close(self):
+        with self.lock:
+            for conn, _ in self.idle:
+                conn.close()
+            self.idle.clear()
+
+
+pools = {}
+pools_lock = threading.Lock()
+
+
+def get_pool(name):
+    """
+    This function returns the shared "postgres" or "redshift" pool, creating it on first use
+    """
+    with pools_lock:
+        if name not in pools:
+            if name == "postgres":
+                pools[name] = ConnectionPool(name, POSTGRES_CONN_PARAMS, POSTGRES_POOL_SIZE)
+            else:
+                pools[name] = ConnectionPool(name, REDSHIFT_CONN_PARAMS, REDSHIFT_POOL_SIZE)
+        return pools[name]
+
+
+def postgres_connection():
+    """
+    This function borrows a pooled PostgreSQL connection: with postgres_connection() as conn
+    """
+    return get_pool("postgres").connection()
+
+
+def redshift_connection():
+    """
+    This function borrows a pooled Redshift connection: with redshift_connection() as conn
+    """
+    return get_pool("redshift").connection()
+
+
+def close_pools():
+    """
+    This function closes every pooled connection at the end of the run
+    """
+    with pools_lock:
+        for pool in pools.values():
+            pool.close()
+        pools.clear()
+
+
+s3_client = None
+s3_client_lock = threading.Lock()
+
+
+def get_s3_client():
+    """
+    This function returns the S3 client shared by every table and chunk thread.
+    boto3 clients are thread safe, resources are not.
+    """
+    global s3_client
+    with s3_client_lock:
+        if s3_client is None:
+            s3_client = boto3.client("s3")
+        return s3_client
+
+
+class S3MultipartWriter:
+    """
+    Write-only file object that compresses what it is given and streams it to S3 as a multipart upload.
+    Writes are gathered into COPY_EXPORT_BLOCK_SIZE blocks before compression, and at most upload_workers
+    parts are in flight besides the one being filled, so memory stays bounded by about
+    (upload_workers + 1) * part_size. Exports smaller than one part are sent with a single put_object.
+    Used as a context manager, the upload is completed on success and aborted on error, so no orphaned
+    parts are left behind.
+    """
+
+    def __init__(self, bucket_name, s3_key, compression=None, part_size=MULTIPART_PART_SIZE,
+                 upload_workers=MULTIPART_UPLOAD_WORKERS, s3_client=None):
+        self.s3 = s3_client or get_s3_client()
+        self.bucket_name = bucket_name
+        self.s3_key = s3_key
+        self.part_size = part_size
+        self.upload_workers = upload_workers
+
+        if compression == "gzip":
+            self.compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        elif compression == "zstd":
+            import zstandard
+            self.compressor = zstandard.ZstdCompressor(level=3).compressobj()
+        else:
+            self.compressor = None
+
+        self.block = bytearray()
+        self.buffer = bytearray()
+        self.upload_id = None
+        self.executor = None
+        self.pending = set()
+        self.completed = []
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        self.bytes_in += len(data)
+        self.block += data
+        if len(self.block) >= COPY_EXPORT_BLOCK_SIZE:
+            self._flush_block()
+        return len(data)
+
+    def _flush_block(self):
+        block = bytes(self.block)
+        self.block = bytearray()
+        self.buffer += self.compressor.compress(block) if self.compressor else block
+        while len(self.buffer) >= self.part_size:
+            self._upload_part(bytes(self.buffer[:self.part_size]))
+            del self.buffer[:self.part_size]
+
+    def _upload_part(self, body):
+        if self.upload_id is None:
+            self.upload_id = self.s3.create_multipart_upload(Bucket=self.bucket_name, Key=self.s3_key)["UploadId"]
+            self.executor = ThreadPoolExecutor(max_workers=self.upload_workers, thread_name_prefix="multipart")
+
+        # Bound the parts in flight so the export never runs ahead of S3 by more than upload_workers parts
+        if len(self.pending) >= self.upload_workers:
+            done, self.pending = wait(self.pending, return_when=FIRST_COMPLETED)
+            self.completed.extend(future.result() for future in done)
+        part_number = len(self.completed) + len(self.pending) + 1
+        self.pending.add(self.executor.submit(self._send_part, part_number, body))
+        self.bytes_out += len(body)
+
+    def _send_part(self, part_number, body):
+        response = self.s3.upload_part(Bucket=self.bucket_name, Key=self.s3_key, UploadId=self.upload_id,
+                                       PartNumber=part_number, Body=body)
+        return {"PartNumber": part_number, "ETag": response["ETag"]}
+
+    def close(self):
+        self._flush_block()
+        if self.compressor:
+            self.buffer += self.compressor.flush()
+
+        if self.upload_id is None:
+            # small export: one request instead of a multipart upload
+            self.s3.put_object(Bucket=self.bucket_name, Key=self.s3_key, Body=bytes(self.buffer))
+            self.bytes_out += len(self.buffer)
+        else:
+            if self.buffer:
+                self._upload_part(bytes(self.buffer))
+            self.completed.extend(future.result() for future in wait(self.pending).done)
+            self.pending = set()
+            self.executor.shutdown()
+            parts = sorted(self.completed, key=lambda part: part["PartNumber"])
+            self.s3.complete_multipart_upload(Bucket=self.bucket_name, Key=self.s3_key, UploadId=self.upload_id,
+                                              MultipartUpload={"Parts": parts})
+        self.buffer = bytearray()
+
+    def abort(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+        if self.upload_id is not None:
+            self.s3.abort_multipart_upload(Bucket=self.bucket_name, Key=self.s3_key, UploadId=self.upload_id)
+            logging.info(f"Aborted multipart upload of s3://{self.bucket_name}/{self.s3_key}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self.abort()
+            return False
+        try:
+            self.close()
+        except Exception:
+            self.abort()
+            raise
+        return False
+
+
+
+class CsvRecordCounter:
+    """
+    Write-through file object that counts the CSV records passed on to the wrapped file. A newline inside a
+    quoted field does not end a record, so the quote state is carried across writes. COPY TO STDOUT cannot
+    report its row count reliably (the cursor's rowcount may be -1), the stream can.
+    """
+
+    def __init__(self, file):
+        self.file = file
+        self.records = 0
+        self.in_quotes = False
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        if b'"' not in data:
+            if not self.in_quotes:
+                self.records += data.count(b"\n")
+        else:
+            # every quote flips the state, and an escaped "" flips it twice
+            for index, segment in enumerate(data.split(b'"')):
+                if index:
+                    self.in_quotes = not self.in_quotes
+                if not self.in_quotes:
+                    self.records += segment.count(b"\n")
+        return self.file.write(data)
+
+# local checkpoint store of watermarks and per-chunk progress, optionally mirrored to S3_BUCKET/CHECKPOINT_S3_KEY
+CHECKPOINT_PATH = os.getenv("ETL_CHECKPOINT_PATH", os.path.join(log_folder, "etl_checkpoints.sqlite"))
+CHECKPOINT_S3_KEY = os.getenv("ETL_CHECKPOINT_S3_KEY", "")
+
+CHECKPOINT_SCHEMA = """
+CREATE TABLE IF NOT EXISTS watermarks (
+    table_name TEXT PRIMARY KEY,
+    last_id INTEGER NOT NULL,
+    last_updated_at TEXT,
+    updated_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS runs (
+    table_name TEXT PRIMARY KEY,
+    target_date TEXT NOT NULL,
+    status TEXT NOT NULL,
+    started_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS partitions (
+    table_name TEXT NOT NULL,
+    partition INTEGER NOT NULL,
+    low_id INTEGER NOT NULL,
+    high_id INTEGER,
+    low_updated_at TEXT,
+    high_updated_at TEXT,
+    extracted INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (table_name, partition)
+);
+CREATE TABLE IF NOT EXISTS chunks (
+    table_name TEXT NOT NULL,
+    partition INTEGER NOT NULL,
+    part_number INTEGER NOT NULL,
+    first_id INTEGER NOT NULL,
+    last_id INTEGER NOT NULL,
+    last_updated_at TEXT,
+    row_count INTEGER NOT NULL,
+    s3_url TEXT NOT NULL,
+    content_length INTEGER,
+    upload_status TEXT NOT NULL,
+    copy_status TEXT NOT NULL DEFAULT 'pending',
+    merge_status TEXT NOT NULL DEFAULT 'pending',
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (table_name, partition, part_number)
+);
+"""
+
+# columns added to the store after its first release, added in place to older files
+CHECKPOINT_ADDED_COLUMNS = [
+    ("watermarks", "last_updated_at"),
+    ("partitions", "low_updated_at"),
+    ("partitions", "high_updated_at"),
+    ("chunks", "last_updated_at"),
+]
+
+
+class CheckpointStore:
+    """
+    SQLite record of where every table stands: the merged id (or CDC (updated_at, id)) watermark, plus
+    the range, S3 part and upload/COPY/merge status of every chunk of the run in progress. A restarted run resumes
+    from it instead of re-extracting, and Redshift is only asked to confirm the watermark.
+    All methods are safe to call from the table and partition threads.
+    """
+
+    def __init__(self, path=CHECKPOINT_PATH, s3_key=CHECKPOINT_S3_KEY):
+        self.path = path
+        self.s3_key = s3_key
+        self.lock = threading.Lock()
+
+        # Start from the S3 copy when this box has no local store yet
+        if s3_key and not os.path.exists(path):
+            try:
+                get_s3_client().download_file(S3_BUCKET, s3_key, path)
+                logging.info(f"Downloaded checkpoint store from s3://{S3_BUCKET}/{s3_key}")
+            except Exception as e:
+                logging.info(f"No checkpoint store downloaded from s3://{S3_BUCKET}/{s3_key}: {e}")
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(CHECKPOINT_SCHEMA)
+        for checkpoint_table, column in CHECKPOINT_ADDED_COLUMNS:
+            columns = [row["name"] for row in self.conn.execute(f"PRAGMA table_info({checkpoint_table})")]
+            if column not in columns:
+                self.conn.execute(f"ALTER TABLE {checkpoint_table} ADD COLUMN {column} TEXT")
+
+    def _now(self):
+        return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+    def watermark(self, table_name):
+        """Last id (and CDC updated_at) merged into Redshift for the table as a dict, or None if never merged"""
+        with self.lock:
+            row = self.conn.execute("SELECT last_id, last_updated_at FROM watermarks WHERE table_name = ?",
+                                    (table_name,)).fetchone()
+        return dict(row) if row else None
+
+    def set_watermark(self, table_name, last_id, last_updated_at=None):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO watermarks (table_name, last_id, last_updated_at, updated_at) VALUES (?, ?, ?, ?)",
+                (table_name, last_id, last_updated_at, self._now()),
+            )
+
+    def run(self, table_name):
+        """The table's current run as a dict, or None"""
+        with self.lock:
+            row = self.conn.execute("SELECT * FROM runs WHERE table_name = ?", (table_name,)).fetchone()
+        return dict(row) if row else None
+
+    def start_run(self, table_name, target_date, id_ranges, low_updated_at=None, high_updated_at=None):
+        """
+        Replace the table's finished run with a new one over the given (low_id, high_id) ranges.
+        CDC runs pass the updated_at bounds of their single (updated_at, id) range too.
+        """
+        now = self._now()
+        with self.lock, self.conn:
+            for checkpoint_table in ("runs", "partitions", "chunks"):
+                self.conn.execute(f"DELETE FROM {checkpoint_table} WHERE table_name = ?", (table_name,))
+            self.conn.execute(
+                "INSERT INTO runs (table_name, target_date, status, started_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (table_name, target_date, "extracting", now, now),
+            )
+            self.conn.executemany(
+                "INSERT INTO partitions (table_name, partition, low_id, high_id, low_updated_at, high_updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(table_name, partition, low_id, high_id, low_updated_at, high_updated_at)
+                 for partition, (low_id, high_id) in enumerate(id_ranges)],
+            )
+
+    def set_run_status(self, table_name, status):
+        """Move the run to extracted/loaded/merged and mark its chunks copied/merged to match"""
+        now = self._now()
+        with self.lock, self.conn:
+            self.conn.execute("UPDATE runs SET status = ?, updated_at = ? WHERE table_name = ?",
+                              (status, now, table_name))
+            if status in ("loaded", "merged"):
+                self.conn.execute("UPDATE chunks SET copy_status = 'copied', updated_at = ? WHERE table_name = ?",
+                                  (now, table_name))
+            if status == "merged":
+                self.conn.execute("UPDATE chunks SET merge_status = 'merged', updated_at = ? WHERE table_name = ?",
+                                  (now, table_name))
+
+    def resume_points(self, table_name):
+        """
+        Where each unfinished partition restarts: after the last row of its leading run of uploaded chunks.
+        Chunks past the first gap are dropped, since their part numbers are reused by the re-extraction.
+        Returns a list of dicts with the partition, its remaining range and the next part number.
+        """
+        points = []
+        with self.lock, self.conn:
+            partitions = self.conn.execute(
+                "SELECT * FROM partitions WHERE table_name = ? AND extracted = 0 ORDER BY partition",
+                (table_name,)).fetchall()
+            for partition in partitions:
+                point = dict(partition, next_part=0)
+                for chunk in self.conn.execute(
+                        "SELECT part_number, last_id, last_updated_at, upload_status FROM chunks "
+                        "WHERE table_name = ? AND partition = ? ORDER BY part_number",
+                        (table_name, partition["partition"])).fetchall():
+                    if chunk["part_number"] != point["next_part"] or chunk["upload_status"] != "uploaded":
+                        break
+                    point.update(low_id=chunk["last_id"], next_part=point["next_part"] + 1)
+                    if chunk["last_updated_at"] is not None:
+                        point["low_updated_at"] = chunk["last_updated_at"]
+                self.conn.execute("DELETE FROM chunks WHERE table_name = ? AND partition = ? AND part_number >= ?",
+                                  (table_name, partition["partition"], point["next_part"]))
+                points.append(point)
+        return points
+
+    def add_chunk(self, table_name, partition, part_number, first_id, last_id, row_count, s3_url,
+                  last_updated_at=None):
+        """Record a fetched chunk before it is uploaded"""
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO chunks (table_name, partition, part_number, first_id, last_id, last_updated_at, "
+                "row_count, s3_url, upload_status, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'pending', ?)",
+                (table_name, partition, part_number, first_id, last_id, last_updated_at, row_count, s3_url,
+                 self._now()),
+            )
+
+    def chunk_uploaded(self, table_name, partition, part_number, content_length):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "UPDATE chunks SET upload_status = 'uploaded', content_length = ?, updated_at = ? "
+                "WHERE table_name = ? AND partition = ? AND part_number = ?",
+                (content_length, self._now(), table_name, partition, part_number),
+            )
+
+    def partition_extracted(self, table_name, partition):
+        with self.lock, self.conn:
+            self.conn.execute("UPDATE partitions SET extracted = 1 WHERE table_name = ? AND partition = ?",
+                              (table_name, partition))
+
+    def manifest_entries(self, table_name):
+        """Manifest entries of every uploaded chunk of the run"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT s3_url, content_length, row_count FROM chunks WHERE table_name = ? AND upload_status = 'uploaded' "
+                "ORDER BY partition, part_number", (table_name,)).fetchall()
+        return [
+            {"url": row["s3_url"], "mandatory": True,
+             "meta": {"content_length": row["content_length"], "record_count": row["row_count"]}}
+            for row in rows
+        ]
+
+    def last_extracted_position(self, table_name):
+        """(last_id, last_updated_at) of the furthest row uploaded by the run, or None if it uploaded nothing"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT last_id, last_updated_at FROM chunks WHERE table_name = ? AND upload_status = 'uploaded' "
+                "ORDER BY last_updated_at DESC, last_id DESC LIMIT 1", (table_name,)).fetchone()
+        return (row["last_id"], row["last_updated_at"]) if row else None
+
+    def sync(self):
+        """
+        Upload a consistent snapshot of the store to S3, if a key is configured.
+        Table threads sync concurrently, so every call snapshots into its own temp file.
+        Failures are only logged: the local store stays authoritative and the next sync retries.
+        """
+        if not self.s3_key:
+            return
+        snapshot_path = None
+        try:
+            fd, snapshot_path = tempfile.mkstemp(suffix=".upload", dir=os.path.dirname(self.path) or None)
+            os.close(fd)
+            with self.lock:
+                snapshot = sqlite3.connect(snapshot_path)
+                try:
+                    self.conn.backup(snapshot)
+                finally:
+                    snapshot.close()
+            get_s3_client().upload_file(snapshot_path, S3_BUCKET, self.s3_key)
+        except Exception as e:
+            logging.error(f"Failed to sync checkpoint store to s3://{S3_BUCKET}/{self.s3_key}: {e}")
+        finally:
+            if snapshot_path is not None:
+                with contextlib.suppress(OSError):
+                    os.remove(snapshot_path)
+
+
+checkpoint_store = None
+checkpoint_store_lock = threading.Lock()
+
+
+def get_checkpoint_store():
+    """
+    This function opens the checkpoint store once per run and shares it across the table threads
+    """
+    global checkpoint_store
+    with checkpoint_store_lock:
+        if checkpoint_store is None:
+            checkpoint_store = CheckpointStore()
+        return checkpoint_store
+
+
+def table_config(table_name):
+    """
+    This function returns the sync settings of a table, filled in from TABLE_CONFIG_DEFAULTS
+    """
+    return {**TABLE_CONFIG_DEFAULTS, **TABLE_CONFIG.get(table_name, {})}
+
+
 def get_latest_id_from_redshift(table_name):
     """
     This function retrieves the most recent id value from the Redshift table
     """
     logging.info(f"Fetching latest updated_at for {table_name}")
-    redshift_conn = psycopg2.connect(**REDSHIFT_CONN_PARAMS)
-    cur = redshift_conn.cursor()
+    with redshift_connection() as redshift_conn:
+        cur = redshift_conn.cursor()
 
-    sql_query = f"SELECT COALESCE(MAX(id), 0) FROM {table_name};"
-    cur.execute(sql_query)
-    result = cur.fetchone()
-    redshift_conn.close()
+        sql_query = f"SELECT COALESCE(MAX(id), 0) FROM {table_name};"
+        cur.execute(sql_query)
+        result = cur.fetchone()
 
     return result[0]
 
 
-def transform(data, col_names, table_name, target_date):
+def verify_watermark_in_redshift(table_name, watermark):
+    """
+    This function confirms the checkpointed watermark is still the largest id in the Redshift table.
+    The range predicate keeps the check to the newest blocks instead of a full-table MAX(id).
+    """
+    with redshift_connection() as redshift_conn:
+        cur = redshift_conn.cursor()
+        cur.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table_name} WHERE id >= {watermark};")
+        return cur.fetchone()[0] == watermark
+
+
+def get_latest_change_from_redshift(table_name, updated_at_column):
+    """
+    This function retrieves the newest (updated_at, id) position already loaded into the Redshift table,
+    or (CDC_START, 0) when no loaded row has an updated_at. Rows with a NULL updated_at are skipped: DESC puts
+    NULLs first, and CDC never reads them from the source anyway
+    """
+    with redshift_connection() as redshift_conn:
+        cur = redshift_conn.cursor()
+        cur.execute(f"SELECT {updated_at_column}, id FROM {table_name} WHERE {updated_at_column} IS NOT NULL "
+                    f"ORDER BY {updated_at_column} DESC, id DESC LIMIT 1;")
+        result = cur.fetchone()
+
+    if result is None or result[0] is None:
+        return CDC_START, 0
+    # The checkpoint keeps the timestamp as ISO text; every query casts it back to TIMESTAMP
+    return result[0].isoformat(sep=" "), result[1]
+
+
+def verify_change_watermark_in_redshift(table_name, updated_at_column, last_updated_at):
+    """
+    This function confirms Redshift holds no change newer than the checkpointed CDC watermark
+    """
+    with redshift_connection() as redshift_conn:
+        cur = redshift_conn.cursor()
+        cur.execute(f"SELECT COUNT(*) FROM {table_name} WHERE {updated_at_column} > CAST('{last_updated_at}' AS TIMESTAMP);")
+        return cur.fetchone()[0] == 0
+
+
+def get_watermark(table_name):
+    """
+    This function returns the (id, updated_at) position a new run starts after, updated_at being None outside CDC mode:
+    the checkpointed watermark once Redshift confirms it, otherwise the position rediscovered from Redshift
+    """
+    config = table_config(table_name)
+    store = get_checkpoint_store()
+    watermark = store.watermark(table_name)
+
+    if config["mode"] == "cdc":
+        if (watermark and watermark["last_updated_at"] and
+                verify_change_watermark_in_redshift(table_name, config["updated_at"], watermark["last_updated_at"])):
+            return watermark["last_id"], watermark["last_updated_at"]
+        last_updated_at, latest_id = get_latest_change_from_redshift(table_name, config["updated_at"])
+    else:
+        if watermark and verify_watermark_in_redshift(table_name, watermark["last_id"]):
+            return watermark["last_id"], None
+        latest_id, last_updated_at = get_latest_id_from_redshift(table_name), None
+
+    if watermark:
+        logging.warning(f"Checkpointed watermark {watermark} of {table_name} does not match Redshift, "
+                        f"using ({latest_id}, {last_updated_at})")
+    store.set_watermark(table_name, latest_id, last_updated_at)
+    return latest_id, last_updated_at
+
+
+def get_change_cutoff_from_postgres():
+    """
+    This function returns the upper updated_at bound of a CDC run: the source clock minus CDC_LAG_SECONDS
+    """
+    with postgres_connection() as postgres_conn:
+        cur = postgres_conn.cursor()
+        cur.execute(f"SELECT LOCALTIMESTAMP - INTERVAL '{CDC_LAG_SECONDS} seconds';")
+        return cur.fetchone()[0].isoformat(sep=" ")
+
+
+def get_max_id_from_postgres(table_name):
+    """
+    This function retrieves the largest id value from the production postgres table
+    """
+    with postgres_connection() as postgres_conn:
+        cur = postgres_conn.cursor()
+        cur.execute(f"SELECT COALESCE(MAX(id), 0) FROM {SCHEMA}.{table_name};")
+        return cur.fetchone()[0]
+
+
+def plan_id_ranges(latest_id, max_id, partitions=EXTRACT_PARTITIONS, min_rows=PARTITION_MIN_ROWS):
+    """
+    This function splits the id gap (latest_id, max_id] into contiguous ranges of about equal width.
+    Small gaps stay one range. The last range has no upper bound so rows inserted during the run are still read.
+    Returns a list of (low_id, high_id) tuples read as id > low_id AND id <= high_id.
+    """
+    gap = max_id - latest_id
+    # never more ranges than new ids, so no range starts past max_id
+    partitions = min(partitions, gap)
+    if partitions <= 1 or gap < min_rows:
+        return [(latest_id, None)]
+
+    width = -(-gap // partitions)
+    bounds = [latest_id + width * i for i in range(partitions)] + [None]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def part_s3_key(target_date, table_name, part_number, partition=0, staging_format=STAGING_FORMAT):
+    """
+    This function returns the S3 key of one exported chunk
+    """
+    extension = STAGING_EXTENSIONS[staging_format]
+    return f"{table_name}/event_date={target_date}/part-{partition:03d}-{part_number:05d}.{extension}"
+
+
+def manifest_s3_key(target_date, table_name):
+    """
+    This function returns the S3 key of the manifest listing every chunk of a run
+    """
+    return f"{table_name}/event_date={target_date}/{table_name}.manifest"
+
+
+def staging_column_types(description):
+    """
+    This function maps the cursor description to explicit staging column types.
+    Returns a list of (column name, type, precision, scale) tuples.
+    """
+    return [
+        (column[0], POSTGRES_COLUMN_TYPES.get(column[1], "string"), getattr(column, "precision", None),
+         getattr(column, "scale", None))
+        for column in description
+    ]
+
+
+def parquet_schema(column_types):
+    """
+    This function builds the Arrow schema of a Parquet part, so every part of a table has identical column types
+    """
+    import pyarrow as pa
+
+    arrow_types = {
+        "bool": pa.bool_(),
+        "int16": pa.int16(),
+        "int32": pa.int32(),
+        "int64": pa.int64(),
+        "float32": pa.float32(),
+        "float64": pa.float64(),
+        "date": pa.date32(),
+        "timestamp": pa.timestamp("us"),
+        "timestamptz": pa.timestamp("us", tz="UTC"),
+        "string": pa.string(),
+    }
+    fields = []
+    for name, column_type, precision, scale in column_types:
+        if column_type == "decimal":
+            # numeric columns declared without a precision get a wide decimal instead of a lossy float
+            arrow_type = pa.decimal128(precision or 38, scale if scale is not None else 18)
+        else:
+            arrow_type = arrow_types[column_type]
+        fields.append(pa.field(name, arrow_type))
+    return pa.schema(fields)
+
+
+def transform(data, description, table_name, target_date, part_number=0, partition=0,
+              staging_format=STAGING_FORMAT):
     """
     This function cleans and standardizes data types for ingestion into S3 and Redshift.
+    Returns the path of the staging file written for this chunk.
     """
-    print("Transforming data for table:" + table_name)
+    print(f"Transforming part {partition}-{part_number} for table: {table_name}")
 
     # Create a DataFrame
-    data = pd.DataFrame(data, columns=col_names)
+    column_types = staging_column_types(description)
+    data = pd.DataFrame(data, columns=[name for name, _, _, _ in column_types])
     logging.info("Data frame created!")
 
-    # Standardize datetime columns
-    data["created_at"] = pd.to_datetime(data["created_at"].dt.strftime('%Y-%m-%d %H:%M:%S'))
-    data["updated_at"] = pd.to_datetime(data["updated_at"].dt.strftime('%Y-%m-%d %H:%M:%S'))
+    extension = STAGING_EXTENSIONS[staging_format]
+    file_path = f"/tmp/{table_name}_{target_date}_part-{partition:03d}-{part_number:05d}.{extension}"
 
-    # Convert datetime columns to strings for JSON
-    data = data.assign(**data.select_dtypes(["datetime"]).astype(str).to_dict("list"))
+    if staging_format == "json":
+        # Standardize datetime columns
+        data["created_at"] = pd.to_datetime(data["created_at"].dt.strftime('%Y-%m-%d %H:%M:%S'))
+        data["updated_at"] = pd.to_datetime(data["updated_at"].dt.strftime('%Y-%m-%d %H:%M:%S'))
 
-    # Save as JSON object and write to temp folder
-    data = data.to_json(orient="records", lines=True)
-    with open(f"/tmp/{table_name}_{target_date}.json", "w") as f:
-        f.write(data)
+        # Convert datetime columns to strings for JSON, NULL timestamps stay null instead of "NaT"
+        data = data.assign(**{column: data[column].dt.strftime('%Y-%m-%d %H:%M:%S')
+                              for column in data.select_dtypes(["datetime"])})
 
+        # Save as JSON object and write to temp folder, one file per chunk
+        data = data.to_json(orient="records", lines=True)
+        with open(file_path, "w") as f:
+            f.write(data)
+        return file_path
 
-def fetch_source_table_incremental(target_date, table_name):
+    # Cast every column to its explicit type, nullable integers stay integers instead of turning into floats
+    for name, column_type, _, _ in column_types:
+        if column_type in ("int16", "int32", "int64"):
+            data[name] = data[name].astype(column_type.capitalize())
+        elif column_type == "timestamp":
+            data[name] = pd.to_datetime(data[name]).dt.floor("s")
+        elif column_type == "timestamptz":
+            data[name] = pd.to_datetime(data[name], utc=True).dt.floor("s")
+
+    if staging_format == "parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.Table.from_pandas(data, schema=parquet_schema(column_types), preserve_index=False, safe=False)
+        pq.write_table(table, file_path, compression="snappy")
+    else:
+        # headerless CSV in table column order, compressed while it is written
+        compression = {"csv": None, "csv_gzip": {"method": "gzip", "compresslevel": 6}, "csv_zstd": "zstd"}[staging_format]
+        data.to_csv(file_path, header=False, index=False, na_rep=CSV_NULL, date_format='%Y-%m-%d %H:%M:%S',
+                    compression=compression)
+
+    return file_path
+
+
+def export_chunk(data, description, table_name, target_date, part_number, partition=0,
+                 staging_format=STAGING_FORMAT):
     """
-    This function retrieves the most recent id value from the production postgres table
+    This function transforms one fetched chunk and uploads it to its own part key.
+    Returns the manifest entry of the uploaded part.
     """
-    logging.info(f"Start fetching data for table: {table_name}")
+    file_path = transform(data, description, table_name, target_date, part_number, partition, staging_format)
+    s3_key = part_s3_key(target_date, table_name, part_number, partition, staging_format)
+    content_length = os.path.getsize(file_path)
+
+    try:
+        move_to_aws_s3(file_path, s3_key)
+    finally:
+        os.remove(file_path)
+
+    return {
+        "url": f"s3://{S3_BUCKET}/{s3_key}",
+        "mandatory": True,
+        "meta": {"content_length": content_length, "record_count": len(data)},
+    }
+
+
+def write_manifest(target_date, table_name, entries):
+    """
+    This function writes the Redshift COPY manifest listing the parts of this run, in part order.
+    """
+    s3_key = manifest_s3_key(target_date, table_name)
+    entries = sorted(entries, key=lambda entry: entry["url"])
+    body = json.dumps({"entries": entries}, indent=2)
+
+    get_s3_client().put_object(Bucket=S3_BUCKET, Key=s3_key, Body=body.encode("utf-8"))
+
+    logging.info(f"Wrote manifest with {len(entries)} parts to s3://{S3_BUCKET}/{s3_key}")
+
 
-    # Connect to PostgreSQL
-    postgres_conn = psycopg2.connect(**POSTGRES_CONN_PARAMS)
-    cur = postgres_conn.cursor()
+def extract_id_range(target_date, table_name, low_id, high_id=None, partition=0, first_part_number=0,
+                     low_updated_at=None, high_updated_at=None):
+    """
+    This function streams the rows with low_id < id <= high_id through a named server-side cursor and exports
+    them as numbered parts. Given low_updated_at (CDC mode), it instead streams the rows changed after the
+    (low_updated_at, low_id) position up to high_updated_at, in (updated_at, id) order. Only CHUNK_SIZE rows per fetch are held in memory, instead of the whole result set.
+    The next chunk is fetched while earlier chunks are transformed and uploaded on a small thread pool.
+    Every chunk is checkpointed when fetched and again when uploaded.
+    Returns the manifest entries and the number of rows read.
+    """
+    store = get_checkpoint_store()
+    updated_at = table_config(table_name)["updated_at"]
 
-    # Get the latest updated_at value from Redshift
-    latest_id = get_latest_id_from_redshift(table_name)
-    logging.info(f"Latest ID value in Redshift for {table_name}: {latest_id}")
+    if low_updated_at is not None:
+        # Fetch new and changed rows in change order; the row-value comparison can walk an (updated_at, id) index
+        where = (f"({updated_at}, id) > (CAST('{low_updated_at}' AS TIMESTAMP), {low_id}) "
+                 f"AND {updated_at} <= CAST('{high_updated_at}' AS TIMESTAMP)")
+        order_by = f"{updated_at}, id"
+    else:
+        # Fetch new rows from PostgreSQL in id order
+        upper_bound = f"AND id <= {high_id}" if high_id is not None else ""
+        where = f"id > {low_id} {upper_bound}"
+        order_by = "id"
+    logging.info(f"Start extracting {table_name} partition {partition}: {where}")
 
-    # Fetch new/updated rows from PostgreSQL
     sql_string = f"""
     SELECT * FROM {SCHEMA}.{table_name}
-    WHERE id > {latest_id};
+    WHERE {where}
+    ORDER BY {order_by};
     """
-    cur.execute(sql_string)
 
-    # if the new data exceeds 500k rows, increment in chunks
-    col_names = [elt[0] for elt in cur.description]
-    chunk_size = 500000
     total_rows = 0
+    entries = []
+    chunk_parts = {}
+
+    def collect(futures):
+        for future in futures:
+            entry = future.result()
+            store.chunk_uploaded(table_name, partition, chunk_parts.pop(future), entry["meta"]["content_length"])
+            entries.append(entry)
+
+    # Borrow a pooled PostgreSQL connection, every partition reads over its own connection
+    with postgres_connection() as postgres_conn:
+        # A named cursor keeps the result set on the server and ships it CHUNK_SIZE rows at a time
+        cur = postgres_conn.cursor(name=f"{table_name}_extract_{partition}")
+        cur.itersize = CHUNK_SIZE
+        cur.execute(sql_string)
 
-    while True:
-        data = cur.fetchmany(chunk_size)
-        if not data:
-            break
+        with ThreadPoolExecutor(max_workers=MAX_CHUNK_WORKERS,
+                                thread_name_prefix=f"{table_name}-{partition}-export") as executor:
+            pending = set()
+            part_number = first_part_number
+            while True:
+                data = cur.fetchmany(CHUNK_SIZE)
+                if not data:
+                    break
 
-        print(f"Fetched {len(data)} rows for table: {table_name}")
-        transform(data, col_names, table_name, target_date)
-        move_to_aws_s3(target_date, table_name)
+                # a named cursor only has a description after its first fetch
+                description = cur.description
+                col_names = [elt[0] for elt in description]
+                id_index = col_names.index("id")
+                last_updated_at = data[-1][col_names.index(updated_at)].isoformat(sep=" ") if low_updated_at is not None else None
+                print(f"Fetched {len(data)} rows for table: {table_name} partition {partition}")
+                total_rows += len(data)
 
-        total_rows += len(data)
+                # Bound the chunks in flight so fetched rows do not pile up in memory
+                if len(pending) >= MAX_CHUNK_WORKERS:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(done)
 
-    postgres_conn.close()
-    logging.info(f"Total rows fetched for table {table_name}: {total_rows}")        
+                s3_url = f"s3://{S3_BUCKET}/{part_s3_key(target_date, table_name, part_number, partition)}"
+                store.add_chunk(table_name, partition, part_number, data[0][id_index], data[-1][id_index], len(data),
+                                s3_url, last_updated_at)
+                future = executor.submit(export_chunk, data, description, table_name, target_date, part_number,
+                                         partition)
+                chunk_parts[future] = part_number
+                pending.add(future)
+                part_number += 1
 
+            collect(wait(pending).done)
 
-def move_to_aws_s3(target_date, table_name):
+        cur.close()
+        store.partition_extracted(table_name, partition)
+
+    return entries, total_rows
+
+
+def copy_export_enabled(table_name):
     """
-    This function uploads the transformed JSON file to S3 with event_date folder structure.
+    This function tells whether a table is exported through the COPY TO STDOUT fast path
     """
-    print(f"Start moving data to S3 for table: {table_name}")
+    config = table_config(table_name)
+    return bool(config["copy_export"]) and config["mode"] == "append"
 
-    file_path = f"/tmp/{table_name}_{target_date}.json"
-    bucket_name = "jasons-fictitious-bucket"
-    s3_key = f"{table_name}/event_date={target_date}/{table_name}.json"
 
-    # Upload to S3
-    s3 = boto3.resource("s3")
-    s3.Bucket(bucket_name).upload_file(file_path, s3_key)
+def table_staging_format(table_name):
+    """
+    This function returns the staging format a table's parts are written in
+    """
+    return COPY_EXPORT_FORMAT if copy_export_enabled(table_name) else STAGING_FORMAT
 
-    logging.info(f"Uploaded {file_path} to s3://{bucket_name}/{s3_key}")
 
+def export_id_range_copy(target_date, table_name, low_id, high_id, partition=0, first_part_number=0,
+                         staging_format=COPY_EXPORT_FORMAT):
+    """
+    This function streams the rows with low_id < id <= high_id out of PostgreSQL with COPY ... TO STDOUT as CSV,
+    through optional compression, straight into S3 multipart uploads. Rows never become Python tuples,
+    DataFrames or temp files, so it only suits tables that need no Python-side transform.
+    The range is exported as parts of CHUNK_SIZE rows: each part ends at the CHUNK_SIZE-th id, found on the id
+    index, and is checkpointed once its upload completes, so an interrupted export resumes after its last part.
+    Returns the manifest entries and the number of rows read.
+    """
+    store = get_checkpoint_store()
+    logging.info(f"Start COPY export of {table_name} partition {partition}: id > {low_id} and id <= {high_id}")
+    start_time = time.time()
+    compression = {"csv_gzip": "gzip", "csv_zstd": "zstd"}.get(staging_format)
 
-def load_target_table_from_s3(target_date, table_name):
+    entries = []
+    total_rows = 0
+    bytes_in = bytes_out = 0
+    part_number = first_part_number
+    # Borrow a pooled PostgreSQL connection, every partition exports over its own connection
+    with postgres_connection() as postgres_conn:
+        cur = postgres_conn.cursor()
+        # ISO timestamps whatever the server default; the rollback on release resets the setting
+        cur.execute("SET DateStyle TO 'ISO, YMD';")
+        while low_id < high_id:
+            cur.execute(f"SELECT id FROM {SCHEMA}.{table_name} WHERE id > {low_id} AND id <= {high_id} "
+                        f"ORDER BY id OFFSET {CHUNK_SIZE - 1} LIMIT 1;")
+            row = cur.fetchone()
+            part_high_id = row[0] if row else high_id
+
+            s3_key = part_s3_key(target_date, table_name, part_number, partition, staging_format)
+            copy_sql = f"""
+            COPY (
+                SELECT * FROM {SCHEMA}.{table_name}
+                WHERE id > {low_id} AND id <= {part_high_id}
+            ) TO STDOUT WITH (FORMAT csv, NULL '{CSV_NULL}')
+            """
+            with S3MultipartWriter(S3_BUCKET, s3_key, compression) as writer:
+                counter = CsvRecordCounter(writer)
+                cur.copy_expert(copy_sql, counter)
+            row_count = counter.records
+            bytes_in += writer.bytes_in
+            bytes_out += writer.bytes_out
+
+            if row_count:
+                s3_url = f"s3://{S3_BUCKET}/{s3_key}"
+                store.add_chunk(table_name, partition, part_number, low_id + 1, part_high_id, row_count, s3_url)
+                store.chunk_uploaded(table_name, partition, part_number, writer.bytes_out)
+                entries.append({"url": s3_url, "mandatory": True,
+                                "meta": {"content_length": writer.bytes_out, "record_count": row_count}})
+                part_number += 1
+            total_rows += row_count
+            low_id = part_high_id
+
+    elapsed = time.time() - start_time
+    logging.info(f"COPY exported {total_rows} rows of {table_name} partition {partition} as {len(entries)} parts "
+                 f"in {elapsed:.2f}s ({total_rows / elapsed if elapsed else 0:.0f} rows/sec, "
+                 f"{bytes_in} bytes -> {bytes_out})")
+    store.partition_extracted(table_name, partition)
+    return entries, total_rows
+
+
+def fetch_source_table_incremental(target_date, table_name):
     """
-    Load data from S3 into a Redshift temporary table using a copy query
+    This function exports the new rows of the production postgres table to S3 as numbered parts plus a manifest.
+    Large id gaps are split into id ranges extracted in parallel over separate connections.
+    Tables flagged copy_export stream each id range with COPY TO STDOUT straight into S3 instead.
+    An unfinished run of the table is resumed from the checkpoint store, skipping the chunks already uploaded.
+    Returns the number of parts written; zero means there was nothing new.
     """
-    logging.info(f"Start loading data into Redshift for table: {table_name}")
+    logging.info(f"Start fetching data for table: {table_name}")
 
-    # Establish connection to Redshift
-    redshift_conn = psycopg2.connect(**REDSHIFT_CONN_PARAMS)
-    cur = redshift_conn.cursor()
+    store = get_checkpoint_store()
+    run = store.run(table_name)
 
-    # S3 bucket and keys
-    bucket_name = "jasons-fictitious-bucket"
-    s3_key = f"{table_name}/event_date={target_date}/{table_name}.json"
+    if run is None or run["status"] == "merged":
+        # Get the latest position from the checkpoint (verified in Redshift)
+        latest_id, last_updated_at = get_watermark(table_name)
+        if table_config(table_name)["mode"] == "cdc":
+            # CDC reads one (updated_at, id) range in change order, up to the lagged source clock
+            cutoff = get_change_cutoff_from_postgres()
+            logging.info(f"Latest change in Redshift for {table_name}: ({last_updated_at}, {latest_id}), "
+                         f"reading changes up to {cutoff}")
+            store.start_run(table_name, target_date, [(latest_id, None)], last_updated_at, cutoff)
+        else:
+            # and the largest id in PostgreSQL
+            logging.info(f"Latest ID value in Redshift for {table_name}: {latest_id}")
+            max_id = get_max_id_from_postgres(table_name)
+            id_ranges = plan_id_ranges(latest_id, max_id)
+            if copy_export_enabled(table_name):
+                # a COPY export needs a closed range, so the last range stops at the max id seen now
+                id_ranges[-1] = (id_ranges[-1][0], max_id)
+            store.start_run(table_name, target_date, id_ranges)
+            logging.info(f"Extracting {table_name} in {len(id_ranges)} id ranges: {id_ranges}")
+        store.sync()
+    else:
+        logging.info(f"Resuming the {run['status']} run of {table_name} started at {run['started_at']}")
 
-    # copy query to insert data from s3 into redshift table
+    # if the gap is large, pull the id ranges in parallel; finished partitions are skipped
+    resume_points = store.resume_points(table_name)
+    total_rows = 0
+    start_time = time.time()
+    if resume_points:
+        with ThreadPoolExecutor(max_workers=len(resume_points), thread_name_prefix=f"{table_name}-extract") as executor:
+            if copy_export_enabled(table_name):
+                futures = [
+                    executor.submit(export_id_range_copy, target_date, table_name, point["low_id"], point["high_id"],
+                                    point["partition"], point["next_part"])
+                    for point in resume_points
+                ]
+            else:
+                futures = [
+                    executor.submit(extract_id_range, target_date, table_name, point["low_id"], point["high_id"],
+                                    point["partition"], point["next_part"], point["low_updated_at"],
+                                    point["high_updated_at"])
+                    for point in resume_points
+                ]
+            for future in futures:
+                total_rows += future.result()[1]
+        store.set_run_status(table_name, "extracted")
+        store.sync()
+
+    entries = store.manifest_entries(table_name)
+    elapsed = time.time() - start_time
+    path = "COPY export" if copy_export_enabled(table_name) else "cursor export"
+    logging.info(f"Total rows fetched for table {table_name}: {total_rows} by {path} in {elapsed:.2f}s "
+                 f"({total_rows / elapsed if elapsed else 0:.0f} rows/sec), run has {len(entries)} parts")
+
+    if not entries:
+        # nothing new, close the run so the next one starts from the watermark
+        store.set_run_status(table_name, "merged")
+        store.sync()
+        return 0
+
+    # The manifest lists only this run's parts, so leftovers from an earlier run are never loaded
+    write_manifest(target_date, table_name, entries)
+    return len(entries)
+
+
+def move_to_aws_s3(file_path, s3_key):
+    """
+    This function uploads a transformed chunk file to S3 with event_date folder structure.
+    """
+    print(f"Start moving {file_path} to S3")
+
+    # Upload to S3 with the shared client
+    get_s3_client().upload_file(file_path, S3_BUCKET, s3_key)
+
+    logging.info(f"Uploaded {file_path} to s3://{S3_BUCKET}/{s3_key}")
+
+
+def copy_format_options(table_name, staging_format=STAGING_FORMAT):
+    """
+    This function returns the COPY options that match the staging file format
+    """
+    if staging_format == "parquet":
+        # Parquet carries its own column types, COPY takes no conversion options with it
+        return "FORMAT AS PARQUET"
+
+    if staging_format == "json":
+        return (f"json 's3://{S3_BUCKET}/{table_name}/{table_name}_jpath.json'\n"
+                f"    TIMEFORMAT AS 'YYYY-MM-DD HH:MI:SS'\n    ACCEPTINVCHARS '^' TRUNCATECOLUMNS TRIMBLANKS")
+
+    # 'auto' also reads the fractional seconds Postgres writes in COPY TO STDOUT exports
+    compression = {"csv": "", "csv_gzip": " GZIP", "csv_zstd": " ZSTD"}[staging_format]
+    return (f"FORMAT AS CSV{compression} NULL AS '{CSV_NULL}' DATEFORMAT AS 'auto' TIMEFORMAT AS 'auto'\n"
+            f"    ACCEPTINVCHARS '^' TRUNCATECOLUMNS TRIMBLANKS")
+
+
+def load_target_table_from_s3(target_date, table_name, staging_format=None):
+    """
+    Load every part listed in the run's manifest into a Redshift temporary table with one parallel copy query
+    """
+    staging_format = staging_format or table_staging_format(table_name)
+    logging.info(f"Start loading {staging_format} data into Redshift for table: {table_name}")
+
+    # A resumed run whose COPY already committed goes straight to the merge
+    store = get_checkpoint_store()
+    run = store.run(table_name)
+    if run and run["status"] in ("loaded", "merged"):
+        logging.info(f"Skipping load of {table_name}, the checkpoint shows it {run['status']}")
+        return
+
+    # S3 bucket and manifest key
+    bucket_name = S3_BUCKET
+    s3_key = manifest_s3_key(target_date, table_name)
+
+    # copy query to insert data from s3 into redshift table, the manifest lets Redshift load the parts in parallel.
+    # Rows left in the temp table by an interrupted COPY are cleared in the same transaction, so a retry never doubles them
     copy_query = f"""
+    DELETE FROM {table_name}_temp;
+
     COPY {table_name}_temp
     FROM 's3://{bucket_name}/{s3_key}'
     credentials 'aws_iam_role=arn:aws:iam::1234567890:role/Redshift_IAM_Role'
-    json 's3://{bucket_name}/{table_name}/{table_name}_jpath.json'
-    TIMEFORMAT AS 'YYYY-MM-DD HH:MI:SS'
-    ACCEPTINVCHARS '^' TRUNCATECOLUMNS TRIMBLANKS;
+    MANIFEST
+    {copy_format_options(table_name, staging_format)};
     """
 
-    try:
-        cur.execute(copy_query)
-        redshift_conn.commit()
-        logging.info(f"Data loaded into Redshift table {table_name}_temp from s3://{bucket_name}/{s3_key}")
-    except Exception as e:
-        logging.info(f"Error loading data into Redshift for table {table_name}: {e}")
-        redshift_conn.rollback()
-        raise
+    # Borrow a pooled Redshift connection, released (or discarded if broken) when the copy ends
+    with redshift_connection() as redshift_conn:
+        cur = redshift_conn.cursor()
+        try:
+            cur.execute(copy_query)
+            redshift_conn.commit()
+            logging.info(f"Data loaded into Redshift table {table_name}_temp from s3://{bucket_name}/{s3_key}")
+            if run:
+                store.set_run_status(table_name, "loaded")
+                store.sync()
+        except Exception as e:
+            logging.info(f"Error loading data into Redshift for table {table_name}: {e}")
+            redshift_conn.rollback()
+            raise
 
     logging.info(f"Data loaded into Redshift table {table_name} from s3://{bucket_name}/{s3_key}")
 
 
+def get_redshift_columns(table_name):
+    """
+    This function lists the columns of the Redshift table in table order
+    """
+    with redshift_connection() as redshift_conn:
+        cur = redshift_conn.cursor()
+        cur.execute(f"""
+        SELECT column_name FROM information_schema.columns
+        WHERE table_schema = '{SCHEMA}' AND table_name = '{table_name}'
+        ORDER BY ordinal_position;
+        """)
+        return [row[0] for row in cur.fetchall()]
+
+
 def merge_temp_to_main_table(table_name):
     """
     This function merges data from the temporary table into the main table in Redshift.
-    Ensures no duplicate rows are added.
+    Ensures no duplicate rows are added. CDC tables are upserted instead: every changed row is replaced by its
+    latest version, and soft-deleted rows are removed.
     """
     logging.info(f"Start merging data from {table_name}_temp to {table_name}")
 
-    # Establish connection to Redshift
-    redshift_conn = psycopg2.connect(**REDSHIFT_CONN_PARAMS)
-    cur = redshift_conn.cursor()
+    store = get_checkpoint_store()
+    run = store.run(table_name)
+    if run and run["status"] == "merged":
+        logging.info(f"Skipping merge of {table_name}, the checkpoint shows it merged")
+        return
 
     # Merge query: Insert only new rows
+    config = table_config(table_name)
     merge_query = f"""
     BEGIN TRANSACTION;
 
@@ -211,15 +1274,117 @@ def merge_temp_to_main_table(table_name):
     END TRANSACTION;
     """
 
-    # run merge and rollback if there is an exception
+    if config["mode"] == "cdc":
+        # Upsert query: replace changed rows with their latest version from this run, leave soft-deleted rows out
+        column_list = ", ".join(get_redshift_columns(table_name))
+        deleted_filter = f"\n    AND {config['deleted_at']} IS NULL" if config["deleted_at"] else ""
+        merge_query = f"""
+    BEGIN TRANSACTION;
+
+    -- Remove the loaded version of every row that changed in Postgres
+    DELETE FROM {table_name}
+    USING {table_name}_temp
+    WHERE {table_name}.id = {table_name}_temp.id;
+
+    -- Insert the latest version of each changed row
+    INSERT INTO {table_name}
+    SELECT {column_list}
+    FROM (
+        SELECT *, ROW_NUMBER() OVER (PARTITION BY id ORDER BY {config['updated_at']} DESC) AS change_rank
+        FROM {table_name}_temp
+    ) AS latest_changes
+    WHERE change_rank = 1{deleted_filter};
+
+    -- Clear the temporary table after the merge to regain storage
+    TRUNCATE TABLE {table_name}_temp;
+
+    END TRANSACTION;
+    """
+
+    # run merge on a pooled Redshift connection and rollback if there is an exception
+    with redshift_connection() as redshift_conn:
+        cur = redshift_conn.cursor()
+        try:
+            cur.execute(merge_query)
+            redshift_conn.commit()
+            logging.info(f"Successfully merged data into {table_name} and cleared {table_name}_temp")
+        except Exception as e:
+            logging.info(f"Error merging data into {table_name}: {e}")
+            redshift_conn.rollback()
+            raise
+
+    # The merge is committed, so checkpoint bookkeeping errors are logged and never fail the stage.
+    # A watermark that did not advance is re-verified against Redshift by the next run
     try:
-        cur.execute(merge_query)
-        redshift_conn.commit()
-        logging.info(f"Successfully merged data into {table_name} and cleared {table_name}_temp")
+        # Advance the watermark so the next run starts after this one without asking Redshift
+        position = store.last_extracted_position(table_name)
+        if position is not None:
+            last_id, last_updated_at = position
+            watermark = store.watermark(table_name)
+            if last_updated_at is None and watermark:
+                last_id = max(last_id, watermark["last_id"])
+            store.set_watermark(table_name, last_id, last_updated_at)
+        if run:
+            store.set_run_status(table_name, "merged")
     except Exception as e:
-        logging.info(f"Error merging data into {table_name}: {e}")
-        redshift_conn.rollback()
-        raise
+        logging.error(f"Merged {table_name} but failed to update its checkpoint: {e}")
+    store.sync()
+
+
+def run_table(target_date, table_name):
+    """
+    This function runs the fetch -> load -> merge stages of one table in order and reports the outcome.
+    The load and merge stages wait for a free Redshift session slot.
+    """
+    result = {"table": table_name, "status": "success", "failed_stage": None, "error": None, "stage_seconds": {}}
+    stage = None
+
+    try:
+        # Fetch and process data incrementally
+        stage = "fetch"
+        stage_start = time.time()
+        parts = fetch_source_table_incremental(target_date, table_name)
+        result["stage_seconds"][stage] = round(time.time() - stage_start, 2)
+
+        if not parts:
+            logging.info(f"No new rows for {table_name}, skipping load and merge")
+            return result
+
+        # Load data from S3 into Redshift, then merge the temp table into the primary table
+        for stage, stage_function in (("load", lambda: load_target_table_from_s3(target_date, table_name)),
+                                      ("merge", lambda: merge_temp_to_main_table(table_name))):
+            with redshift_sessions:
+                stage_start = time.time()
+                stage_function()
+            result["stage_seconds"][stage] = round(time.time() - stage_start, 2)
+
+    except Exception as e:
+        logging.error(f"Table {table_name} failed in the {stage} stage: {e}")
+        result.update(status="failed", failed_stage=stage, error=str(e))
+
+    return result
+
+
+def run_tables(target_date, tables, max_workers=MAX_TABLE_WORKERS):
+    """
+    This function runs the tables concurrently on a bounded thread pool. A failing table does not stop the others.
+    """
+    results = []
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(tables))), thread_name_prefix="etl") as executor:
+        futures = [executor.submit(run_table, target_date, table_name) for table_name in tables]
+        for future in as_completed(futures):
+            result = future.result()
+            logging.info(f"Table {result['table']} finished with status {result['status']} {result['stage_seconds']}")
+            results.append(result)
+
+    # Per-table summary, in the configured table order
+    results.sort(key=lambda result: tables.index(result["table"]))
+    logging.info("Per-table summary:")
+    for result in results:
+        detail = f"failed in {result['failed_stage']}: {result['error']}" if result["error"] else result["stage_seconds"]
+        logging.info(f"  {result['table']}: {result['status']} - {detail}")
+
+    return results
 
 
 def main():
@@ -234,20 +1399,14 @@ def main():
         start_time_utc = pd.to_datetime(start_time, unit="s", utc=True).strftime('%Y-%m-%d %H:%M:%S UTC')
         logging.info(f"Starting ETL process at {start_time_utc}")
 
-        # create target date and query list
+        # create target date
         target_date = str(date.today())
-        TABLES = ["incremental_table1","incremental_table2"]
 
-        # Iterate over tables in QUERYLIST
-        for table_name in TABLES:
-            # Fetch and process data incrementally
-            fetch_source_table_incremental(target_date, table_name)
-
-            # Load data from S3 into Redshift
-            load_target_table_from_s3(target_date, table_name)
-
-            # merge data from temp table into the primary table
-            merge_temp_to_main_table(table_name)
+        # Run the fetch -> load -> merge stages of every table concurrently, then hand back the pooled sessions
+        try:
+            results = run_tables(target_date, TABLES)
+        finally:
+            close_pools()
 
         # create end time to calculate how long the script took to run
         end_time = time.time()
@@ -255,6 +1414,11 @@ def main():
         elapsed_time = end_time - start_time
         logging.info(f"ETL process completed at {end_time_utc} in {elapsed_time:.2f} seconds")
 
+        # fail the run after every table had its chance
+        failed_tables = [result["table"] for result in results if result["status"] != "success"]
+        if failed_tables:
+            raise RuntimeError(f"{len(failed_tables)} of {len(results)} tables failed: {', '.join(failed_tables)}")
+
 
     except Exception as e:
         logging.error("==== Failed while executing ETL process ====")
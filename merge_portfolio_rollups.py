@@ -0,0 +1,96 @@
+import argparse
+import json
+import os
+
+import aws_lambda_xml_parsing as parser
+
+"""
+Merge the partial portfolio rollups written per batch by the XML Lambda (and per run by
+xml_batch_backfill.py) into a single rollup. Inputs can be local files, folders or S3 prefixes,
+so a dashboard can read one small merged file per day instead of every report output.
+"""
+
+
+def iter_rollup_documents(source):
+    """
+    Yield the partial rollups found at a local path or S3 prefix.
+
+    Args:
+        source (str): A .json file, a folder searched recursively, or s3://bucket/prefix.
+
+    Yields:
+        tuple: (location, rollup dict)
+    """
+    if source.startswith("s3://"):
+        bucket_name, _, prefix = source[len("s3://"):].partition("/")
+        s3 = parser.get_s3_client()
+        for page in s3.get_paginator("list_objects_v2").paginate(Bucket=bucket_name, Prefix=prefix):
+            for item in page.get("Contents", []):
+                if item["Key"].endswith(".json"):
+                    body = s3.get_object(Bucket=bucket_name, Key=item["Key"])["Body"].read()
+                    yield f"s3://{bucket_name}/{item['Key']}", json.loads(body)
+    elif os.path.isdir(source):
+        for root, _, files in os.walk(source):
+            for file_name in sorted(files):
+                if file_name.startswith("rollup") and file_name.endswith(".json"):
+                    path = os.path.join(root, file_name)
+                    with open(path, "r") as f:
+                        yield path, json.load(f)
+    else:
+        with open(source, "r") as f:
+            yield source, json.load(f)
+
+
+def merge_rollups(sources):
+    """
+    Merge every partial rollup under the given sources.
+
+    Partials written under a different FEATURE_SCHEMA_VERSION are skipped, since their
+    features are not comparable.
+
+    Args:
+        sources (list): Local paths or S3 prefixes.
+
+    Returns:
+        tuple: (merged PortfolioRollup, number of partials merged, number skipped)
+    """
+    merged = None
+    merged_count = skipped = 0
+    for source in sources:
+        for location, document in iter_rollup_documents(source):
+            if document.get("feature_schema_version") != parser.FEATURE_SCHEMA_VERSION:
+                print(f"Skipping {location}: feature schema version {document.get('feature_schema_version')}")
+                skipped += 1
+                continue
+            rollup = parser.PortfolioRollup.from_dict(document)
+            merged = rollup if merged is None else merged.merge(rollup)
+            merged_count += 1
+    return merged, merged_count, skipped
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Merge partial portfolio rollups into one.")
+    arg_parser.add_argument("sources", nargs="+", help="Rollup files, folders or s3://bucket/prefix locations.")
+    arg_parser.add_argument("--output", default=None, help="Write the merged rollup to this JSON file.")
+    arg_parser.add_argument("--top", type=int, default=5, help="Top values to print per counter.")
+    args = arg_parser.parse_args()
+
+    merged, merged_count, skipped = merge_rollups(args.sources)
+    if merged is None:
+        raise SystemExit("No rollups found.")
+    print(f"Merged {merged_count} partial rollups ({skipped} skipped)")
+
+    # Print the distributions a dashboard would show
+    print("Portfolio Summary:", json.dumps(merged.summary(), indent=4))
+    for name, counter in merged.counters.items():
+        if counter:
+            print(f"{name}: {counter.most_common(args.top)}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(merged.to_dict(), f, separators=(",", ":"))
+        print(f"Merged rollup saved to {args.output} ({os.path.getsize(args.output)} bytes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import aws_lambda_xml_parsing as parser
+
+"""
+Merge and query the report index. xml_batch_backfill.py writes report summaries into
+append-only SQLite shards and the XML Lambda stages one pending row object per report; this
+script folds new shards and pending rows into one compacted, indexed file (optionally synced
+back to S3) and answers borrower, inquiry date and risk score lookups from it in milliseconds.
+"""
+
+
+def iter_shards(source, download_dir):
+    """
+    Yield the shard files found in a local folder or under an S3 prefix.
+
+    Args:
+        source (str): A folder searched recursively, a .sqlite file or s3://bucket/prefix.
+        download_dir (str): Folder for shards downloaded from S3.
+
+    Yields:
+        tuple: (shard name, local path)
+    """
+    if source.startswith("s3://"):
+        bucket_name, _, prefix = source[len("s3://"):].partition("/")
+        s3 = parser.get_s3_client()
+        for page in s3.get_paginator("list_objects_v2").paginate(Bucket=bucket_name, Prefix=prefix):
+            for item in page.get("Contents", []):
+                if item["Key"].endswith(".sqlite"):
+                    path = os.path.join(download_dir, os.path.basename(item["Key"]))
+                    s3.download_file(bucket_name, item["Key"], path)
+                    yield os.path.basename(item["Key"]), path
+                    os.remove(path)
+    elif os.path.isdir(source):
+        for root, _, files in os.walk(source):
+            for file_name in sorted(files):
+                if file_name.endswith(".sqlite"):
+                    yield file_name, os.path.join(root, file_name)
+    else:
+        yield os.path.basename(source), source
+
+
+def iter_pending_rows(source):
+    """
+    Yield the pending row objects staged by the Lambda under an S3 prefix.
+
+    Args:
+        source (str): s3://bucket/prefix; local sources have no pending rows.
+
+    Yields:
+        tuple: (bucket name, object key, row dict)
+    """
+    if not source.startswith("s3://"):
+        return
+    bucket_name, _, prefix = source[len("s3://"):].partition("/")
+    s3 = parser.get_s3_client()
+    for page in s3.get_paginator("list_objects_v2").paginate(Bucket=bucket_name, Prefix=prefix):
+        for item in page.get("Contents", []):
+            if item["Key"].endswith(".json") and "/pending/" in f"/{item['Key']}":
+                body = s3.get_object(Bucket=bucket_name, Key=item["Key"])["Body"].read()
+                yield bucket_name, item["Key"], json.loads(body)
+
+
+def merge_shards(index_path, sources):
+    """
+    Fold every shard not merged before, and every pending row, into the index at index_path.
+
+    Args:
+        index_path (str): Compacted index file, created if missing.
+        sources (list): Shard folders, files or S3 prefixes.
+
+    Returns:
+        dict: Shards merged, shards skipped as already merged, rows read, pending rows merged and
+              the (bucket, key) of those pending rows, to delete once the index is saved.
+    """
+    index = parser.ReportIndex(index_path)
+    merged = skipped = rows = 0
+    pending_keys = []
+    with tempfile.TemporaryDirectory() as download_dir:
+        for source in sources:
+            for shard_name, path in iter_shards(source, download_dir):
+                if os.path.abspath(path) == os.path.abspath(index_path):
+                    continue
+                shard_rows = index.merge_shard(path, shard_name)
+                if shard_rows:
+                    merged += 1
+                    rows += shard_rows
+                else:
+                    skipped += 1
+            for bucket_name, key, row in iter_pending_rows(source):
+                index.add(row["source_key"], row["summary"], row["processed_at"])
+                pending_keys.append((bucket_name, key))
+    index.close()
+    return {"merged_shards": merged, "skipped_shards": skipped, "rows": rows + len(pending_keys),
+            "pending_rows": len(pending_keys), "pending_keys": pending_keys}
+
+
+def delete_pending_rows(pending_keys):
+    """Delete merged pending row objects; call only once the index holding them is saved."""
+    s3 = parser.get_s3_client()
+    for offset in range(0, len(pending_keys), 1000):
+        batch = pending_keys[offset:offset + 1000]
+        for bucket_name in {bucket_name for bucket_name, _ in batch}:
+            s3.delete_objects(Bucket=bucket_name, Delete={
+                "Objects": [{"Key": key} for name, key in batch if name == bucket_name], "Quiet": True})
+    if pending_keys:
+        print(f"Deleted {len(pending_keys)} merged pending rows")
+
+
+def download_index(s3_url, index_path):
+    """Fetch the compacted index from S3, if it exists, so a merge extends it."""
+    bucket_name, _, key = s3_url[len("s3://"):].partition("/")
+    try:
+        parser.get_s3_client().download_file(bucket_name, key, index_path)
+        return True
+    except Exception as e:
+        print(f"No index downloaded from {s3_url}: {e}")
+        return False
+
+
+def upload_index(index_path, s3_url):
+    """Upload the compacted index to S3."""
+    bucket_name, _, key = s3_url[len("s3://"):].partition("/")
+    parser.get_s3_client().upload_file(index_path, bucket_name, key)
+    print(f"Uploaded {index_path} to {s3_url}")
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Merge and query the report index.")
+    subparsers = arg_parser.add_subparsers(dest="command", required=True)
+
+    merge_parser = subparsers.add_parser("merge", help="Fold new shards and pending rows into the compacted index.")
+    merge_parser.add_argument("index", help="Compacted index file.")
+    merge_parser.add_argument("sources", nargs="+", help="Shard folders, files or s3://bucket/prefix locations.")
+    merge_parser.add_argument("--sync", default=None,
+                              help="s3://bucket/key of the compacted index: downloaded first, uploaded after the merge.")
+
+    query_parser = subparsers.add_parser("query", help="Look up reports in the compacted index.")
+    query_parser.add_argument("index", help="Compacted index file.")
+    query_parser.add_argument("--username", default=None, help="Latest reports of this borrower.")
+    query_parser.add_argument("--inquiry-date", nargs=2, metavar=("START", "END"), default=None,
+                              help="Reports with an inquiry date in this range (YYYY-MM-DD).")
+    query_parser.add_argument("--risk-score", nargs=2, type=int, metavar=("LOW", "HIGH"), default=None,
+                              help="Reports with a risk score in this range.")
+    query_parser.add_argument("--limit", type=int, default=10, help="Maximum rows returned.")
+    args = arg_parser.parse_args()
+
+    if args.command == "merge":
+        if args.sync:
+            download_index(args.sync, args.index)
+        summary = merge_shards(args.index, args.sources)
+        pending_keys = summary.pop("pending_keys")
+        print("Merge Summary:", json.dumps(summary, indent=4))
+        if args.sync:
+            upload_index(args.index, args.sync)
+        # Pending rows are released only once the index holding them is saved
+        delete_pending_rows(pending_keys)
+        return
+
+    if not os.path.exists(args.index):
+        sys.exit(f"Index not found: {args.index}")
+    index = parser.ReportIndex(args.index)
+    start_time = time.perf_counter()
+    if args.username:
+        rows = index.latest_for_borrower(args.username, args.limit)
+    elif args.inquiry_date:
+        rows = index.by_inquiry_date(*args.inquiry_date, limit=args.limit)
+    elif args.risk_score:
+        rows = index.by_risk_score(*args.risk_score, limit=args.limit)
+    else:
+        sys.exit("Pass --username, --inquiry-date or --risk-score.")
+    elapsed_ms = (time.perf_counter() - start_time) * 1000
+
+    for row in rows:
+        print(json.dumps(row))
+    print(f"{len(rows)} reports in {elapsed_ms:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+import json
+import os
+import subprocess
+import sys
+import unittest
+from datetime import datetime
+from unittest import mock
+
+import aws_lambda_xml_parsing as parser
+
+"""
+Tests for the batch handling, feature and tradeline extraction and cold-start imports of aws_lambda_xml_parsing.py. run_record
+is replaced, so the tests need no S3 access. Run with: python -m unittest test_aws_lambda_xml_parsing
+"""
+
+
+def sqs_record(message_id, object_key):
+    """Build an SQS message whose body is an S3 notification for object_key."""
+    body = {"Records": [{"s3": {"bucket": {"name": "bucket"}, "object": {"key": object_key}}}]}
+    return {"messageId": message_id, "eventSource": "aws:sqs", "body": json.dumps(body)}
+
+
+class BatchFailureTest(unittest.TestCase):
+
+    def setUp(self):
+        self.written = []
+        patches = [
+            mock.patch.object(parser, "run_record", side_effect=self.fake_run_record),
+            mock.patch.object(parser, "ROLLUPS_ENABLED", False),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def fake_run_record(self, record):
+        object_key = record["s3"]["object"]["key"]
+        if object_key.startswith("bad"):
+            raise ValueError("Failed to parse the XML content.")
+        self.written.append(object_key)
+        return {"object_key": object_key}
+
+    def test_mixed_sqs_batch_reports_only_the_bad_message(self):
+        event = {"Records": [
+            sqs_record("m1", "reports/good.xml"),
+            {"messageId": "m2", "eventSource": "aws:sqs", "body": "not json"},
+            {"messageId": "m3", "eventSource": "aws:sqs"},
+            sqs_record("m4", "bad/report.xml"),
+        ]}
+        response = parser.lambda_handler(event, None)
+
+        self.assertEqual(response["statusCode"], 207)
+        self.assertEqual(response["batchItemFailures"],
+                         [{"itemIdentifier": "m2"}, {"itemIdentifier": "m3"}, {"itemIdentifier": "m4"}])
+        self.assertEqual(self.written, ["reports/good.xml"])
+
+    def test_clean_sqs_batch_reports_no_failures(self):
+        event = {"Records": [sqs_record("m1", "reports/a.xml"), sqs_record("m2", "reports/b.xml")]}
+        response = parser.lambda_handler(event, None)
+
+        self.assertEqual(response["statusCode"], 200)
+        self.assertEqual(response["batchItemFailures"], [])
+        self.assertEqual(sorted(self.written), ["reports/a.xml", "reports/b.xml"])
+
+    def test_direct_s3_failure_raises_for_lambda_retry(self):
+        event = {"Records": [{"s3": {"bucket": {"name": "bucket"}, "object": {"key": "bad/report.xml"}}}]}
+        with self.assertRaises(RuntimeError):
+            parser.lambda_handler(event, None)
+
+    def test_unsupported_record_fails_the_event(self):
+        with self.assertRaises(ValueError):
+            parser.lambda_handler({"Records": [{"eventSource": "aws:kinesis"}]}, None)
+
+
+def report_fixture(**big_dict_overrides):
+    """Build (parsed_data, big_dict) for a small well-formed report, with big_dict keys replaced as given."""
+    snapshot = {"TotalAccounts": "10", "totalClosedAccounts": "4", "OpenAccounts": "6", "DerogatoryAccounts": "1",
+                "DelinquentAccounts": "2", "Utilization": "0", "DateOfOldestTrade": "2001-03-04"}
+    big_dict = {
+        "Sources_Source": {"InquiryDate": "2024-05-01"},
+        "Borrower_BorrowerName": {"Name": {"first": "Jane", "middle": "Q", "last": "Doe"}},
+        "Borrower_BorrowerAddress": {"dateReported": "2020-01-15"},
+        "Borrower_PreviousAddress": [{"line1": "1 Main St"}, {"line1": "2 Oak Ave"}],
+        "Borrower_Birth": {"date": "1990-06-30"},
+        "Borrower_Employer": [{"name": "Acme", "dateUpdated": "2023-01-01"}, {"name": "Globex"}],
+        "Borrower_CreditScore": {"riskScore": "712", "CreditScoreFactor": [
+            {"FactorType": "Negative"}, {"FactorType": "Negative"}, {"FactorType": "Positive"}]},
+        "Message": [{"Code": {"symbol": "FR"}}, {"Code": {"symbol": "FR"}}, {"Code": {"symbol": "SB"}}],
+    }
+    big_dict.update(big_dict_overrides)
+    return {"root": {"Snapshot": snapshot}}, big_dict
+
+
+class FeatureSpecTest(unittest.TestCase):
+
+    def test_well_formed_report(self):
+        features = parser.evaluate_features(*report_fixture())
+
+        self.assertEqual(list(features), [name for name, _, _, _ in parser.FEATURE_SPEC])
+        self.assertEqual({name: features[name] for name in (
+            "total_accounts", "open_accounts", "utilization", "date_of_oldest_trade", "total_balances",
+            "closed_account_pct", "open_account_pct", "deragatory_account_pct")},
+            {"total_accounts": 10, "open_accounts": 6, "utilization": "100%", "date_of_oldest_trade": "2001-03-04",
+             "total_balances": None, "closed_account_pct": 0.4, "open_account_pct": 0.6, "deragatory_account_pct": 0.17})
+        self.assertEqual(features["inquiry_date"], "2024-05-01")
+        self.assertEqual(features["username"], "Jane Q Doe")
+        self.assertEqual(features["days_current_address"], (datetime.today() - datetime(2020, 1, 15)).days)
+        self.assertEqual(features["num_previous_addresses"], 2)
+        self.assertEqual(features["users_age"], round((datetime.today() - datetime(1990, 6, 30)).days / 365, 2))
+        self.assertEqual(features["recent_employers"], {
+            "employer_1": {"name": "Acme", "dateUpdated": "2023-01-01"},
+            "employer_2": {"name": "Globex", "dateUpdated": "Unknown"}})
+        self.assertEqual(features["risk_score"], 712)
+        self.assertEqual(features["factor_type_counts"], {"Negative": 2, "Positive": 1})
+        self.assertEqual(features["messages"], {"FR": 2, "SB": 1})
+
+    def test_single_previous_address_counts_as_one(self):
+        # The old extract_user_info took len() of the dict and reported its number of keys
+        features = parser.evaluate_features(*report_fixture(
+            Borrower_PreviousAddress={"line1": "1 Main St", "city": "Springfield", "state": "IL"}))
+        self.assertEqual(features["num_previous_addresses"], 1)
+
+    def test_single_message_is_counted(self):
+        # The old parse_messages iterated the dict's keys and returned no symbols
+        features = parser.evaluate_features(*report_fixture(Message={"Code": {"symbol": "FR"}}))
+        self.assertEqual(features["messages"], {"FR": 1})
+
+    def test_zero_denominator_ratio_is_none(self):
+        # The old create_and_display_snapshot raised ZeroDivisionError and failed the whole report
+        parsed_data, big_dict = report_fixture()
+        parsed_data["root"]["Snapshot"].update({"TotalAccounts": "0", "OpenAccounts": "0"})
+        features = parser.evaluate_features(parsed_data, big_dict)
+        self.assertEqual((features["closed_account_pct"], features["open_account_pct"],
+                          features["deragatory_account_pct"]), (None, None, None))
+
+    def test_missing_sections_use_defaults(self):
+        features = parser.evaluate_features({"root": {}}, {})
+        self.assertEqual((features["total_accounts"], features["inquiry_date"], features["num_previous_addresses"],
+                          features["recent_employers"], features["risk_score"], features["messages"]),
+                         (None, "", 0, {}, None, {}))
+
+
+def tradeline(account_type, pay_status_history, **fields):
+    """Build a TradeLinePartition entry; GrantedTrade fields are named with a granted_ prefix."""
+    granted_trade = {"PayStatusHistory": pay_status_history}
+    item = {"GrantedTrade": granted_trade}
+    for name, value in fields.items():
+        if name.startswith("granted_"):
+            granted_trade[name[len("granted_"):]] = value
+        else:
+            item[name] = value
+    return {"accountTypeDescription": account_type, "Tradeline": item}
+
+
+class AggregateTradelinesTest(unittest.TestCase):
+
+    def empty_counters(self):
+        counters = {field: {} for field, _, _, _ in parser.TRADELINE_FIELD_PLAN}
+        counters.update({"PayStatusHistory": {}, "MissingPayStatusHistory": 0})
+        return counters
+
+    def test_empty_and_missing_partition(self):
+        for big_dict in ({}, {"TradeLinePartition": []}, {"TradeLinePartition": None}):
+            self.assertEqual(parser.aggregate_tradelines(big_dict), {
+                "account_type_counts": {}, "converted_data": self.empty_counters(),
+                "history_strings": [], "industry_abbreviations": []})
+
+    def test_single_tradeline_dict_is_one_tradeline(self):
+        item = tradeline("Revolving", {"status": "CC1"}, IndustryCode={"abbreviation": "BC"},
+                         granted_CreditType={"abbreviation": "R"})
+        stats = parser.aggregate_tradelines({"TradeLinePartition": item})
+
+        self.assertEqual(stats, parser.aggregate_tradelines({"TradeLinePartition": [item]}))
+        self.assertEqual(stats["account_type_counts"], {"Revolving": 1})
+        self.assertEqual(stats["converted_data"]["IndustryCode"], {"BC": 1})
+        self.assertEqual(stats["converted_data"]["CreditType"], {"R": 1})
+        self.assertEqual(stats["converted_data"]["PayStatusHistory"], {"C": 2, "1": 1})
+        self.assertEqual(stats["history_strings"], ["CC1"])
+        self.assertEqual(stats["industry_abbreviations"], ["BC"])
+
+    def test_missing_fields(self):
+        stats = parser.aggregate_tradelines({"TradeLinePartition": [
+            # description fallback, and MonthlyPayStatus entries when there is no status string
+            tradeline("Installment", {"MonthlyPayStatus": [{"status": "C"}, {}, {"status": "2"}]},
+                      PayStatus={"description": "Late"}, granted_TermType={"abbreviation": ""}),
+            # no PayStatusHistory at all
+            tradeline("Installment", None, IndustryCode={"description": "Bank"}),
+            # no account type and no Tradeline element
+            {},
+        ]})
+
+        expected = self.empty_counters()
+        expected.update({"PayStatus": {"Late": 1}, "IndustryCode": {"Bank": 1},
+                         "PayStatusHistory": {"C": 1, "2": 1}, "MissingPayStatusHistory": 1})
+        self.assertEqual(stats["account_type_counts"], {"Installment": 2, "": 1})
+        self.assertEqual(stats["converted_data"], expected)
+        self.assertEqual(stats["history_strings"], ["C2", "", ""])
+        self.assertEqual(stats["industry_abbreviations"], ["", "", ""])
+
+
+# Heavy dependencies are imported on first use; importing them at module level undoes the cold-start work
+LAZY_MODULES = ("boto3", "botocore", "xmltodict", "numpy")
+# Generous enough for a slow CI runner; the module alone imports in about 50 ms
+IMPORT_BUDGET_SECONDS = 0.5
+
+IMPORT_PROBE = (
+    "import json, sys, time; start = time.perf_counter(); import aws_lambda_xml_parsing; "
+    "print(json.dumps({'seconds': time.perf_counter() - start, "
+    "'loaded': [name for name in %r if name in sys.modules]}))" % (LAZY_MODULES,)
+)
+
+
+class ColdStartImportTest(unittest.TestCase):
+
+    def import_in_fresh_interpreter(self):
+        """Import the module in a new interpreter, like a Lambda cold start, and return the probe result."""
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.path.dirname(os.path.abspath(parser.__file__))
+        result = subprocess.run([sys.executable, "-c", IMPORT_PROBE], env=env, check=True,
+                                capture_output=True, text=True)
+        return json.loads(result.stdout.splitlines()[-1])
+
+    def test_import_leaves_heavy_dependencies_unloaded(self):
+        self.assertEqual(self.import_in_fresh_interpreter()["loaded"], [])
+
+    def test_import_fits_the_time_budget(self):
+        # best of three, so one slow interpreter start on a busy machine does not fail the test
+        seconds = min(self.import_in_fresh_interpreter()["seconds"] for _ in range(3))
+        self.assertLess(seconds, IMPORT_BUDGET_SECONDS)
+
+
+if __name__ == "__main__":
+    unittest.main()
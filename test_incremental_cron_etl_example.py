@@ -0,0 +1,165 @@
+import os
+import tempfile
+import threading
+import unittest
+
+# the module logs to LOG_FOLDER from import time, keep the test logs out of the working tree
+os.environ.setdefault("LOG_FOLDER", tempfile.mkdtemp(prefix="etl-test-logs-"))
+
+import incremental_cron_etl_example as etl
+
+"""
+Tests for the checkpoint store, id range planning and multipart writer of incremental_cron_etl_example.py.
+Nothing connects to Postgres, Redshift or S3. Run with: python -m unittest test_incremental_cron_etl_example
+"""
+
+
+class FakeS3Client:
+    """Records put_object and multipart calls; upload_part fails from fail_on_part on."""
+
+    def __init__(self, fail_on_part=None):
+        self.fail_on_part = fail_on_part
+        self.lock = threading.Lock()
+        self.objects = {}
+        self.parts = {}
+        self.completed = None
+        self.aborted = False
+
+    def put_object(self, Bucket, Key, Body):
+        self.objects[Key] = Body
+
+    def create_multipart_upload(self, Bucket, Key):
+        return {"UploadId": "upload-1"}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        if self.fail_on_part is not None and PartNumber >= self.fail_on_part:
+            raise ConnectionError(f"part {PartNumber} failed")
+        with self.lock:
+            self.parts[PartNumber] = Body
+        return {"ETag": f"etag-{PartNumber}"}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        self.completed = MultipartUpload["Parts"]
+        self.objects[Key] = b"".join(self.parts[part["PartNumber"]] for part in self.completed)
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.aborted = True
+
+
+class CheckpointStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.store = etl.CheckpointStore(os.path.join(tempfile.mkdtemp(), "checkpoints.db"), s3_key=None)
+        self.addCleanup(self.store.conn.close)
+
+    def add_chunks(self, partition, chunks, last_updated_at=None):
+        for part_number, (first_id, last_id, uploaded) in enumerate(chunks):
+            self.store.add_chunk("t", partition, part_number, first_id, last_id, last_id - first_id + 1,
+                                 f"s3://bucket/part-{partition}-{part_number}", last_updated_at)
+            if uploaded:
+                self.store.chunk_uploaded("t", partition, part_number, 100)
+
+    def test_resume_points_after_a_partial_run(self):
+        self.store.start_run("t", "2024-05-01", [(0, 300), (300, None)])
+        # partition 0: parts 0 and 1 uploaded, part 2 fetched but not uploaded, part 3 uploaded past the gap
+        self.add_chunks(0, [(1, 100, True), (101, 200, True), (201, 250, False), (251, 300, True)])
+        # partition 1 finished
+        self.add_chunks(1, [(301, 400, True)])
+        self.store.partition_extracted("t", 1)
+
+        point, = self.store.resume_points("t")
+        self.assertEqual((point["partition"], point["low_id"], point["high_id"], point["next_part"]), (0, 200, 300, 2))
+        # the chunks past the gap are dropped, their part numbers are reused by the re-extraction
+        self.assertEqual([entry["url"] for entry in self.store.manifest_entries("t")],
+                         ["s3://bucket/part-0-0", "s3://bucket/part-0-1", "s3://bucket/part-1-0"])
+
+    def test_resume_points_of_a_cdc_run_carry_the_updated_at_position(self):
+        self.store.start_run("t", "2024-05-01", [(7, None)], "2024-05-01 00:00:00", "2024-05-02 00:00:00")
+        self.add_chunks(0, [(8, 20, True)], last_updated_at="2024-05-01 12:30:00")
+
+        point, = self.store.resume_points("t")
+        self.assertEqual((point["low_id"], point["low_updated_at"], point["high_updated_at"], point["next_part"]),
+                         (20, "2024-05-01 12:30:00", "2024-05-02 00:00:00", 1))
+
+    def test_resume_points_of_an_untouched_run_start_at_the_beginning(self):
+        self.store.start_run("t", "2024-05-01", [(0, 50), (50, None)])
+        self.assertEqual([(point["low_id"], point["next_part"]) for point in self.store.resume_points("t")],
+                         [(0, 0), (50, 0)])
+
+
+class PlanIdRangesTest(unittest.TestCase):
+
+    def covered_ids(self, ranges, max_id):
+        """Every id from 1 to max_id that each range reads, as id > low_id AND id <= high_id."""
+        return [[i for i in range(1, max_id + 1) if low < i and (high is None or i <= high)] for low, high in ranges]
+
+    def test_empty_table_is_one_open_range(self):
+        self.assertEqual(etl.plan_id_ranges(0, 0, partitions=4, min_rows=1), [(0, None)])
+
+    def test_no_new_rows_is_one_open_range(self):
+        self.assertEqual(etl.plan_id_ranges(500, 500, partitions=4, min_rows=1), [(500, None)])
+
+    def test_single_new_id_is_one_open_range(self):
+        self.assertEqual(etl.plan_id_ranges(41, 42, partitions=4, min_rows=1), [(41, None)])
+
+    def test_small_gap_stays_one_range(self):
+        self.assertEqual(etl.plan_id_ranges(0, 999, partitions=4, min_rows=1000), [(0, None)])
+
+    def test_uneven_gap_covers_every_id_once(self):
+        ranges = etl.plan_id_ranges(0, 10, partitions=3, min_rows=1)
+
+        self.assertEqual(ranges, [(0, 4), (4, 8), (8, None)])
+        covered = self.covered_ids(ranges, 10)
+        self.assertEqual(sorted(i for ids in covered for i in ids), list(range(1, 11)))
+        self.assertTrue(all(covered))
+
+
+class S3MultipartWriterTest(unittest.TestCase):
+
+    block = etl.COPY_EXPORT_BLOCK_SIZE
+
+    def test_small_export_is_a_single_put(self):
+        s3 = FakeS3Client()
+        with etl.S3MultipartWriter("bucket", "key", s3_client=s3) as writer:
+            writer.write("id,name\n")
+            writer.write(b"1,a\n")
+
+        self.assertEqual(s3.objects, {"key": b"id,name\n1,a\n"})
+        self.assertIsNone(s3.completed)
+        self.assertEqual((writer.bytes_in, writer.bytes_out), (12, 12))
+
+    def test_parts_rotate_at_part_size(self):
+        s3 = FakeS3Client()
+        data = bytes(range(256)) * (self.block * 5 // 2 // 256)
+        with etl.S3MultipartWriter("bucket", "key", part_size=self.block, upload_workers=2, s3_client=s3) as writer:
+            for offset in range(0, len(data), 64 * 1024):
+                writer.write(data[offset:offset + 64 * 1024])
+
+        self.assertEqual([part["PartNumber"] for part in s3.completed], [1, 2, 3])
+        self.assertEqual([len(s3.parts[number]) for number in (1, 2, 3)], [self.block, self.block, self.block // 2])
+        self.assertEqual(s3.objects["key"], data)
+        self.assertFalse(s3.aborted)
+
+    def test_error_in_the_block_aborts_the_upload(self):
+        s3 = FakeS3Client()
+        with self.assertRaises(RuntimeError):
+            with etl.S3MultipartWriter("bucket", "key", part_size=self.block, s3_client=s3) as writer:
+                writer.write(b"x" * (self.block * 2))
+                raise RuntimeError("source connection lost")
+
+        self.assertTrue(s3.aborted)
+        self.assertIsNone(s3.completed)
+        self.assertNotIn("key", s3.objects)
+
+    def test_failed_part_aborts_the_upload(self):
+        s3 = FakeS3Client(fail_on_part=2)
+        with self.assertRaises(ConnectionError):
+            with etl.S3MultipartWriter("bucket", "key", part_size=self.block, upload_workers=1, s3_client=s3) as writer:
+                writer.write(b"x" * (self.block * 3))
+
+        self.assertTrue(s3.aborted)
+        self.assertIsNone(s3.completed)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,216 @@
+import argparse
+import io
+import json
+import os
+import sys
+import tarfile
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import aws_lambda_xml_parsing as parser
+
+"""
+Local batch runner used to backfill features over archives of TrueLink credit-report XML.
+It reads reports from a local directory or tarball (a stand-in for the S3 bucket), runs the
+same parsing and extraction functions as the Lambda on a process pool and streams the
+results to sharded JSON Lines files. A checkpoint file lets an interrupted run resume.
+"""
+
+
+# report files picked up from a source; compressed reports are decompressed while parsing
+XML_EXTENSIONS = (".xml", ".xml.gz", ".xml.zst")
+
+
+def iter_xml_sources(source):
+    """
+    Yield the XML reports found in a directory or tarball.
+
+    Args:
+        source (str): Path to a directory or a .tar/.tar.gz/.tgz archive.
+
+    Yields:
+        tuple: (name, payload) where payload is a file path for directories and the
+               raw bytes for tarball members.
+    """
+    if os.path.isdir(source):
+        for root, _, files in os.walk(source):
+            for file_name in sorted(files):
+                if file_name.endswith(XML_EXTENSIONS):
+                    path = os.path.join(root, file_name)
+                    yield os.path.relpath(path, source), path
+    elif tarfile.is_tarfile(source):
+        with tarfile.open(source, "r:*") as tar:
+            for member in tar:
+                if member.isfile() and member.name.endswith(XML_EXTENSIONS):
+                    yield member.name, tar.extractfile(member).read()
+    else:
+        raise ValueError(f"Source must be a directory or tarball: {source}")
+
+
+def load_checkpoint(checkpoint_path):
+    """
+    Read the names of the reports already written by a previous run.
+
+    Args:
+        checkpoint_path (str): Path of the checkpoint file.
+
+    Returns:
+        set: Names of completed reports.
+    """
+    if not os.path.exists(checkpoint_path):
+        return set()
+    with open(checkpoint_path, "r") as f:
+        return {line.rstrip("\n") for line in f if line.strip()}
+
+
+def silence_worker_output():
+    """Pool initializer that drops the per-report print output in worker processes."""
+    sys.stdout = open(os.devnull, "w")
+
+
+def process_report(name, payload):
+    """
+    Parse one report and extract its features.
+
+    Args:
+        name (str): Name of the report within the source.
+        payload (str | bytes): File path or raw bytes of an XML, gzip or zstd report.
+
+    Returns:
+        tuple: (name, output_data or None, error message or None, bytes read)
+    """
+    report_stream = None
+    try:
+        # Stream the file or member bytes in chunks, decompressing .gz/.zst reports on the fly
+        body = open(payload, "rb") if isinstance(payload, str) else io.BytesIO(payload)
+        with parser.ReportStream(body, name) as report_stream:
+            parsed_data = parser.parse_xml_content(report_stream)
+        if not parsed_data:
+            return name, None, "Failed to parse the XML content.", report_stream.bytes_in
+
+        return name, parser.extract_report_features(parsed_data), None, report_stream.bytes_in
+    except Exception as e:
+        return name, None, f"{type(e).__name__}: {e}", report_stream.bytes_in if report_stream else 0
+
+
+def run_backfill(source, output_dir, workers=None, shards=None, checkpoint_path=None, verbose=False, index_path=None):
+    """
+    Process every report in source and write the results to sharded JSON Lines files.
+
+    Args:
+        source (str): Directory or tarball with the XML reports.
+        output_dir (str): Folder for part-*.jsonl, failures.jsonl, rollup-*.json and the checkpoint.
+        workers (int): Worker processes, defaults to the number of cores.
+        shards (int): Number of output shards, defaults to the number of workers.
+        checkpoint_path (str): Checkpoint file, defaults to output_dir/checkpoint.txt.
+        verbose (bool): Keep the per-report print output of the workers.
+        index_path (str): Also write the summaries into this report index shard (see report_index.py).
+
+    Returns:
+        dict: Run summary with counts and throughput.
+    """
+    workers = workers or os.cpu_count() or 1
+    shards = shards or workers
+    checkpoint_path = checkpoint_path or os.path.join(output_dir, "checkpoint.txt")
+    os.makedirs(output_dir, exist_ok=True)
+
+    completed = load_checkpoint(checkpoint_path)
+    print(f"Resuming after {len(completed)} completed reports" if completed else "Starting a new backfill")
+
+    # Open shard, failure and checkpoint files in append mode so a resumed run extends them
+    shard_files = [open(os.path.join(output_dir, f"part-{i:05d}.jsonl"), "a") for i in range(shards)]
+    failure_file = open(os.path.join(output_dir, "failures.jsonl"), "a")
+    checkpoint_file = open(checkpoint_path, "a")
+
+    processed = failed = skipped = bytes_read = 0
+    start_time = time.time()
+
+    # Portfolio rollup of the reports processed by this run, merged later with merge_portfolio_rollups.py
+    rollup = parser.PortfolioRollup()
+    index = parser.ReportIndex(index_path) if index_path else None
+
+    def handle_result(result):
+        nonlocal processed, failed, bytes_read
+        name, output_data, error, size = result
+        bytes_read += size
+        if error:
+            failed += 1
+            failure_file.write(json.dumps({"source_key": name, "error": error}) + "\n")
+            failure_file.flush()
+            return
+
+        # Write the row before checkpointing it, so a crash can only repeat a row, never lose one
+        shard_file = shard_files[processed % shards]
+        shard_file.write(json.dumps({"source_key": name, **output_data}, separators=(",", ":")) + "\n")
+        shard_file.flush()
+        checkpoint_file.write(name + "\n")
+        checkpoint_file.flush()
+        rollup.add(output_data)
+        if index is not None:
+            index.add(name, output_data)
+            if index.pending >= 500:
+                index.commit()
+        processed += 1
+
+    try:
+        initializer = None if verbose else silence_worker_output
+        with ProcessPoolExecutor(max_workers=workers, initializer=initializer) as executor:
+            pending = set()
+            for name, payload in iter_xml_sources(source):
+                if name in completed:
+                    skipped += 1
+                    continue
+
+                # Bound the work in flight so tarball payloads do not pile up in memory
+                if len(pending) >= workers * 4:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        handle_result(future.result())
+                pending.add(executor.submit(process_report, name, payload))
+
+            for future in wait(pending).done:
+                handle_result(future.result())
+    finally:
+        for f in shard_files + [failure_file, checkpoint_file]:
+            f.close()
+        if index is not None:
+            index.close()
+
+        # Each run writes its own partial, so a resumed run never counts a report twice
+        if rollup.report_count:
+            rollup_path = os.path.join(output_dir, f"rollup-{time.strftime('%Y%m%d_%H%M%S', time.localtime(start_time))}.json")
+            with open(rollup_path, "w") as f:
+                json.dump(rollup.to_dict(), f, separators=(",", ":"))
+
+    elapsed = time.time() - start_time
+    summary = {
+        "processed": processed,
+        "failed": failed,
+        "skipped": skipped,
+        "elapsed_seconds": round(elapsed, 2),
+        "reports_per_second": round((processed + failed) / elapsed, 2) if elapsed else 0.0,
+        "mb_per_second": round(bytes_read / 1024 / 1024 / elapsed, 2) if elapsed else 0.0,
+    }
+    print("Backfill Summary:", json.dumps(summary, indent=4))
+    return summary
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Backfill credit-report features from local XML archives.")
+    arg_parser.add_argument("source", help="Directory or tarball containing the XML reports.")
+    arg_parser.add_argument("output_dir", help="Folder for the sharded JSON Lines output.")
+    arg_parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores).")
+    arg_parser.add_argument("--shards", type=int, default=None, help="Output shards (default: --workers).")
+    arg_parser.add_argument("--checkpoint", default=None, help="Checkpoint file (default: output_dir/checkpoint.txt).")
+    arg_parser.add_argument("--verbose", action="store_true", help="Keep the per-report print output.")
+    arg_parser.add_argument("--index", default=None, help="Also write the summaries into this report index shard.")
+    args = arg_parser.parse_args()
+
+    summary = run_backfill(args.source, args.output_dir, args.workers, args.shards, args.checkpoint, args.verbose,
+                           args.index)
+    if summary["failed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()